@@ -0,0 +1,445 @@
+"""In-process fake of the Kubeflow Pipelines v1beta1 REST API.
+
+It serves the pipelines, pipeline versions, experiments, runs and jobs (recurring runs)
+endpoints used by kfp_utils, including deletes and run archiving, and the health check
+of kfp.Client, from generated
+catalogs of any size, with optional latency and error injection. List filters support
+the comparison and substring operations, and with filtering=False every filter is
+rejected as by servers without filter support, to exercise the fallback listings.
+Requests are counted per endpoint, so benchmarks can check API call counts as well as
+wall time.
+
+    with FakeKfpServer(pipelines=1000, experiments=1000) as server:
+        client = kfp_utils.create_client(server.url, existing_token="fake")
+        kfp_utils.find_pipeline_id("pipeline-00999", client)
+        print(server.requests)
+"""
+import base64
+import collections
+import functools
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+API_PREFIX = "/apis/v1beta1"
+# Creation time of the first generated resource, 2022-01-01T00:00:00Z
+CATALOG_START = 1640995200
+
+
+# Filter operations of the API, by number and name
+FILTER_OPERATIONS = {
+    1: "EQUALS", 2: "NOT_EQUALS", 3: "GREATER_THAN", 5: "GREATER_THAN_EQUALS",
+    6: "LESS_THAN", 7: "LESS_THAN_EQUALS", 9: "IS_SUBSTRING",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _timestamp(index: int) -> str:
+    """Function to return the creation time of the index-th resource, one minute apart"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(CATALOG_START + 60 * index))
+
+
+def _now() -> str:
+    """Function to return the creation time of a resource created through the API"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _matches(item: dict, predicate: dict) -> bool:
+    """Function to apply one filter predicate to a resource"""
+    op = predicate.get("op")
+    op = FILTER_OPERATIONS.get(op, op)
+    if op not in FILTER_OPERATIONS.values():
+        raise ValueError(f"Unsupported filter operation {predicate.get('op')}")
+    value = next((predicate[key] for key in ("stringValue", "string_value", "timestampValue", "timestamp_value",
+                                             "intValue", "int_value", "longValue", "long_value")
+                  if key in predicate), None)
+    actual = item.get(predicate["key"])
+    if op == "IS_SUBSTRING":
+        return str(value) in str(actual or "")
+    if op in ("EQUALS", "NOT_EQUALS"):
+        return (actual == value) == (op == "EQUALS")
+    if actual is None:
+        return False
+    return {"GREATER_THAN": actual > value, "GREATER_THAN_EQUALS": actual >= value,
+            "LESS_THAN": actual < value, "LESS_THAN_EQUALS": actual <= value}[op]
+
+
+def fake_id_token(audience: str, lifetime: int = 3600) -> str:
+    """Function to build an unsigned JWT with an expiry, as returned by the fake token endpoint"""
+    def encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+    claims = {"aud": audience, "exp": int(time.time()) + lifetime, "iat": int(time.time())}
+    header = {"alg": "none", "typ": "JWT"}
+    return f"{encode(json.dumps(header).encode())}.{encode(json.dumps(claims).encode())}.{encode(b'signature')}"
+
+
+class FakeKfpServer:
+    """Fake KFP API server running in a background thread."""
+
+    def __init__(self,
+                 pipelines: int = 10,
+                 versions: int = 3,
+                 experiments: int = 10,
+                 runs: int = 10,
+                 namespace: str = "kubeflow",
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status: int = 503,
+                 retry_after: float = None,
+                 lost_response_rate: float = 0.0,
+                 filtering: bool = True,
+                 seed: int = 0):
+        """
+        Arguments:
+            pipelines {int} -- The number of pipelines in the catalog, named pipeline-00000...
+            versions {int} -- The number of versions of each pipeline, named version-0...
+            experiments {int} -- The number of experiments in the namespace, named experiment-00000...
+            runs {int} -- The number of runs in the first experiment
+            namespace {str} -- The namespace of the experiments
+            latency {float} -- The number of seconds each request takes
+            error_rate {float} -- The fraction of requests failing with error_status
+            error_status {int} -- The HTTP status of the injected errors
+            retry_after {float} -- Optional Retry-After header of the injected errors and lost responses
+            lost_response_rate {float} -- The fraction of uploads, run and job creations which
+                succeed but answer with a 502, as when a proxy loses the response
+            filtering {bool} -- Whether list filters are supported, else they are rejected with a 400
+            seed {int} -- The seed of the error injection
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.lost_response_rate = lost_response_rate
+        self.filtering = filtering
+        self.namespace = namespace
+        self.requests = collections.Counter()
+        self._random = random.Random(seed)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.pipelines = {}
+        self.versions = collections.defaultdict(dict)
+        self.experiments = {}
+        self.runs = {}
+        self.jobs = {}
+        width = max(5, len(str(max(pipelines, experiments) - 1)))
+        for index in range(pipelines):
+            pipeline = self._add_pipeline(f"pipeline-{index:0{width}d}", index)
+            for version in range(versions):
+                self._add_version(pipeline["id"], f"version-{version}", index)
+        for index in range(experiments):
+            self._add_experiment(f"experiment-{index:0{width}d}", index)
+        first_experiment = next(iter(self.experiments), None)
+        for index in range(runs if first_experiment else 0):
+            self._add_run(first_experiment, f"run-{index:0{width}d}", status="Succeeded", index=index)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _new_id(self) -> str:
+        return f"{next(self._ids):08x}-0000-0000-0000-000000000000"
+
+    def _add_pipeline(self, name: str, index: int = None, description: str = None) -> dict:
+        pipeline = {"id": self._new_id(), "name": name, "description": description,
+                    "created_at": _now() if index is None else _timestamp(index)}
+        self.pipelines[pipeline["id"]] = pipeline
+        return pipeline
+
+    def _add_version(self, pipeline_id: str, name: str, index: int = None, description: str = None) -> dict:
+        versions = self.versions[pipeline_id]
+        version = {"id": self._new_id(), "name": name, "description": description,
+                   "created_at": _now() if index is None else _timestamp(index + len(versions)),
+                   "resource_references": [{"key": {"id": pipeline_id, "type": "PIPELINE"},
+                                            "relationship": "OWNER"}]}
+        versions[version["id"]] = version
+        self.pipelines[pipeline_id]["default_version"] = version
+        return version
+
+    def _add_experiment(self, name: str, index: int = None) -> dict:
+        experiment = {"id": self._new_id(), "name": name, "storage_state": "STORAGESTATE_AVAILABLE",
+                      "created_at": _now() if index is None else _timestamp(index),
+                      "resource_references": [{"key": {"id": self.namespace, "type": "NAMESPACE"},
+                                               "relationship": "OWNER"}]}
+        self.experiments[experiment["id"]] = experiment
+        return experiment
+
+    def _add_run(self, experiment_id: str, name: str, status: str = "Running", index: int = None,
+                 body: dict = None) -> dict:
+        run = dict(body or {})
+        run.update({"id": self._new_id(), "name": name, "status": status,
+                    "storage_state": "STORAGESTATE_AVAILABLE",
+                    "created_at": _now() if index is None else _timestamp(index),
+                    "resource_references": (body or {}).get("resource_references") or [
+                        {"key": {"id": experiment_id, "type": "EXPERIMENT"}, "relationship": "OWNER"}]})
+        self.runs[run["id"]] = run
+        return run
+
+    def _add_job(self, body: dict) -> dict:
+        job = dict(body)
+        job.update({"id": self._new_id(), "created_at": _now(), "updated_at": _now(),
+                    "enabled": body.get("enabled", True), "status": "Enabled"})
+        self.jobs[job["id"]] = job
+        return job
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._dispatch(self, "GET")
+
+            def do_POST(self):
+                server._dispatch(self, "POST")
+
+            def do_DELETE(self):
+                server._dispatch(self, "DELETE")
+
+        return Handler
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, method: str):
+        url = urlparse(request.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        routes = [
+            ("GET", r"/pipelines", self._list_pipelines),
+            ("GET", r"/pipelines/(?P<id>[^/]+)", self._get_pipeline),
+            ("DELETE", r"/pipelines/(?P<id>[^/]+)", self._delete_pipeline),
+            ("GET", r"/pipeline_versions", self._list_versions),
+            ("DELETE", r"/pipeline_versions/(?P<id>[^/]+)", self._delete_version),
+            ("POST", r"/pipelines/upload", self._upload_pipeline),
+            ("POST", r"/pipelines/upload_version", self._upload_version),
+            ("GET", r"/experiments", self._list_experiments),
+            ("GET", r"/runs", self._list_runs),
+            ("GET", r"/runs/(?P<id>[^/]+)", self._get_run),
+            ("POST", r"/runs", self._create_run),
+            ("POST", r"/runs/(?P<id>[^/]+):archive", self._archive_run),
+            ("DELETE", r"/runs/(?P<id>[^/]+)", self._delete_run),
+            ("GET", r"/jobs", self._list_jobs),
+            ("POST", r"/jobs", self._create_job),
+            ("POST", r"/jobs/(?P<id>[^/]+)/(?P<action>enable|disable)", self._enable_job),
+            ("DELETE", r"/jobs/(?P<id>[^/]+)", self._delete_job),
+            ("POST", r"/token", self._token),
+            ("GET", r"/healthz", self._healthz),
+        ]
+        for route_method, pattern, handler in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._respond(request, 404, {"error": f"No route for {method} {path}", "code": 5})
+        with self._lock:
+            self.requests[f"{method} {pattern}"] += 1
+            fail = self._random.random() < self.error_rate
+            lose_response = self._random.random() < self.lost_response_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+            return self._respond(request, self.error_status, {"error": "injected error", "code": 14}, headers)
+        try:
+            status, body = handler(request, query, **match.groupdict())
+        except KeyError as exc:
+            status, body = 404, {"error": f"Not found: {exc}", "code": 5}
+        if lose_response and method == "POST" and status == 200:
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+            return self._respond(request, 502, {"error": "injected lost response", "code": 14}, headers)
+        self._respond(request, status, body)
+
+    def _respond(self, request: BaseHTTPRequestHandler, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def _filter(self, items, query: dict):
+        """Function to apply the filter, sort_by and page_token/page_size of a list request"""
+        if query.get("filter"):
+            if not self.filtering:
+                raise ValueError("Filters are not supported")
+            for predicate in json.loads(query["filter"]).get("predicates", []):
+                items = [item for item in items if _matches(item, predicate)]
+        if query.get("sort_by"):
+            key, _, order = query["sort_by"].partition(" ")
+            items = sorted(items, key=lambda item: item.get(key) or "", reverse=order == "desc")
+        offset = int(query.get("page_token") or 0)
+        page_size = int(query.get("page_size") or 10)
+        page = items[offset:offset + page_size]
+        next_token = str(offset + page_size) if offset + page_size < len(items) else ""
+        return page, len(items), next_token
+
+    def _list(self, name: str, items, query: dict):
+        try:
+            page, total, next_token = self._filter(list(items), query)
+        except (ValueError, KeyError) as exc:
+            return 400, {"error": str(exc), "code": 3}
+        return 200, {name: page, "total_size": total, "next_page_token": next_token}
+
+    def _list_pipelines(self, request, query):
+        return self._list("pipelines", self.pipelines.values(), query)
+
+    def _get_pipeline(self, request, query, id):
+        return 200, self.pipelines[id]
+
+    def _delete_pipeline(self, request, query, id):
+        with self._lock:
+            del self.pipelines[id]
+            self.versions.pop(id, None)
+        return 200, {}
+
+    def _delete_version(self, request, query, id):
+        with self._lock:
+            pipeline_id = next((pipeline_id for pipeline_id, versions in self.versions.items() if id in versions), None)
+            if pipeline_id is None:
+                raise KeyError(id)
+            del self.versions[pipeline_id][id]
+        return 200, {}
+
+    def _list_versions(self, request, query):
+        pipeline_id = query.get("resource_key.id")
+        if pipeline_id not in self.pipelines:
+            return 404, {"error": f"Pipeline {pipeline_id} not found", "code": 5}
+        return self._list("versions", self.versions[pipeline_id].values(), query)
+
+    def _read_upload(self, request) -> bytes:
+        """Function to read the multipart body of an upload, the package itself is not parsed"""
+        body = request.rfile.read(int(request.headers["Content-Length"]))
+        if b'name="uploadfile"' not in body:
+            raise KeyError("uploadfile")
+        return body
+
+    def _upload_pipeline(self, request, query):
+        self._read_upload(request)
+        name = query.get("name")
+        with self._lock:
+            if any(pipeline["name"] == name for pipeline in self.pipelines.values()):
+                return 409, {"error": f"Pipeline {name} already exists", "code": 6}
+            return 200, self._add_pipeline(name, description=query.get("description"))
+
+    def _upload_version(self, request, query):
+        self._read_upload(request)
+        pipeline_id = query.get("pipelineid")
+        with self._lock:
+            if pipeline_id not in self.pipelines:
+                return 404, {"error": f"Pipeline {pipeline_id} not found", "code": 5}
+            if any(version["name"] == query.get("name") for version in self.versions[pipeline_id].values()):
+                return 409, {"error": f"Version {query.get('name')} already exists", "code": 6}
+            return 200, self._add_version(pipeline_id, query.get("name"), description=query.get("description"))
+
+    def _list_experiments(self, request, query):
+        namespace = query.get("resource_reference_key.id")
+        experiments = [experiment for experiment in self.experiments.values()
+                       if not namespace or namespace == self.namespace]
+        return self._list("experiments", experiments, query)
+
+    def _list_runs(self, request, query):
+        key_id = query.get("resource_reference_key.id")
+        runs = [run for run in self.runs.values()
+                if not key_id or query.get("resource_reference_key.type") == "NAMESPACE"
+                or any(reference["key"]["id"] == key_id for reference in run["resource_references"])]
+        return self._list("runs", runs, query)
+
+    def _run_detail(self, run: dict) -> dict:
+        workflow = {"status": {"phase": run["status"], "nodes": {
+            f"{run['id']}-step": {"type": "Pod", "displayName": "step", "phase": run["status"],
+                                  "startedAt": run["created_at"], "finishedAt": run["created_at"]}}}}
+        return {"run": run, "pipeline_runtime": {"workflow_manifest": json.dumps(workflow)}}
+
+    def _get_run(self, request, query, id):
+        return 200, self._run_detail(self.runs[id])
+
+    def _check_references(self, body: dict):
+        """Function to raise a KeyError, answered with a 404, when a run or job refers to a missing resource"""
+        pipeline_id = (body.get("pipeline_spec") or {}).get("pipeline_id")
+        if pipeline_id and pipeline_id not in self.pipelines:
+            raise KeyError(pipeline_id)
+        for reference in body.get("resource_references") or []:
+            key = reference["key"]
+            if key["type"] == "EXPERIMENT" and key["id"] not in self.experiments:
+                raise KeyError(key["id"])
+            if key["type"] == "PIPELINE_VERSION" and not any(key["id"] in versions for versions in self.versions.values()):
+                raise KeyError(key["id"])
+
+    def _create_run(self, request, query):
+        body = json.loads(request.rfile.read(int(request.headers["Content-Length"])))
+        self._check_references(body)
+        with self._lock:
+            run = self._add_run(None, body.get("name"), status="Running", body=body)
+        return 200, self._run_detail(run)
+
+    def _archive_run(self, request, query, id):
+        self.runs[id]["storage_state"] = "STORAGESTATE_ARCHIVED"
+        return 200, {}
+
+    def _delete_run(self, request, query, id):
+        with self._lock:
+            del self.runs[id]
+        return 200, {}
+
+    def _list_jobs(self, request, query):
+        key_id = query.get("resource_reference_key.id")
+        jobs = [job for job in self.jobs.values()
+                if not key_id or any(reference["key"]["id"] == key_id for reference in job["resource_references"])]
+        return self._list("jobs", jobs, query)
+
+    def _create_job(self, request, query):
+        body = json.loads(request.rfile.read(int(request.headers["Content-Length"])))
+        self._check_references(body)
+        with self._lock:
+            return 200, self._add_job(body)
+
+    def _enable_job(self, request, query, id, action):
+        self.jobs[id]["enabled"] = action == "enable"
+        return 200, {}
+
+    def _delete_job(self, request, query, id):
+        with self._lock:
+            del self.jobs[id]
+        return 200, {}
+
+    def _healthz(self, request, query):
+        # Checked by kfp.Client when it is created without a namespace
+        return 200, {"multi_user": False}
+
+    def _token(self, request, query):
+        # A JWT bearer grant of google-auth, the audience is the target_audience of the assertion
+        body = parse_qs(request.rfile.read(int(request.headers.get("Content-Length") or 0)).decode())
+        audience = query.get("audience") or "fake-client-id"
+        if body.get("assertion"):
+            payload = body["assertion"][0].split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+            audience = claims.get("target_audience") or audience
+        return 200, {"id_token": fake_id_token(audience)}
@@ -0,0 +1,96 @@
+"""Benchmark of the pipeline parameter loading on large parameter files.
+
+Parameter files with a large list and a large inline JSON string are generated in YAML,
+JSON and JSONL, then read cold (with the pure python and the C YAML loaders), read again
+through the parsed file cache, and merged with raw parameters.
+
+    python benchmarks/params.py --items 100000 --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import yaml  # noqa: E402
+
+import kfp_utils  # noqa: E402
+
+
+def write_params(work_dir: str, items: int) -> dict:
+    """Function to write the same large parameters as YAML, JSON and JSONL
+
+    Returns:
+        dict -- The path of each file, keyed by format
+    """
+    params = {"learning_rate": 0.01,
+              "features": [f"feature_{index}" for index in range(items)],
+              "config": json.dumps({f"key_{index}": index for index in range(items // 10)})}
+    paths = {"yaml": os.path.join(work_dir, "params.yaml"),
+             "json": os.path.join(work_dir, "params.json"),
+             "jsonl": os.path.join(work_dir, "params.jsonl")}
+    with open(paths["yaml"], "w") as f:
+        yaml.safe_dump(params, f)
+    with open(paths["json"], "w") as f:
+        json.dump(params, f)
+    with open(paths["jsonl"], "w") as f:
+        for name, value in params.items():
+            f.write(json.dumps({name: value}) + "\n")
+    return paths
+
+
+def time_call(function, repeat: int, setup=None) -> list:
+    """Function to time a call, optionally running setup before each timed call
+
+    Returns:
+        list -- The wall time of each call in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000, help="Number of items in the large list parameter")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed calls per scenario")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = write_params(work_dir, args.items)
+        with open(paths["yaml"]) as f:
+            yaml_text = f.read()
+        scenarios = {
+            "yaml.safe_load (python)": (lambda: yaml.safe_load(yaml_text), None),
+            "yaml_load (C loader)": (lambda: kfp_utils.yaml_load(yaml_text), None),
+        }
+        for name, path in paths.items():
+            scenarios[f"read_pipeline_params {name} (cold)"] = (
+                lambda path=path: kfp_utils.read_pipeline_params(path), kfp_utils.params._params_cache.clear)
+            scenarios[f"read_pipeline_params {name} (cached)"] = (
+                lambda path=path: kfp_utils.read_pipeline_params(path), None)
+        scenarios["merge_pipeline_params (cached)"] = (
+            lambda: kfp_utils.merge_pipeline_params(paths["yaml"], "learning_rate: 0.1"), None)
+        params = kfp_utils.read_pipeline_params(paths["yaml"])
+        scenarios["summarize_params"] = (lambda: kfp_utils.summarize_params(params), None)
+
+        print(f"{'scenario':<40}{'median (ms)':>14}{'min (ms)':>12}")
+        for name, (function, setup) in scenarios.items():
+            timings = time_call(function, args.repeat, setup)
+            print(f"{name:<40}{statistics.median(timings) * 1000:>14.1f}{min(timings) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Pipeline compiled by the pipeline_compile benchmark: a chain of lightweight steps."""
+import kfp.dsl as dsl
+
+
+STEPS = 20
+
+
+@dsl.pipeline(name="benchmark-pipeline", description="Chain of steps used to benchmark compilation")
+def benchmark_pipeline(message: str = "hello"):
+    previous = None
+    for index in range(STEPS):
+        step = dsl.ContainerOp(name=f"step-{index}", image="alpine:3.16",
+                               command=["echo"], arguments=[message, str(index)])
+        if previous is not None:
+            step.after(previous)
+        previous = step
@@ -0,0 +1,63 @@
+"""Benchmark of the cold start time of the action entry points.
+
+Each scenario is run in a fresh interpreter, as the actions are, and the wall time of
+the import and client set up is reported. No request is sent to the Kubeflow host.
+
+    python benchmarks/startup.py --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "python": "pass",
+    "import kfp_utils": "import kfp_utils",
+    "trigger (token)": "import kfp_utils; kfp_utils.create_client('http://localhost:1/pipeline', existing_token='x')",
+    "import kfp": "import kfp",
+    "import kfp.compiler": "import kfp.compiler",
+}
+
+
+def time_scenario(code: str, repeat: int) -> list:
+    """Function to time a snippet in fresh interpreters
+
+    Arguments:
+        code {str} -- The python code to run
+        repeat {int} -- The number of interpreters to time
+
+    Returns:
+        list -- The wall time of each run in seconds
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=REPO_ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters per scenario")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<24}{'median (ms)':>14}{'min (ms)':>12}")
+    for name, code in SCENARIOS.items():
+        try:
+            timings = time_scenario(code, args.repeat)
+        except subprocess.CalledProcessError:
+            print(f"{name:<24}{'unavailable':>14}")
+            continue
+        print(f"{name:<24}{statistics.median(timings) * 1000:>14.0f}{min(timings) * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
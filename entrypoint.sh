@@ -0,0 +1,6 @@
+#!/bin/bash
+
+if [ -n "${INPUT_ENCODED_GOOGLE_APPLICATION_CREDENTIALS}" ]; then
+    echo "${INPUT_ENCODED_GOOGLE_APPLICATION_CREDENTIALS}" | base64 -d > /tmp/gcloud-sa.json
+fi
+exec python -m kfp_utils "$@"
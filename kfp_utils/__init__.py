@@ -0,0 +1,45 @@
+"""Utilities of the Kubeflow Pipelines GitHub actions.
+
+The actions run through one entry point, python -m kfp_utils <action>, see kfp_utils.cli.
+The public functions and classes of the modules are available from the package.
+"""
+import logging
+import sys
+
+from .constants import (
+    DEFAULT_CACHE_TTL, RESOLUTION_CACHE_FILE, CATALOG_FULL_SYNC_INTERVAL, COMPILE_CACHE_DIR, TOKEN_REFRESH_MARGIN, TOKEN_CACHE_FILE,
+    RETRYABLE_STATUSES, DEFAULT_MAX_RETRIES, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CREATION_CLOCK_SKEW,
+    WORKER_SOCKET_NAME, WORKER_ENV_PREFIXES, FINISHED_RUN_STATES, DEFAULT_WAIT_TIMEOUT, PACKAGE_DIGEST_PREFIX,
+    JOB_SPEC_DIGEST_PREFIX, VOLATILE_ANNOTATIONS, PARAM_LOG_MAX_LENGTH, DEPLOY_FAILURE_POLICIES)
+from .github import set_output, append_step_summary
+from .telemetry import Timings, timings, span, count, write_timing_report, CallStats, call_stats, log_call_stats
+from .params import (
+    yaml_load, read_pipeline_params, parse_raw_params, summarize_params, merge_pipeline_params,
+    read_parameter_sweep)
+from .packages import package_digest
+from .compilation import load_function, pipeline_compile, CompileWorkerPool
+from .cache import ResolutionCache, CatalogIndex, load_resolution_cache
+from .resilience import (
+    CircuitOpenError, CircuitBreaker, circuit_breaker, is_retryable, is_not_found, call_with_retry, ResilientClient,
+    resilient)
+from .auth import TokenCache, get_id_token
+from .client import (
+    CREDENTIALS_PATH, AUTH_MODES, RestClient, ClientFactory, create_client, AsyncKfpClient,
+    run_with_async_client, ClientPool)
+from .pipelines import (
+    find_pipeline_version_by_digest, upload_package_async, upload_pipeline, upload_pipeline_by_token, find_pipeline_id,
+    find_pipeline_version_id, find_experiment_id, forget_resolved_ids)
+from .runs import (
+    resolve_pipeline_ids, run_pipeline_async, run_pipeline, run_url, wait_for_runs, run_step_durations, report_run,
+    wait_for_sweep, RateLimiter, run_pipeline_sweep_async, run_pipeline_sweep)
+from .batch import (
+    read_pipeline_manifest, submit_pipelines, report_batch_results, read_deploy_targets, deploy_succeeded,
+    deploy_pipeline, report_deploy_results)
+from .jobs import (
+    read_recurring_runs, plan_recurring_runs, reconcile_recurring_runs, report_recurring_runs,
+    read_retention_policy, plan_retention, apply_retention, report_retention)
+from .actions import compression_level, submit_batch, submit_deploy, submit_main, trigger_main, ACTIONS
+from .worker import run_main, run_action, submit_to_worker, serve
+
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
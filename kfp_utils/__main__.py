@@ -0,0 +1,3 @@
+from kfp_utils.cli import main
+
+main()
@@ -0,0 +1,271 @@
+"""Main functions of the submit and trigger actions, run from their inputs"""
+from __future__ import annotations
+
+import os
+import sys
+import functools
+import logging
+
+from .constants import DEFAULT_WAIT_TIMEOUT
+from .params import read_parameter_sweep
+from .compilation import load_function, pipeline_compile
+from .cache import CatalogIndex
+from .client import ClientFactory, ClientPool
+from .github import set_output
+from .pipelines import upload_pipeline
+from .runs import report_run, run_pipeline, run_pipeline_sweep, wait_for_sweep
+from .batch import (
+    deploy_pipeline, read_deploy_targets, read_pipeline_manifest, report_batch_results, report_deploy_results,
+    submit_pipelines)
+from .jobs import (
+    apply_retention, read_recurring_runs, read_retention_policy, reconcile_recurring_runs, report_recurring_runs,
+    report_retention)
+
+
+def _input(name: str) -> str:
+    """Function to return an input of the action step, or None when it is unset or blank"""
+    value = os.getenv(f"INPUT_{name}")
+    return value if value and not str.isspace(value) else None
+
+
+def _flag(name: str) -> bool:
+    return os.getenv(f"INPUT_{name}", "").lower() == "true"
+
+
+def compression_level():
+    level = _input("COMPRESSION_LEVEL")
+    return int(level) if level else None
+
+
+def submit_batch(factory: ClientFactory):
+    logging.info(
+        "Started the process to compile and upload a batch of pipelines to kubeflow.")
+    entries = read_pipeline_manifest(os.getenv("INPUT_PIPELINE_MANIFEST"))
+    cache = factory.cache
+    client_pool = ClientPool(factory.new_client, size=int(os.getenv("INPUT_BATCH_MAX_CONCURRENCY") or 4))
+    results = submit_pipelines(entries=entries,
+                               client_pool=client_pool,
+                               namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                               experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                               service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                               run=_flag("RUN_PIPELINE"),
+                               v2_compatible=_flag("V2_COMPATIBLE"),
+                               github_sha=os.getenv("GITHUB_SHA"),
+                               max_workers=int(os.getenv("INPUT_BATCH_MAX_WORKERS") or 0) or None,
+                               cache=cache,
+                               cache_dir=os.getenv("INPUT_CACHE_DIR"),
+                               deduplicate=_flag("DEDUPLICATE_UPLOAD"),
+                               compression_level=compression_level())
+    cache.save()
+    if not report_batch_results(results, os.getenv("INPUT_BATCH_RESULTS_PATH") or "kfp-batch-results.json"):
+        sys.exit(1)
+
+
+def submit_deploy(factory: ClientFactory, pipeline_name_zip: str, pipeline_name: str):
+    logging.info("Started the process to deploy the pipeline to several kubeflow clusters.")
+    failure_policy = os.getenv("INPUT_DEPLOY_FAILURE_POLICY") or "all"
+    cache = factory.cache
+    results = deploy_pipeline(pipeline_name_zip=pipeline_name_zip,
+                              pipeline_name=pipeline_name,
+                              targets=read_deploy_targets(os.getenv("INPUT_DEPLOY_TARGETS")),
+                              pipeline_version_name=os.getenv("INPUT_PIPELINE_VERSION_NAME") or None,
+                              run=_flag("RUN_PIPELINE"),
+                              namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                              experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                              service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                              pipeline_parameters_path=os.getenv("INPUT_PIPELINE_PARAMETERS_PATH") or None,
+                              pipeline_parameters=os.getenv("INPUT_PIPELINE_PARAMETERS") or None,
+                              run_name=os.getenv("INPUT_RUN_NAME") or None,
+                              client_id=factory.client_id,
+                              existing_token=factory.existing_token,
+                              failure_policy=failure_policy,
+                              max_workers=int(os.getenv("INPUT_DEPLOY_MAX_CONCURRENCY") or 0) or None,
+                              cache=cache,
+                              deduplicate=_flag("DEDUPLICATE_UPLOAD"),
+                              wait=_flag("WAIT_FOR_COMPLETION"),
+                              timeout=float(os.getenv("INPUT_WAIT_TIMEOUT") or DEFAULT_WAIT_TIMEOUT))
+    cache.save()
+    if not report_deploy_results(results, os.getenv("INPUT_DEPLOY_RESULTS_PATH") or "kfp-deploy-results.json",
+                                 failure_policy=failure_policy):
+        sys.exit(1)
+
+
+def submit_main(auth: str = "iap"):
+    """Function to compile, upload and optionally run a pipeline, or a batch of pipelines,
+    from the inputs of the submit-pipeline actions
+
+    Arguments:
+        auth {str} -- iap or token, see ClientFactory.from_env
+    """
+    factory = ClientFactory.from_env(auth)
+    if os.getenv("INPUT_PIPELINE_MANIFEST"):
+        return submit_batch(factory)
+    logging.info(
+        "Started the process to compile and upload the pipeline to kubeflow.")
+    pipeline_function = load_function(pipeline_function_name=os.getenv('INPUT_PIPELINE_FUNCTION'),
+                                      full_path_to_pipeline=os.getenv('INPUT_PIPELINE_CODE_PATH'))
+    logging.info("The value of the VERSION_GITHUB_SHA is: {}".format(
+        os.getenv("INPUT_VERSION_GITHUB_SHA")))
+    versioned = _flag("VERSION_GITHUB_SHA")
+    if versioned:
+        logging.info("Versioned pipeline components")
+        pipeline_function = pipeline_function(github_sha=os.getenv("GITHUB_SHA"))
+
+    pipeline_name_zip = pipeline_compile(pipeline_function=pipeline_function,
+                                         v2_compatible=_flag("V2_COMPATIBLE"),
+                                         cache_dir=os.getenv("INPUT_CACHE_DIR"),
+                                         cache_key_extra=os.getenv("GITHUB_SHA") if versioned else None,
+                                         compression_level=compression_level())
+    pipeline_name = os.getenv('INPUT_PIPELINE_NAME') if os.getenv('INPUT_PIPELINE_NAME')\
+        else f"{os.getenv('INPUT_PIPELINE_FUNCTION')}_{os.getenv('GITHUB_SHA')}"
+    if os.getenv("INPUT_DEPLOY_TARGETS"):
+        return submit_deploy(factory, pipeline_name_zip, pipeline_name)
+    cache = factory.cache
+    client, pipeline_id, version_id = upload_pipeline(pipeline_name_zip=pipeline_name_zip,
+                                                      pipeline_name=pipeline_name,
+                                                      kubeflow_url=factory.kubeflow_url,
+                                                      client_id=factory.client_id,
+                                                      existing_token=factory.existing_token,
+                                                      pipeline_version_name=os.getenv("INPUT_PIPELINE_VERSION_NAME"),
+                                                      cache=cache,
+                                                      deduplicate=_flag("DEDUPLICATE_UPLOAD"))
+    set_output("PIPELINE_ID", pipeline_id)
+    if version_id:
+        set_output("PIPELINE_VERSION_ID", version_id)
+    logging.info(os.getenv("INPUT_RUN_PIPELINE"))
+    logging.info(os.getenv("INPUT_EXPERIMENT_NAME"))
+    if _flag("RUN_PIPELINE"):
+        logging.info("Started the process to run the pipeline on kubeflow.")
+        # The uploaded IDs are run directly, they may be those of an identical version of another name
+        run = run_pipeline(pipeline_name=pipeline_name,
+                           pipeline_id=pipeline_id,
+                           pipeline_version_id=version_id,
+                           experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                           client=client,
+                           pipeline_parameters_path=_input("PIPELINE_PARAMETERS_PATH"),
+                           pipeline_parameters=_input("PIPELINE_PARAMETERS"),
+                           namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                           service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                           pipeline_version_name=_input("PIPELINE_VERSION_NAME"),
+                           run_name=_input("RUN_NAME"),
+                           cache=cache)
+        cache.save()
+        if not report_run(client, run,
+                          wait=_flag("WAIT_FOR_COMPLETION"),
+                          timeout=float(os.getenv("INPUT_WAIT_TIMEOUT") or DEFAULT_WAIT_TIMEOUT)):
+            sys.exit(1)
+    cache.save()
+
+
+def trigger_main(auth: str = "iap"):
+    """Function to run a pipeline, a parameter sweep, the reconciling of recurring runs or the
+    garbage collection, from the inputs of the trigger-pipeline actions
+
+    Arguments:
+        auth {str} -- iap or token, see ClientFactory.from_env
+    """
+    logging.info(
+        "Started the process to compile and upload the pipeline to kubeflow.")
+    factory = ClientFactory.from_env(auth)
+    logging.info(os.getenv("INPUT_RUN_PIPELINE"))
+    logging.info(os.getenv("INPUT_EXPERIMENT_NAME"))
+
+    logging.info("Started the process to run the pipeline on kubeflow.")
+    pipeline_id = os.getenv("INPUT_PIPELINE_ID")
+    run_name = os.getenv("INPUT_RUN_NAME")
+    pipeline_name = os.getenv("INPUT_PIPELINE_NAME")
+    pipeline_version_name = os.getenv("INPUT_PIPELINE_VERSION_NAME")
+
+    client = factory.client()
+    cache = factory.cache
+    if isinstance(cache, CatalogIndex) and _flag("CATALOG_SYNC"):
+        cache.sync(client, namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"))
+
+    if _input("RETENTION_POLICY"):
+        dry_run = _flag("RETENTION_DRY_RUN")
+        changes = apply_retention(client=client,
+                                  policy=read_retention_policy(os.getenv("INPUT_RETENTION_POLICY")),
+                                  namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                                  dry_run=dry_run,
+                                  max_concurrency=int(os.getenv("INPUT_RETENTION_MAX_CONCURRENCY") or 8),
+                                  rate_limit=float(os.getenv("INPUT_RETENTION_RATE_LIMIT") or 0) or None,
+                                  cache=cache)
+        cache.save()
+        if not report_retention(changes, os.getenv("INPUT_RETENTION_RESULTS_PATH") or "kfp-retention.json",
+                                dry_run=dry_run):
+            sys.exit(1)
+        return
+
+    if _input("RECURRING_RUNS"):
+        dry_run = _flag("RECURRING_RUNS_DRY_RUN")
+        results = reconcile_recurring_runs(client=client,
+                                           jobs=read_recurring_runs(os.getenv("INPUT_RECURRING_RUNS")),
+                                           namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                                           experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                                           service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                                           prune=_flag("RECURRING_RUNS_PRUNE"),
+                                           dry_run=dry_run,
+                                           max_concurrency=int(os.getenv("INPUT_RECURRING_RUNS_MAX_CONCURRENCY") or 8),
+                                           rate_limit=float(os.getenv("INPUT_RECURRING_RUNS_RATE_LIMIT") or 0) or None,
+                                           cache=cache)
+        cache.save()
+        if not report_recurring_runs(results, os.getenv("INPUT_RECURRING_RUNS_RESULTS_PATH") or "kfp-recurring-runs.json",
+                                     dry_run=dry_run):
+            sys.exit(1)
+        return
+
+    pipeline_parameters_path = _input("PIPELINE_PARAMETERS_PATH")
+    pipeline_parameters = _input("PIPELINE_PARAMETERS")
+
+    if _input("PARAMETER_SWEEP_PATH"):
+        results = run_pipeline_sweep(client=client,
+                                     pipeline_name=pipeline_name,
+                                     pipeline_id=pipeline_id,
+                                     experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                                     namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                                     service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                                     parameter_sets=read_parameter_sweep(os.getenv("INPUT_PARAMETER_SWEEP_PATH")),
+                                     pipeline_parameters_path=pipeline_parameters_path,
+                                     pipeline_parameters=pipeline_parameters,
+                                     pipeline_version_name=pipeline_version_name,
+                                     run_name=run_name,
+                                     max_concurrency=int(os.getenv("INPUT_SWEEP_MAX_CONCURRENCY") or 8),
+                                     max_retries=int(os.getenv("INPUT_SWEEP_MAX_RETRIES") or 3),
+                                     rate_limit=float(os.getenv("INPUT_SWEEP_RATE_LIMIT") or 0) or None,
+                                     cache=cache,
+                                     results_path=os.getenv("INPUT_SWEEP_RESULTS_PATH") or "kfp-sweep-results.json")
+        cache.save()
+        if results["failed"]:
+            sys.exit(1)
+        if _flag("WAIT_FOR_COMPLETION"):
+            if not wait_for_sweep(client, results,
+                                  timeout=float(os.getenv("INPUT_WAIT_TIMEOUT") or DEFAULT_WAIT_TIMEOUT),
+                                  results_path=os.getenv("INPUT_SWEEP_RESULTS_PATH") or "kfp-sweep-results.json"):
+                sys.exit(1)
+        return
+
+    run = run_pipeline(pipeline_name=pipeline_name,
+                       pipeline_id=pipeline_id,
+                       experiment_name=os.getenv("INPUT_EXPERIMENT_NAME"),
+                       client=client,
+                       pipeline_parameters_path=pipeline_parameters_path,
+                       pipeline_parameters=pipeline_parameters,
+                       namespace=os.getenv("INPUT_PIPELINE_NAMESPACE"),
+                       service_account=os.getenv("INPUT_PIPELINE_SERVICE_ACCOUNT"),
+                       run_name=run_name,
+                       pipeline_version_name=pipeline_version_name,
+                       cache=cache)
+    cache.save()
+    if not report_run(client, run,
+                      wait=_flag("WAIT_FOR_COMPLETION"),
+                      timeout=float(os.getenv("INPUT_WAIT_TIMEOUT") or DEFAULT_WAIT_TIMEOUT)):
+        sys.exit(1)
+
+
+# The main function of each action, by the name of its directory
+ACTIONS = {
+    "submit-pipeline": functools.partial(submit_main, auth="iap"),
+    "submit-pipeline-token": functools.partial(submit_main, auth="token"),
+    "trigger-pipeline": functools.partial(trigger_main, auth="iap"),
+    "trigger-pipeline-token": functools.partial(trigger_main, auth="token"),
+}
@@ -0,0 +1,129 @@
+"""IAP ID tokens minted from a service account key"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+import base64
+import logging
+
+from .constants import TOKEN_CACHE_FILE, TOKEN_REFRESH_MARGIN
+
+
+def _token_expiry(token: str) -> float:
+    """Function to read the expiry time (seconds since the epoch) of a JWT, without verifying it"""
+    payload = token.split(".")[1]
+    payload += "=" * (-len(payload) % 4)
+    return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+
+
+class TokenCache:
+    """Cache of IAP ID tokens minted from a service account key.
+
+    A token is reused until it is about to expire, then a new one is minted before the
+    old one stops working. Tokens are shared with the other steps of a job through a
+    file in cache_dir, which defaults to ~/.cache/kfp-github-action (the home directory
+    is shared by the docker action steps of a job). The file is not meant to be stored
+    between workflow runs with actions/cache.
+    """
+
+    def __init__(self, cache_dir: str = None, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        """
+        Arguments:
+            cache_dir {str} -- Optional directory to share tokens between processes in
+            refresh_margin {float} -- Number of seconds before expiry at which a token is refreshed
+        """
+        cache_dir = cache_dir or os.getenv("KFP_TOKEN_CACHE_DIR") or os.path.join(
+            os.path.expanduser("~"), ".cache", "kfp-github-action")
+        self.path = os.path.join(cache_dir, TOKEN_CACHE_FILE)
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self, tokens: dict):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(tokens, f)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logging.warning(f"Could not store the ID token cache at {self.path}: {exc}")
+
+    def _fresh(self, entry: dict) -> bool:
+        return bool(entry) and entry["expiry"] - time.time() > self.refresh_margin
+
+    def get_token(self, client_id: str, credentials_path: str = None, token_uri: str = None) -> str:
+        """Function to return a valid ID token for the IAP client ID
+
+        Arguments:
+            client_id {str} -- IAP Client ID, the audience of the token
+            credentials_path {str} -- Path to the service account key, defaults to GOOGLE_APPLICATION_CREDENTIALS
+            token_uri {str} -- Optional token endpoint overriding the one in the key, e.g. a local fake
+
+        Returns:
+            str -- The ID token
+        """
+        credentials_path = credentials_path or os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        with self._lock:
+            # Called before every request, so the key is only read when the token is not in memory
+            entry = self._tokens.get((client_id, credentials_path))
+            if self._fresh(entry):
+                return entry["token"]
+            with open(credentials_path) as f:
+                info = json.load(f)
+            key = hashlib.sha256(f"{client_id}|{info.get('client_email')}".encode()).hexdigest()
+            tokens = self._read_file()
+            entry = tokens.get(key)
+            if not self._fresh(entry):
+                token = self._mint(info, client_id, token_uri)
+                entry = {"token": token, "expiry": _token_expiry(token)}
+                tokens = {k: v for k, v in tokens.items() if v["expiry"] > time.time()}
+                tokens[key] = entry
+                self._write_file(tokens)
+                logging.info("Minted a new ID token")
+            else:
+                logging.info("Reused a cached ID token")
+            self._tokens[(client_id, credentials_path)] = entry
+            return entry["token"]
+
+    @staticmethod
+    def _mint(info: dict, client_id: str, token_uri: str = None) -> str:
+        from google.auth.transport.requests import Request
+        from google.oauth2 import service_account
+
+        if token_uri:
+            info = dict(info, token_uri=token_uri)
+        credentials = service_account.IDTokenCredentials.from_service_account_info(
+            info, target_audience=client_id)
+        credentials.refresh(Request())
+        return credentials.token
+
+
+_token_cache = None
+
+
+def get_id_token(client_id: str, credentials_path: str = None, token_uri: str = None) -> str:
+    """Function to return a valid ID token for the IAP client ID from the shared token cache
+
+    Arguments:
+        client_id {str} -- IAP Client ID, the audience of the token
+        credentials_path {str} -- Path to the service account key, defaults to GOOGLE_APPLICATION_CREDENTIALS
+        token_uri {str} -- Optional token endpoint overriding the one in the key, defaults to KFP_TOKEN_URI
+
+    Returns:
+        str -- The ID token
+    """
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache()
+    return _token_cache.get_token(client_id, credentials_path, token_uri or os.getenv("KFP_TOKEN_URI"))
@@ -0,0 +1,403 @@
+"""Batches of pipelines from a manifest and deploys to several clusters"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import tempfile
+import threading
+import concurrent.futures
+import logging
+
+from .constants import DEFAULT_WAIT_TIMEOUT, DEPLOY_FAILURE_POLICIES
+from .github import append_step_summary, set_output
+from .telemetry import span
+from .params import yaml_load
+from .compilation import CompileWorkerPool
+from .cache import ResolutionCache
+from .client import ClientPool, create_client
+from .pipelines import _upload_package
+from .runs import run_pipeline, run_url, wait_for_runs
+
+
+def read_pipeline_manifest(manifest_path: str) -> list:
+    """Function to read a manifest of pipelines to submit in one batch.
+
+    The manifest is a YAML list with one entry per pipeline, e.g.
+
+        - code_path: pipelines/train.py
+          function: train_pipeline
+          name: train                     # optional, defaults to {function}_{GITHUB_SHA}
+          version_name: train-v2          # optional
+          params_path: pipelines/train.yaml  # optional
+          params: {epochs: 3}             # optional, overrides params_path
+          experiment: training            # optional, defaults to EXPERIMENT_NAME
+          run: true                       # optional, defaults to RUN_PIPELINE
+          v2_compatible: false            # optional, defaults to V2_COMPATIBLE
+          versioned: false                # optional, like VERSION_GITHUB_SHA
+
+    Arguments:
+        manifest_path {str} -- Path to the YAML manifest
+
+    Returns:
+        list -- The manifest entries
+    """
+    import yaml
+    with open(manifest_path) as f:
+        try:
+            entries = yaml_load(f) or []
+        except yaml.YAMLError:
+            raise ValueError("The pipeline manifest could not be loaded correctly.")
+    if not isinstance(entries, list):
+        raise ValueError("The pipeline manifest must be a list of pipelines.")
+    for index, entry in enumerate(entries):
+        missing = [key for key in ("code_path", "function") if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Pipeline {index} in the manifest is missing: {', '.join(missing)}")
+    logging.info(f"Read {len(entries)} pipelines from the manifest {manifest_path}")
+    return entries
+
+
+def submit_pipelines(entries: list,
+                     client_pool: ClientPool,
+                     namespace: str,
+                     experiment_name: str = None,
+                     service_account: str = None,
+                     run: bool = False,
+                     v2_compatible: bool = False,
+                     github_sha: str = None,
+                     max_workers: int = None,
+                     cache: ResolutionCache = None,
+                     cache_dir: str = None,
+                     deduplicate: bool = False,
+                     compression_level: int = None) -> list:
+    """Function to compile, upload and optionally run a batch of pipelines.
+
+    Pipelines are loaded and compiled in a CompileWorkerPool, as loading executes the pipeline
+    modules and compiling is CPU bound. Each compiled pipeline is uploaded (and run) as soon
+    as it is ready, over the shared client pool.
+
+    Arguments:
+        entries {list} -- The manifest entries, see read_pipeline_manifest
+        client_pool {ClientPool} -- The pool of kfp clients to upload and run with
+        namespace {str} -- The Kubeflow namespace of the pipelines
+        experiment_name {str} -- Default name of the experiment to place runs in
+        service_account {str} -- Optional, name of the Kubernetes service account to run pipelines with
+        run {bool} -- Whether to run pipelines whose entry does not say otherwise
+        v2_compatible {bool} -- Whether to compile pipelines whose entry does not say otherwise in V2_COMPATIBLE mode
+        github_sha {str} -- The commit, used in default pipeline names
+        max_workers {int} -- The number of compile worker processes, defaults to the number of CPUs
+        cache {ResolutionCache} -- Optional cache of resolved IDs
+        cache_dir {str} -- Optional directory of previously compiled pipelines
+        deduplicate {bool} -- Whether to skip uploads of packages identical to an existing version
+        compression_level {int} -- Optional zip compression level of the packages, see pipeline_compile
+
+    Returns:
+        list -- One result per entry, in manifest order
+    """
+    import yaml
+    results = [{"name": entry.get("name") or f"{entry['function']}_{github_sha}",
+                "function": entry["function"],
+                "code_path": entry["code_path"],
+                "status": "pending"} for entry in entries]
+
+    def upload_and_run(index: int, pipeline_name_zip: str):
+        entry, result = entries[index], results[index]
+        version_name = entry.get("version_name")
+        with client_pool.client() as client:
+            result["pipeline_id"], result["version_id"] = _upload_package(
+                client, pipeline_name_zip, result["name"], version_name, cache=cache, deduplicate=deduplicate)
+            result["status"] = "uploaded"
+            if entry.get("run", run):
+                params = entry.get("params")
+                created_run = run_pipeline(client=client,
+                                           pipeline_name=result["name"],
+                                           pipeline_id=result["pipeline_id"],
+                                           pipeline_version_id=result["version_id"],
+                                           experiment_name=entry.get("experiment") or experiment_name,
+                                           pipeline_parameters_path=entry.get("params_path"),
+                                           pipeline_parameters=yaml.safe_dump(params) if params else None,
+                                           namespace=namespace,
+                                           service_account=service_account,
+                                           pipeline_version_name=version_name,
+                                           run_name=entry.get("run_name"),
+                                           cache=cache)
+                result["run_id"] = created_run.id
+                result["status"] = "started"
+
+    # Packages which are not cached are compiled into the directory of the batch, and removed with it
+    with tempfile.TemporaryDirectory(prefix="kfp-batch-") as output_dir, \
+            CompileWorkerPool(max_workers=max_workers) as compile_pool, \
+            concurrent.futures.ThreadPoolExecutor() as upload_pool:
+        compiles = {}
+        for index, entry in enumerate(entries):
+            future = compile_pool.submit(code_path=entry["code_path"],
+                                         function=entry["function"],
+                                         v2_compatible=entry.get("v2_compatible", v2_compatible),
+                                         cache_dir=cache_dir and os.path.abspath(cache_dir),
+                                         github_sha=github_sha if entry.get("versioned") else None,
+                                         compression_level=compression_level,
+                                         output_dir=output_dir)
+            compiles[future] = index
+        uploads = {}
+        for future in concurrent.futures.as_completed(compiles):
+            index = compiles[future]
+            try:
+                pipeline_name_zip = future.result()
+            except Exception as exc:
+                logging.error(f"Failed to compile {results[index]['name']}: {exc}")
+                results[index].update(status="failed", error=f"compile: {exc}")
+                continue
+            results[index]["status"] = "compiled"
+            uploads[upload_pool.submit(upload_and_run, index, pipeline_name_zip)] = index
+        for future in concurrent.futures.as_completed(uploads):
+            index = uploads[future]
+            try:
+                future.result()
+            except Exception as exc:
+                logging.error(f"Failed to submit {results[index]['name']}: {exc}")
+                results[index].update(status="failed", error=f"{results[index]['status']}: {exc}")
+    return results
+
+
+def report_batch_results(results: list, results_path: str = None) -> bool:
+    """Function to log the per-pipeline results of a batch, and write them to a JSON file
+
+    Arguments:
+        results {list} -- The results returned by submit_pipelines
+        results_path {str} -- Optional path of the JSON file to write
+
+    Returns:
+        bool -- Whether every pipeline in the batch succeeded
+    """
+    for result in results:
+        details = result.get("error") or result.get("run_id") or result.get("version_id") or result.get("pipeline_id")
+        logging.info(f"{result['status']:>8}  {result['name']}  {details or ''}")
+    failed = [result for result in results if result["status"] == "failed"]
+    logging.info(f"{len(results) - len(failed)} of {len(results)} pipelines succeeded")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+        set_output("RESULTS_PATH", results_path)
+    return not failed
+
+
+def read_deploy_targets(targets_path: str) -> list:
+    """Function to read the clusters a compiled pipeline is deployed to.
+
+    The file is a YAML list with one entry per cluster, e.g.
+
+        - name: prod-eu
+          kubeflow_url: https://prod-eu.example.com/pipeline
+          client_id: 1234.apps.googleusercontent.com  # optional, IAP auth, defaults to CLIENT_ID
+          id_token_env: PROD_EU_ID_TOKEN   # optional, variable holding an ID token, defaults to ID_TOKEN
+          namespace: kubeflow              # optional, defaults to PIPELINE_NAMESPACE
+          experiment: training             # optional, defaults to EXPERIMENT_NAME
+          service_account: pipeline-runner # optional, defaults to PIPELINE_SERVICE_ACCOUNT
+          run: true                        # optional, defaults to RUN_PIPELINE
+          params_path: params.yaml#prod    # optional, defaults to PIPELINE_PARAMETERS_PATH
+          params: {region: eu}             # optional, overrides params_path
+          required: true                   # optional, for the "required" failure policy
+
+    Tokens are read from the environment, so they stay out of the repository.
+
+    Arguments:
+        targets_path {str} -- Path to the YAML file
+
+    Returns:
+        list -- The targets
+    """
+    import yaml
+    with open(targets_path) as f:
+        try:
+            targets = yaml_load(f) or []
+        except yaml.YAMLError:
+            raise ValueError("The deploy targets could not be loaded correctly.")
+    if not isinstance(targets, list) or not targets:
+        raise ValueError("The deploy targets must be a non empty list of clusters.")
+    names = set()
+    for index, target in enumerate(targets):
+        missing = [key for key in ("name", "kubeflow_url") if not target.get(key)]
+        if missing:
+            raise ValueError(f"Target {index} in the deploy targets is missing: {', '.join(missing)}")
+        if target["name"] in names:
+            raise ValueError(f"The deploy target {target['name']} is listed twice")
+        names.add(target["name"])
+        if target.get("id_token_env") and not os.getenv(target["id_token_env"]):
+            raise ValueError(f"The ID token of the deploy target {target['name']} is not set: {target['id_token_env']}")
+    logging.info(f"Read {len(targets)} deploy targets from {targets_path}")
+    return targets
+
+
+def deploy_succeeded(results: list, failure_policy: str = "all") -> bool:
+    """Function to judge the results of a deploy by its failure policy
+
+    Arguments:
+        results {list} -- The results returned by deploy_pipeline
+        failure_policy {str} -- "all" if every target must succeed, "any" if one is enough, or
+            "required" if every target not marked required: false must succeed
+
+    Returns:
+        bool -- Whether the deploy succeeded
+    """
+    if failure_policy not in DEPLOY_FAILURE_POLICIES:
+        raise ValueError(f"Unknown failure policy {failure_policy}, use one of {', '.join(DEPLOY_FAILURE_POLICIES)}")
+    succeeded = [result["status"] not in ("failed", "skipped") for result in results]
+    if failure_policy == "any":
+        return any(succeeded)
+    if failure_policy == "required":
+        return all(ok for ok, result in zip(succeeded, results) if result["required"])
+    return all(succeeded)
+
+
+def deploy_pipeline(pipeline_name_zip: str,
+                    pipeline_name: str,
+                    targets: list,
+                    pipeline_version_name: str = None,
+                    run: bool = False,
+                    namespace: str = None,
+                    experiment_name: str = None,
+                    service_account: str = None,
+                    pipeline_parameters_path: str = None,
+                    pipeline_parameters: str = None,
+                    run_name: str = None,
+                    client_id: str = None,
+                    existing_token: str = None,
+                    failure_policy: str = "all",
+                    max_workers: int = None,
+                    cache: ResolutionCache = None,
+                    deduplicate: bool = False,
+                    wait: bool = False,
+                    timeout: float = DEFAULT_WAIT_TIMEOUT) -> list:
+    """Function to upload, and optionally run, one compiled pipeline on several clusters.
+
+    The targets are deployed in parallel, each with its own client. Once the failure policy
+    can no longer be met, targets which did not start yet are skipped.
+
+    Arguments:
+        pipeline_name_zip {str} -- The name of the compiled pipeline
+        pipeline_name {str} -- The name of the pipeline
+        targets {list} -- The clusters, see read_deploy_targets
+        pipeline_version_name {str} -- Optional name of the pipeline version
+        run {bool} -- Whether to run the pipeline on targets which do not say otherwise
+        namespace {str} -- Default Kubeflow namespace
+        experiment_name {str} -- Default name of the experiment to place runs in
+        service_account {str} -- Default Kubernetes service account to run the pipeline with
+        pipeline_parameters_path {str} -- Default path of the parameters file
+        pipeline_parameters {str} -- Default YAML string of parameters
+        run_name {str} -- Optional name of the runs
+        client_id {str} -- Default IAP Client ID for auth
+        existing_token {str} -- Default ID token for auth
+        failure_policy {str} -- How the deploy is judged, see deploy_succeeded
+        max_workers {int} -- The number of targets deployed at once, defaults to all of them
+        cache {ResolutionCache} -- Optional cache of resolved IDs, scoped by host
+        deduplicate {bool} -- Whether to skip uploads of packages identical to an existing version
+        wait {bool} -- Whether to wait for the runs to finish
+        timeout {float} -- The number of seconds to wait for the runs at most
+
+    Returns:
+        list -- One result per target, in the order of the targets
+    """
+    import yaml
+    deploy_succeeded([], failure_policy)
+    results = [{"target": target["name"],
+                "kubeflow_url": target["kubeflow_url"],
+                "namespace": target.get("namespace") or namespace,
+                "required": target.get("required", True),
+                "status": "pending"} for target in targets]
+    lock = threading.Lock()
+    abort = threading.Event()
+
+    def settle(result: dict, **outcome):
+        # Record an outcome, and stop starting targets once the policy cannot be met
+        with lock:
+            result.update(outcome)
+            hopeful = [dict(other, status="started") if other["status"] == "pending" else other
+                       for other in results]
+            if not deploy_succeeded(hopeful, failure_policy):
+                abort.set()
+
+    def deploy(target: dict, result: dict):
+        if abort.is_set():
+            result["status"] = "skipped"
+            return
+        started = time.perf_counter()
+        try:
+            with span("stage.deploy_target", target=target["name"]):
+                token = os.getenv(target["id_token_env"]) if target.get("id_token_env") else None
+                client = create_client(target["kubeflow_url"],
+                                       client_id=target.get("client_id") or client_id,
+                                       existing_token=token or (None if target.get("client_id") else existing_token))
+                result["pipeline_id"], result["version_id"] = _upload_package(
+                    client, pipeline_name_zip, pipeline_name, pipeline_version_name,
+                    cache=cache, deduplicate=deduplicate)
+                result["status"] = "uploaded"
+                if target.get("run", run):
+                    params = target.get("params")
+                    created_run = run_pipeline(client=client,
+                                               pipeline_name=pipeline_name,
+                                               pipeline_id=result["pipeline_id"],
+                                               pipeline_version_id=result["version_id"],
+                                               experiment_name=target.get("experiment") or experiment_name,
+                                               pipeline_parameters_path=target.get("params_path") or pipeline_parameters_path,
+                                               pipeline_parameters=yaml.safe_dump(params) if params else pipeline_parameters,
+                                               namespace=result["namespace"],
+                                               service_account=target.get("service_account") or service_account,
+                                               pipeline_version_name=pipeline_version_name,
+                                               run_name=run_name,
+                                               cache=cache)
+                    result.update(run_id=created_run.id, run_url=run_url(client, created_run.id), status="started")
+                    if wait:
+                        result["run_status"] = wait_for_runs(client, [created_run.id], timeout=timeout)[created_run.id]
+                        if result["run_status"] != "Succeeded":
+                            raise RuntimeError(f"The run finished with the state {result['run_status']}")
+                        result["status"] = "succeeded"
+        except Exception as exc:
+            logging.error(f"Failed to deploy to {target['name']}: {exc}")
+            settle(result, status="failed", error=f"{result['status']}: {exc}")
+        finally:
+            result["seconds"] = round(time.perf_counter() - started, 3)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(targets)) as pool:
+        for future in [pool.submit(deploy, target, result) for target, result in zip(targets, results)]:
+            future.result()
+    return results
+
+
+def _deploy_markdown(results: list, succeeded: bool) -> str:
+    """Function to format the results of a deploy as a markdown step summary"""
+    lines = [f"### Kubeflow deploy {'succeeded' if succeeded else 'failed'}", "",
+             "| Target | Status | Pipeline | Version | Run | Seconds |",
+             "| --- | --- | --- | --- | --- | ---: |"]
+    for result in results:
+        run = f"[{result['run_id']}]({result['run_url']})" if result.get("run_id") else ""
+        status = f"{result['status']}: {result['error']}" if result.get("error") else result["status"]
+        lines.append(f"| {result['target']} | {status} | {result.get('pipeline_id') or ''} "
+                     f"| {result.get('version_id') or ''} | {run} | {result.get('seconds', '')} |")
+    return "\n".join(lines) + "\n"
+
+
+def report_deploy_results(results: list, results_path: str = None, failure_policy: str = "all") -> bool:
+    """Function to log the per-cluster results of a deploy, and write them to a JSON file and the step summary
+
+    Arguments:
+        results {list} -- The results returned by deploy_pipeline
+        results_path {str} -- Optional path of the JSON file to write
+        failure_policy {str} -- How the deploy is judged, see deploy_succeeded
+
+    Returns:
+        bool -- Whether the deploy succeeded under the failure policy
+    """
+    for result in results:
+        details = result.get("error") or result.get("run_url") or result.get("version_id") or result.get("pipeline_id")
+        logging.info(f"{result['status']:>9}  {result['target']}  {details or ''}")
+    succeeded = deploy_succeeded(results, failure_policy)
+    failed = [result for result in results if result["status"] in ("failed", "skipped")]
+    logging.info(f"{len(results) - len(failed)} of {len(results)} targets succeeded, "
+                 f"the deploy {'succeeded' if succeeded else 'failed'} under the {failure_policy} policy")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+        set_output("RESULTS_PATH", results_path)
+    append_step_summary(_deploy_markdown(results, succeeded))
+    return succeeded
@@ -0,0 +1,393 @@
+"""Caches of resolved names and IDs"""
+from __future__ import annotations
+
+import os
+import json
+import functools
+import time
+import threading
+import sqlite3
+import logging
+from typing import TYPE_CHECKING
+
+from .constants import CATALOG_FULL_SYNC_INTERVAL, DEFAULT_CACHE_TTL, RESOLUTION_CACHE_FILE
+from .telemetry import count, span
+from .listing import _client_host, _format_timestamp
+from .resilience import is_not_found
+from .packages import _description_digest
+
+if TYPE_CHECKING:
+    import kfp
+
+
+# Resolution caches kept between the jobs of a worker, see kfp_utils.worker.serve
+_reuse_caches = False
+_resolution_caches = {}
+
+
+class ResolutionCache:
+    """Name to ID cache for pipelines, pipeline versions and experiments.
+
+    Entries are scoped (by host, namespace or pipeline ID) so that one cache file can be
+    shared between clusters. When a path is given the cache is persisted as JSON, which
+    allows it to be stored between workflow runs, e.g. with actions/cache.
+    """
+
+    def __init__(self, path: str = None, ttl: int = DEFAULT_CACHE_TTL):
+        """
+        Arguments:
+            path {str} -- Optional path of the JSON file backing the cache
+            ttl {int} -- Number of seconds an entry is considered valid
+        """
+        self.path = path
+        self.ttl = ttl
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._entries = json.load(f)
+                logging.info(f"Loaded resolution cache from {path}")
+            except (OSError, ValueError):
+                logging.warning(f"Ignoring unreadable resolution cache at {path}")
+                self._entries = {}
+
+    @staticmethod
+    def _key(scope: str, name: str) -> str:
+        return f"{scope}|{name}"
+
+    def get(self, kind: str, scope: str, name: str) -> str:
+        """Function to look up a cached ID
+
+        Arguments:
+            kind {str} -- The kind of resource: pipeline, version or experiment
+            scope {str} -- The scope the name is unique within
+            name {str} -- The name of the resource
+
+        Returns:
+            str -- The cached ID. If None no fresh entry
+        """
+        with self._lock:
+            entry = self._entries.get(kind, {}).get(self._key(scope, name))
+        if not entry or time.time() - entry["ts"] > self.ttl:
+            return None
+        return entry["id"]
+
+    def put(self, kind: str, scope: str, name: str, resource_id: str):
+        """Function to store a resolved ID
+
+        Arguments:
+            kind {str} -- The kind of resource: pipeline, version or experiment
+            scope {str} -- The scope the name is unique within
+            name {str} -- The name of the resource
+            resource_id {str} -- The resolved ID
+        """
+        with self._lock:
+            self._entries.setdefault(kind, {})[self._key(scope, name)] = {
+                "id": resource_id, "ts": time.time()}
+            self._dirty = True
+
+    def invalidate(self, kind: str = None, scope: str = None, name: str = None):
+        """Function to drop cached entries. Without a kind the whole cache is cleared.
+
+        Arguments:
+            kind {str} -- The kind of resource to drop entries for
+            scope {str} -- Optional scope, required together with name to drop one entry
+            name {str} -- Optional name of the entry to drop
+        """
+        with self._lock:
+            if kind is None:
+                self._entries = {}
+            elif name is None:
+                self._entries.pop(kind, None)
+            else:
+                self._entries.get(kind, {}).pop(self._key(scope, name), None)
+            self._dirty = True
+
+    def save(self):
+        """Function to persist the cache to its path, dropping expired entries."""
+        if not self.path or not self._dirty:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {kind: {key: entry for key, entry in kind_entries.items()
+                              if now - entry["ts"] <= self.ttl}
+                       for kind, kind_entries in self._entries.items()}
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Saved resolution cache to {self.path}")
+
+
+class CatalogIndex:
+    """Local SQLite index of the pipelines, pipeline versions and experiments of clusters.
+
+    It has the interface of ResolutionCache, so lookups query the index (by name within
+    the host, pipeline or namespace, through B-tree indexes) instead of listing the API,
+    and fall back to the API on a miss. sync mirrors the catalog incrementally: listings
+    are sorted newest first and stop at the newest entry already indexed. Deleted resources
+    are dropped by the periodic full syncs, which list everything, and by the callers when a
+    call with an indexed ID fails with a 404, see forget_resolved_ids.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pipelines (
+            host TEXT NOT NULL, id TEXT NOT NULL, name TEXT NOT NULL, created_at TEXT,
+            PRIMARY KEY (host, id));
+        CREATE INDEX IF NOT EXISTS pipelines_by_name ON pipelines (host, name);
+        CREATE TABLE IF NOT EXISTS versions (
+            host TEXT NOT NULL, id TEXT NOT NULL, pipeline_id TEXT NOT NULL, name TEXT NOT NULL,
+            digest TEXT, created_at TEXT,
+            PRIMARY KEY (host, id));
+        CREATE INDEX IF NOT EXISTS versions_by_name ON versions (host, pipeline_id, name);
+        CREATE INDEX IF NOT EXISTS versions_by_digest ON versions (host, pipeline_id, digest);
+        CREATE TABLE IF NOT EXISTS experiments (
+            host TEXT NOT NULL, id TEXT NOT NULL, namespace TEXT NOT NULL, name TEXT NOT NULL, created_at TEXT,
+            PRIMARY KEY (host, id));
+        CREATE INDEX IF NOT EXISTS experiments_by_name ON experiments (host, namespace, name);
+        CREATE TABLE IF NOT EXISTS sync_marks (
+            kind TEXT NOT NULL, scope TEXT NOT NULL, created_at TEXT NOT NULL, synced_at REAL NOT NULL,
+            PRIMARY KEY (kind, scope));
+        CREATE TABLE IF NOT EXISTS full_syncs (
+            kind TEXT NOT NULL, scope TEXT NOT NULL, synced_at REAL NOT NULL,
+            PRIMARY KEY (kind, scope));
+    """
+    # The lookup of each kind of ResolutionCache entry: table, scope columns and name column
+    _LOOKUPS = {
+        "pipeline": ("pipelines", ("host",), "name"),
+        "version": ("versions", ("host", "pipeline_id"), "name"),
+        "digest": ("versions", ("host", "pipeline_id"), "digest"),
+        "experiment": ("experiments", ("host", "namespace"), "name"),
+    }
+
+    def __init__(self, path: str):
+        """
+        Arguments:
+            path {str} -- Path of the SQLite database, created if missing
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(self._SCHEMA)
+        self._lock = threading.Lock()
+
+    def _scope(self, kind: str, scope: str) -> tuple:
+        table, columns, name_column = self._LOOKUPS[kind]
+        values = scope.split("|", len(columns) - 1)
+        return table, dict(zip(columns, values)), name_column
+
+    def get(self, kind: str, scope: str, name: str) -> str:
+        """Function to look up an indexed ID, see ResolutionCache.get"""
+        table, scope_values, name_column = self._scope(kind, scope)
+        conditions = " AND ".join(f"{column} = ?" for column in (*scope_values, name_column))
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT id FROM {table} WHERE {conditions} ORDER BY created_at DESC LIMIT 1",
+                (*scope_values.values(), name)).fetchone()
+        return row[0] if row else None
+
+    def put(self, kind: str, scope: str, name: str, resource_id: str):
+        """Function to index a resolved ID, see ResolutionCache.put"""
+        table, scope_values, name_column = self._scope(kind, scope)
+        with self._lock:
+            if kind == "digest":
+                self._db.execute("UPDATE versions SET digest = ? WHERE host = ? AND id = ?",
+                                 (name, scope_values["host"], resource_id))
+                return
+            # Keep the creation time and digest of an entry indexed by sync
+            columns = ("id", *scope_values, name_column)
+            updates = ", ".join(f"{column} = excluded.{column}" for column in columns[2:])
+            self._db.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (host, id) DO UPDATE SET {updates}",
+                (resource_id, *scope_values.values(), name))
+
+    def invalidate(self, kind: str = None, scope: str = None, name: str = None):
+        """Function to drop indexed entries, see ResolutionCache.invalidate"""
+        with self._lock:
+            if kind is None:
+                for table in ("pipelines", "versions", "experiments", "sync_marks", "full_syncs"):
+                    self._db.execute(f"DELETE FROM {table}")
+            elif name is None:
+                table = self._LOOKUPS[kind][0]
+                self._db.execute(f"DELETE FROM {table}")
+                self._db.execute("DELETE FROM sync_marks WHERE kind = ?", (table,))
+                self._db.execute("DELETE FROM full_syncs WHERE kind = ?", (table,))
+            else:
+                table, scope_values, name_column = self._scope(kind, scope)
+                conditions = " AND ".join(f"{column} = ?" for column in (*scope_values, name_column))
+                self._db.execute(f"DELETE FROM {table} WHERE {conditions}", (*scope_values.values(), name))
+
+    def save(self):
+        """Function kept for the ResolutionCache interface, the index is written as it changes"""
+
+    def close(self):
+        self._db.close()
+
+    def _sync_listing(self, kind: str, scope: str, list_func, items_attr: str, row, page_size: int = 100,
+                      full_sync_interval: float = CATALOG_FULL_SYNC_INTERVAL, **kwargs) -> int:
+        """Function to index the resources of a listing created since the last sync of it.
+
+        When the last full sync of the listing is older than full_sync_interval, every
+        resource is listed instead, and the indexed resources of the scope no longer listed
+        are dropped.
+
+        Arguments:
+            kind {str} -- The table the resources are stored in
+            scope {str} -- The scope of the listing, e.g. the host and namespace
+            list_func {callable} -- The kfp client list function
+            items_attr {str} -- The attribute of the response holding the resources
+            row {callable} -- Function returning the table row of a resource, as a dict
+            full_sync_interval {float} -- Seconds between full syncs, None for incremental syncs only
+
+        Returns:
+            int -- The number of resources indexed
+        """
+        with self._lock:
+            mark = self._db.execute("SELECT created_at FROM sync_marks WHERE kind = ? AND scope = ?",
+                                    (kind, scope)).fetchone()
+            full_synced_at = self._db.execute("SELECT synced_at FROM full_syncs WHERE kind = ? AND scope = ?",
+                                              (kind, scope)).fetchone()
+        full = full_sync_interval is not None and (
+            not full_synced_at or time.time() - full_synced_at[0] >= full_sync_interval)
+        mark = mark[0] if mark and not full else None
+        rows, newest, page_token = [], mark, ""
+        while True:
+            response = list_func(page_size=page_size, page_token=page_token, sort_by="created_at desc", **kwargs)
+            count(f"pages.{items_attr}")
+            items = getattr(response, items_attr) or []
+            known = False
+            for item in items:
+                created_at = _format_timestamp(item.created_at)
+                # Resources created in the same second as the mark may not be indexed yet
+                if mark and created_at < mark:
+                    known = True
+                    break
+                rows.append(dict(row(item), id=item.id, created_at=created_at))
+                newest = max(newest or created_at, created_at)
+            page_token = response.next_page_token
+            if known or not page_token:
+                break
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for values in rows:
+                    columns = ", ".join(values)
+                    placeholders = ", ".join("?" * len(values))
+                    self._db.execute(f"INSERT OR REPLACE INTO {kind} ({columns}) VALUES ({placeholders})",
+                                     tuple(values.values()))
+                if newest:
+                    self._db.execute("INSERT OR REPLACE INTO sync_marks VALUES (?, ?, ?, ?)",
+                                     (kind, scope, newest, time.time()))
+                if full:
+                    columns = next(columns for table, columns, _ in self._LOOKUPS.values() if table == kind)
+                    conditions = " AND ".join(f"{column} = ?" for column in columns)
+                    self._db.execute("CREATE TEMP TABLE IF NOT EXISTS listed (id TEXT PRIMARY KEY)")
+                    self._db.execute("DELETE FROM listed")
+                    self._db.executemany("INSERT OR IGNORE INTO listed VALUES (?)",
+                                         [(values["id"],) for values in rows])
+                    dropped = self._db.execute(
+                        f"DELETE FROM {kind} WHERE {conditions} AND id NOT IN (SELECT id FROM listed)",
+                        tuple(scope.split("|", len(columns) - 1))).rowcount
+                    if kind == "pipelines":
+                        # The versions of deleted pipelines go with them
+                        self._db.execute("DELETE FROM versions WHERE host = ? AND pipeline_id NOT IN "
+                                         "(SELECT id FROM pipelines WHERE host = ?)", (scope, scope))
+                    self._db.execute("INSERT OR REPLACE INTO full_syncs VALUES (?, ?, ?)", (kind, scope, time.time()))
+                    if dropped:
+                        logging.info(f"Dropped {dropped} deleted {kind} of {scope} from the catalog index")
+            except BaseException:
+                # A failed sync leaves the index as it was, and the connection usable
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    @span("stage.catalog_sync")
+    def sync(self, client: kfp.Client, namespace: str = None, pipeline_ids: list = None,
+             all_versions: bool = False, full_sync_interval: float = CATALOG_FULL_SYNC_INTERVAL) -> dict:
+        """Function to mirror the pipelines, versions and experiments of a cluster.
+
+        Pipelines and the experiments of the namespace are listed newest first, down to the
+        newest one already indexed. The versions of new pipelines are indexed, as are those
+        of pipeline_ids, or of every indexed pipeline with all_versions. Versions uploaded by
+        these actions are indexed as they are uploaded. Each listing is made in full once
+        per full_sync_interval, dropping the resources deleted since, with the versions of
+        deleted pipelines.
+
+        Arguments:
+            client {kfp.Client} -- The kfp client
+            namespace {str} -- The Kubeflow namespace of the experiments
+
+        Keyword Arguments:
+            pipeline_ids {list} -- Optional pipelines whose new versions to index
+            all_versions {bool} -- Whether to index the new versions of every pipeline
+            full_sync_interval {float} -- Seconds between full syncs, 0 for a full sync now
+                and None for incremental syncs only
+
+        Returns:
+            dict -- The number of pipelines, versions and experiments indexed
+        """
+        host = _client_host(client)
+        with self._lock:
+            known_pipelines = {row[0] for row in self._db.execute("SELECT id FROM pipelines WHERE host = ?", (host,))}
+        synced = {"pipelines": self._sync_listing(
+            "pipelines", host, client.list_pipelines, "pipelines",
+            lambda pipeline: {"host": host, "name": pipeline.name}, full_sync_interval=full_sync_interval)}
+        with self._lock:
+            all_pipelines = {row[0] for row in self._db.execute("SELECT id FROM pipelines WHERE host = ?", (host,))}
+        version_pipelines = (all_pipelines - known_pipelines) | set(pipeline_ids or [])
+        if all_versions:
+            version_pipelines = all_pipelines
+        synced["versions"] = 0
+        for pipeline_id in sorted(version_pipelines):
+            try:
+                synced["versions"] += self._sync_listing(
+                    "versions", f"{host}|{pipeline_id}", client.list_pipeline_versions, "versions",
+                    lambda version, pipeline_id=pipeline_id: {
+                        "host": host, "pipeline_id": pipeline_id, "name": version.name,
+                        "digest": _description_digest(version.description)},
+                    full_sync_interval=full_sync_interval, pipeline_id=pipeline_id)
+            except Exception as exc:
+                if not is_not_found(exc):
+                    raise
+                logging.info(f"Dropping the deleted pipeline {pipeline_id} from the catalog index")
+                with self._lock:
+                    self._db.execute("DELETE FROM pipelines WHERE host = ? AND id = ?", (host, pipeline_id))
+                    self._db.execute("DELETE FROM versions WHERE host = ? AND pipeline_id = ?", (host, pipeline_id))
+        synced["experiments"] = self._sync_listing(
+            "experiments", f"{host}|{namespace}", client.list_experiments, "experiments",
+            lambda experiment: {"host": host, "namespace": str(namespace), "name": experiment.name},
+            full_sync_interval=full_sync_interval, namespace=namespace)
+        logging.info(f"Indexed {synced['pipelines']} pipelines, {synced['versions']} versions "
+                     f"and {synced['experiments']} experiments of {host}")
+        return synced
+
+
+def load_resolution_cache(cache_dir: str = None, ttl: int = DEFAULT_CACHE_TTL, catalog_index: str = None):
+    """Function to create the resolution cache, persisted in cache_dir if given
+
+    Arguments:
+        cache_dir {str} -- Optional directory to persist the cache in
+        ttl {int} -- Number of seconds an entry is considered valid
+        catalog_index {str} -- Optional path of a CatalogIndex to use instead of a ResolutionCache
+
+    Returns:
+        ResolutionCache -- The resolution cache, or the CatalogIndex
+    """
+    if catalog_index:
+        path, factory = os.path.abspath(catalog_index), lambda: CatalogIndex(catalog_index)
+    else:
+        path = os.path.abspath(os.path.join(cache_dir, RESOLUTION_CACHE_FILE)) if cache_dir else None
+        factory = functools.partial(ResolutionCache, path=path, ttl=ttl)
+    if _reuse_caches:
+        # A worker keeps the cache of every path, with or without a cache_dir, between jobs
+        if (path, ttl) not in _resolution_caches:
+            _resolution_caches[path, ttl] = factory()
+        return _resolution_caches[path, ttl]
+    return factory()
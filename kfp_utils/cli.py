@@ -0,0 +1,53 @@
+"""Command line interface of kfp_utils: the actions, the worker and the catalog index sync
+
+    python -m kfp_utils trigger-pipeline
+    python -m kfp_utils serve --path-map /github/workspace=$PWD
+    python -m kfp_utils sync --index catalog.sqlite --kubeflow-url https://...
+"""
+from __future__ import annotations
+
+import os
+
+from .constants import WORKER_SOCKET_NAME
+from .cache import CatalogIndex
+from .client import create_client
+from .actions import ACTIONS
+from .worker import run_action, serve
+
+
+def main(argv: list = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Kubeflow pipelines action utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for action in ACTIONS:
+        subparsers.add_parser(action, help=f"Run the {action} action from its INPUT_* environment variables")
+    serve_parser = subparsers.add_parser("serve", help=serve.__doc__.splitlines()[0])
+    serve_parser.add_argument("--socket", help=f"Path of the socket, defaults to ~/{WORKER_SOCKET_NAME}")
+    serve_parser.add_argument("--path-map", action="append", default=[], metavar="STEP_PATH=WORKER_PATH",
+                              help="Map a path prefix of the steps to the worker's, e.g. /github/workspace=$PWD")
+    serve_parser.add_argument("--idle-timeout", type=float, default=0,
+                              help="Stop after this many seconds without a job, 0 to never stop")
+    sync_parser = subparsers.add_parser("sync", help=CatalogIndex.sync.__doc__.splitlines()[0])
+    sync_parser.add_argument("--index", required=True, help="Path of the SQLite catalog index")
+    sync_parser.add_argument("--kubeflow-url", required=True, help="URL of the Kubeflow server")
+    sync_parser.add_argument("--client-id", help="IAP Client ID for auth")
+    sync_parser.add_argument("--id-token", default=os.getenv("KFP_ID_TOKEN"),
+                             help="ID token for auth, defaults to KFP_ID_TOKEN")
+    sync_parser.add_argument("--namespace", help="The Kubeflow namespace of the experiments")
+    sync_parser.add_argument("--pipeline-id", action="append", default=[], help="Also index new versions of this pipeline")
+    sync_parser.add_argument("--all-versions", action="store_true", help="Index new versions of every pipeline")
+    sync_parser.add_argument("--full", action="store_true",
+                             help="List everything and drop deleted resources, as done periodically")
+    args = parser.parse_args(argv)
+    if args.command in ACTIONS:
+        run_action(ACTIONS[args.command], args.command)
+    elif args.command == "serve":
+        path_map = dict(mapping.split("=", 1) for mapping in args.path_map)
+        serve(args.socket, path_map, args.idle_timeout)
+    elif args.command == "sync":
+        client = create_client(args.kubeflow_url, client_id=args.client_id, existing_token=args.id_token)
+        index = CatalogIndex(args.index)
+        index.sync(client, namespace=args.namespace, pipeline_ids=args.pipeline_id, all_versions=args.all_versions,
+                   **({"full_sync_interval": 0} if args.full else {}))
+        index.close()
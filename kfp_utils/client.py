@@ -0,0 +1,509 @@
+"""Clients of the Kubeflow Pipelines API"""
+from __future__ import annotations
+
+import os
+import io
+import json
+import asyncio
+import functools
+import queue
+import threading
+import contextlib
+import concurrent.futures
+import re
+import time
+import urllib.parse
+from typing import TYPE_CHECKING
+
+from .constants import DEFAULT_CACHE_TTL, DEFAULT_MAX_RETRIES
+from .resilience import resilient, ResilientClient
+from .cache import load_resolution_cache, ResolutionCache
+from .auth import get_id_token, _token_expiry
+
+if TYPE_CHECKING:
+    import kfp
+
+
+# Where the entrypoint of the IAP actions decodes the service account key
+CREDENTIALS_PATH = "/tmp/gcloud-sa.json"
+# How an action step authenticates: an IAP client ID with a service account key, or an ID token
+AUTH_MODES = ("iap", "token")
+
+# Clients shared by the client factories of the process, keyed by host and auth
+_clients = {}
+
+
+class _MultipartFile:
+    """Read-only file object producing a multipart/form-data body with one file, read from disk
+    in blocks, so the size of the body held in memory does not depend on the file size."""
+
+    def __init__(self, path: str, field: str):
+        self.boundary = os.urandom(16).hex()
+        head = (f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n").encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.length = len(head) + os.path.getsize(path) + len(tail)
+        self._file = open(path, "rb")
+        self._parts = [io.BytesIO(head), self._file, io.BytesIO(tail)]
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RestClient:
+    """Minimal client for the Kubeflow Pipelines REST API, authenticated with an ID token.
+
+    It implements the subset of the kfp.Client interface used by these actions on top of
+    the generated kfp_server_api package, without importing the kfp SDK (DSL, compiler,
+    components and kubernetes client), which dominates the start up time of a trigger.
+    """
+
+    def __init__(self, host: str, existing_token: str = None, token_provider=None, pool_size: int = None):
+        """
+        Arguments:
+            host {str} -- URL of the Kubeflow Pipelines API
+            existing_token {str} -- ID token for auth to kfp
+            token_provider {callable} -- Optional function returning a valid ID token, called
+                before every request so long lived clients pick up refreshed tokens
+            pool_size {int} -- Optional maximum number of pooled connections, shared by the threads using the client
+        """
+        import kfp_server_api
+
+        self._api = kfp_server_api
+        config = kfp_server_api.Configuration(host=host.rstrip("/"))
+        if pool_size:
+            config.connection_pool_maxsize = pool_size
+        if existing_token or token_provider:
+            config.api_key["authorization"] = existing_token or token_provider()
+            config.api_key_prefix["authorization"] = "Bearer"
+        if token_provider:
+            config.refresh_api_key_hook = lambda config: config.api_key.update(authorization=token_provider())
+        self._existing_config = config
+        api_client = kfp_server_api.ApiClient(config)
+        self._pipelines_api = kfp_server_api.PipelineServiceApi(api_client)
+        self._upload_api = kfp_server_api.PipelineUploadServiceApi(api_client)
+        self._experiment_api = kfp_server_api.ExperimentServiceApi(api_client)
+        self._run_api = kfp_server_api.RunServiceApi(api_client)
+        self._job_api = kfp_server_api.JobServiceApi(api_client)
+
+    def _get_url_prefix(self) -> str:
+        return self._existing_config.host
+
+    def list_pipelines(self, page_token: str = "", page_size: int = 10, sort_by: str = "", filter: str = None):
+        return self._pipelines_api.list_pipelines(
+            page_token=page_token, page_size=page_size, sort_by=sort_by, filter=filter)
+
+    def get_pipeline(self, pipeline_id: str):
+        return self._pipelines_api.get_pipeline(id=pipeline_id)
+
+    def list_pipeline_versions(self, pipeline_id: str, page_token: str = "", page_size: int = 10,
+                               sort_by: str = "", filter: str = None):
+        return self._pipelines_api.list_pipeline_versions(
+            resource_key_type=self._api.ApiResourceType.PIPELINE, resource_key_id=pipeline_id,
+            page_token=page_token, page_size=page_size, sort_by=sort_by, filter=filter)
+
+    def _stream_upload(self, endpoint: str, pipeline_package_path: str, query: dict):
+        """Function to upload a package, streaming the multipart request body from disk.
+
+        The generated upload API reads the whole package into memory and encodes it again
+        into the request body, this sends it in blocks as it is read.
+        """
+        from kfp_server_api.exceptions import ApiException
+        from kfp_server_api.rest import RESTResponse
+
+        api_client = self._upload_api.api_client
+        config = self._existing_config
+        if config.refresh_api_key_hook:
+            config.refresh_api_key_hook(config)
+        headers = dict(api_client.default_headers)
+        authorization = config.get_api_key_with_prefix("authorization")
+        if authorization:
+            headers["Authorization"] = authorization
+        query = {name: value for name, value in query.items() if value is not None}
+        url = f"{config.host}/apis/v1beta1/pipelines/{endpoint}?{urllib.parse.urlencode(query)}"
+        with _MultipartFile(pipeline_package_path, "uploadfile") as body:
+            headers["Content-Type"] = body.content_type
+            headers["Content-Length"] = str(body.length)
+            response = RESTResponse(api_client.rest_client.pool_manager.request(
+                "POST", url, body=body, headers=headers, retries=False))
+        if not 200 <= response.status <= 299:
+            raise ApiException(http_resp=response)
+        return response
+
+    def upload_pipeline(self, pipeline_package_path: str, pipeline_name: str = None, description: str = None):
+        response = self._stream_upload(
+            "upload", pipeline_package_path, {"name": pipeline_name, "description": description})
+        return self._upload_api.api_client.deserialize(response, "ApiPipeline")
+
+    def upload_pipeline_version(self, pipeline_package_path: str, pipeline_version_name: str,
+                                pipeline_id: str = None, description: str = None):
+        response = self._stream_upload(
+            "upload_version", pipeline_package_path,
+            {"name": pipeline_version_name, "pipelineid": pipeline_id, "description": description})
+        return self._upload_api.api_client.deserialize(response, "ApiPipelineVersion")
+
+    def list_experiments(self, page_token: str = "", page_size: int = 10, sort_by: str = "",
+                         namespace: str = None, filter: str = None):
+        return self._experiment_api.list_experiment(
+            page_token=page_token, page_size=page_size, sort_by=sort_by, filter=filter,
+            resource_reference_key_type=self._api.ApiResourceType.NAMESPACE,
+            resource_reference_key_id=namespace)
+
+    def _resource_references(self, experiment_id: str, version_id: str = None) -> list:
+        api = self._api
+        references = [api.ApiResourceReference(
+            key=api.ApiResourceKey(id=experiment_id, type=api.ApiResourceType.EXPERIMENT),
+            relationship=api.ApiRelationship.OWNER)]
+        if version_id:
+            references.append(api.ApiResourceReference(
+                key=api.ApiResourceKey(id=version_id, type=api.ApiResourceType.PIPELINE_VERSION),
+                relationship=api.ApiRelationship.CREATOR))
+        return references
+
+    def _pipeline_spec(self, params: dict = None, pipeline_id: str = None):
+        # Same parameter encoding as kfp.Client
+        parameters = [self._api.ApiParameter(
+            name=re.sub("-+", "-", re.sub("[^-_0-9A-Za-z]+", "-", name)).strip("-")[:63],
+            value=json.dumps(value) if isinstance(value, (list, dict)) else str(value))
+            for name, value in (params or {}).items()]
+        return self._api.ApiPipelineSpec(pipeline_id=pipeline_id, parameters=parameters)
+
+    def run_pipeline(self, experiment_id: str, job_name: str, params: dict = None, pipeline_id: str = None,
+                     version_id: str = None, service_account: str = None):
+        body = self._api.ApiRun(
+            name=job_name,
+            pipeline_spec=self._pipeline_spec(params, pipeline_id),
+            resource_references=self._resource_references(experiment_id, version_id),
+            service_account=service_account)
+        return self._run_api.create_run(body=body).run
+
+    def get_run(self, run_id: str):
+        return self._run_api.get_run(run_id=run_id)
+
+    def list_runs(self, page_token: str = "", page_size: int = 10, sort_by: str = "",
+                  experiment_id: str = None, namespace: str = None, filter: str = None):
+        if experiment_id:
+            key_type, key_id = self._api.ApiResourceType.EXPERIMENT, experiment_id
+        elif namespace:
+            key_type, key_id = self._api.ApiResourceType.NAMESPACE, namespace
+        else:
+            key_type, key_id = None, None
+        return self._run_api.list_runs(
+            page_token=page_token, page_size=page_size, sort_by=sort_by, filter=filter,
+            resource_reference_key_type=key_type, resource_reference_key_id=key_id)
+
+    def create_recurring_run(self, experiment_id: str, job_name: str, description: str = None,
+                             start_time: str = None, end_time: str = None, interval_second: int = None,
+                             cron_expression: str = None, max_concurrency: int = 1, no_catchup: bool = None,
+                             params: dict = None, pipeline_id: str = None, version_id: str = None,
+                             enabled: bool = True, service_account: str = None):
+        api = self._api
+        if cron_expression:
+            trigger = api.ApiTrigger(cron_schedule=api.ApiCronSchedule(
+                cron=cron_expression, start_time=start_time, end_time=end_time))
+        else:
+            trigger = api.ApiTrigger(periodic_schedule=api.ApiPeriodicSchedule(
+                interval_second=interval_second, start_time=start_time, end_time=end_time))
+        body = api.ApiJob(
+            name=job_name,
+            description=description,
+            pipeline_spec=self._pipeline_spec(params, pipeline_id),
+            resource_references=self._resource_references(experiment_id, version_id),
+            max_concurrency=max_concurrency,
+            no_catchup=no_catchup,
+            trigger=trigger,
+            enabled=enabled,
+            service_account=service_account)
+        return self._job_api.create_job(body=body)
+
+    def list_recurring_runs(self, page_token: str = "", page_size: int = 10, sort_by: str = "",
+                            experiment_id: str = None, filter: str = None):
+        return self._job_api.list_jobs(
+            page_token=page_token, page_size=page_size, sort_by=sort_by, filter=filter,
+            resource_reference_key_type=self._api.ApiResourceType.EXPERIMENT if experiment_id else None,
+            resource_reference_key_id=experiment_id)
+
+    def archive_run(self, run_id: str):
+        return self._run_api.archive_run(id=run_id)
+
+    def delete_run(self, run_id: str):
+        return self._run_api.delete_run(id=run_id)
+
+    def delete_pipeline(self, pipeline_id: str):
+        return self._pipelines_api.delete_pipeline(id=pipeline_id)
+
+    def delete_pipeline_version(self, version_id: str):
+        return self._pipelines_api.delete_pipeline_version(version_id=version_id)
+
+    def enable_job(self, job_id: str):
+        return self._job_api.enable_job(id=job_id)
+
+    def disable_job(self, job_id: str):
+        return self._job_api.disable_job(id=job_id)
+
+    def delete_job(self, job_id: str):
+        return self._job_api.delete_job(id=job_id)
+
+
+class ClientFactory:
+    """Factory of the clients of a Kubeflow host, and of the resolution cache used with them.
+
+    The authentication follows from the arguments: with an ID token, or an IAP client ID
+    and a service account key in GOOGLE_APPLICATION_CREDENTIALS, the clients are
+    RestClients, which do not need the kfp SDK. IAP tokens come from the shared token
+    cache, so every client of the process reuses one token until it is close to expiry.
+    Without a key file the kfp SDK client is used, as it implements the other IAP
+    authentication flows. Every client retries failed API calls, see ResilientClient.
+
+    client() returns the client shared by every factory of the same host and auth in the
+    process, so the upload, run and lookup calls of an action (and the jobs of a worker)
+    go through one pool of keep-alive connections. new_client() returns a separate one,
+    e.g. for a ClientPool.
+
+    The resolution cache is pluggable: any object with the ResolutionCache interface (e.g.
+    a ResolutionCache or a CatalogIndex) can be given, or a function creating it on first
+    use. By default it is an in-memory ResolutionCache.
+    """
+
+    def __init__(self, kubeflow_url: str, client_id: str = None, existing_token: str = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, pool_size: int = None,
+                 cache: ResolutionCache = None, cache_factory=None):
+        """
+        Arguments:
+            kubeflow_url {str} -- URL of the Kubeflow server
+            client_id {str} -- IAP Client ID for auth
+            existing_token {str} -- ID token for auth to kfp
+            max_retries {int} -- The maximum number of retries of each API call
+            pool_size {int} -- Optional maximum number of pooled connections of a RestClient
+            cache {ResolutionCache} -- Optional resolution cache used with the clients
+            cache_factory {callable} -- Optional function creating the resolution cache on first use
+        """
+        self.kubeflow_url = kubeflow_url
+        self.client_id = client_id
+        self.existing_token = existing_token
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self._cache = cache
+        self._cache_factory = cache_factory or ResolutionCache
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, auth: str = "iap") -> ClientFactory:
+        """Function to create the factory of an action step from its inputs: KUBEFLOW_URL,
+        CLIENT_ID or ID_TOKEN, and CACHE_DIR, CACHE_TTL and CATALOG_INDEX for the cache
+
+        Arguments:
+            auth {str} -- iap to authenticate with CLIENT_ID and the service account key decoded by
+                the entrypoint, or token to authenticate with ID_TOKEN
+
+        Returns:
+            ClientFactory -- The factory
+        """
+        if auth not in AUTH_MODES:
+            raise ValueError(f"Unknown auth {auth}, expected one of {', '.join(AUTH_MODES)}")
+        if auth == "iap":
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = CREDENTIALS_PATH
+        return cls(kubeflow_url=os.getenv("INPUT_KUBEFLOW_URL"),
+                   client_id=os.getenv("INPUT_CLIENT_ID") if auth == "iap" else None,
+                   existing_token=os.getenv("INPUT_ID_TOKEN") if auth == "token" else None,
+                   cache_factory=functools.partial(load_resolution_cache,
+                                                   cache_dir=os.getenv("INPUT_CACHE_DIR"),
+                                                   ttl=int(os.getenv("INPUT_CACHE_TTL") or DEFAULT_CACHE_TTL),
+                                                   catalog_index=os.getenv("INPUT_CATALOG_INDEX")))
+
+    @property
+    def cache(self) -> ResolutionCache:
+        """The resolution cache, created on first use"""
+        with self._lock:
+            if self._cache is None:
+                self._cache = self._cache_factory()
+            return self._cache
+
+    def with_target(self, kubeflow_url: str, client_id: str = None, existing_token: str = None) -> ClientFactory:
+        """Function to return a factory of another host or auth, sharing this factory's cache"""
+        return ClientFactory(kubeflow_url, client_id=client_id, existing_token=existing_token,
+                             max_retries=self.max_retries, pool_size=self.pool_size,
+                             cache_factory=lambda: self.cache)
+
+    def client(self) -> ResilientClient:
+        """Function to return the shared client of the host and auth, created on first use
+
+        Returns:
+            ResilientClient -- The client, with the kfp.Client interface used by these actions
+        """
+        key = (self.kubeflow_url, self.client_id, self.existing_token, self.max_retries, self.pool_size)
+        client = _clients.get(key)
+        if client is None:
+            _evict_expired_clients()
+            # Two threads may both create one, only the first stored is ever returned
+            client = _clients.setdefault(key, self.new_client())
+        return client
+
+    def new_client(self) -> ResilientClient:
+        """Function to create a client which is not shared
+
+        Returns:
+            ResilientClient -- The client, with the kfp.Client interface used by these actions
+        """
+        credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        if self.existing_token:
+            client = RestClient(host=self.kubeflow_url, existing_token=self.existing_token,
+                                pool_size=self.pool_size)
+        elif self.client_id and credentials_path and os.path.exists(credentials_path):
+            client = RestClient(host=self.kubeflow_url, pool_size=self.pool_size,
+                                token_provider=functools.partial(get_id_token, self.client_id))
+        else:
+            import kfp
+
+            client = kfp.Client(host=self.kubeflow_url, client_id=self.client_id)
+        return ResilientClient(client, max_retries=self.max_retries)
+
+
+def _evict_expired_clients():
+    """Function to drop the shared clients of expired ID tokens, which are never used again,
+    so a long running worker does not keep one client per token it was sent"""
+    now = time.time()
+    for key in list(_clients):
+        token = key[2]
+        if not token:
+            continue
+        try:
+            expired = _token_expiry(token) < now
+        except (IndexError, KeyError, ValueError):
+            # Not a JWT, it does not expire as far as we know
+            continue
+        if expired:
+            _clients.pop(key, None)
+
+
+def create_client(kubeflow_url: str, client_id: str = None, existing_token: str = None,
+                  max_retries: int = DEFAULT_MAX_RETRIES) -> ResilientClient:
+    """Function to return the shared client for the Kubeflow Pipelines API, see ClientFactory
+
+    Arguments:
+        kubeflow_url {str} -- URL of the Kubeflow server
+        client_id {str} -- IAP Client ID for auth
+        existing_token {str} -- ID token for auth to kfp
+        max_retries {int} -- The maximum number of retries of each API call
+
+    Returns:
+        ResilientClient -- The client, with the kfp.Client interface used by these actions
+    """
+    return ClientFactory(kubeflow_url, client_id=client_id, existing_token=existing_token,
+                         max_retries=max_retries).client()
+
+
+class AsyncKfpClient:
+    """Asyncio facade over a kfp client.
+
+    The blocking client calls are dispatched to a dedicated thread pool, so independent
+    calls can be awaited concurrently (e.g. with asyncio.gather) and many submissions can
+    share one event loop. The threads share the client's pooled keep-alive connections,
+    so max_concurrency should stay within the client's connection pool size.
+
+    Client methods are available as coroutines, e.g. await async_client.list_runs(...),
+    and any other blocking function can be awaited with run().
+    """
+
+    def __init__(self, client: kfp.Client, max_concurrency: int = 8):
+        """
+        Arguments:
+            client {kfp.Client} -- The kfp client, wrapped in a ResilientClient if it is not one
+            max_concurrency {int} -- The maximum number of blocking calls running at once
+        """
+        self.client = resilient(client)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="kfp-api")
+
+    async def run(self, func, *args, **kwargs):
+        """Function to await a blocking function in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        method = getattr(self.client, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+        return call
+
+    def close(self):
+        """Function to release the thread pool"""
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+def run_with_async_client(client: kfp.Client, coroutine_function, *args, max_concurrency: int = 8, **kwargs):
+    """Function to run a coroutine function taking an AsyncKfpClient from blocking code
+
+    Arguments:
+        client {kfp.Client} -- The kfp client to wrap
+        coroutine_function {callable} -- The coroutine function, called with the AsyncKfpClient first
+        max_concurrency {int} -- The maximum number of blocking calls running at once
+
+    Returns:
+        object -- The result of the coroutine
+    """
+    async def main():
+        async with AsyncKfpClient(client, max_concurrency=max_concurrency) as async_client:
+            return await coroutine_function(async_client, *args, **kwargs)
+    return asyncio.run(main())
+
+
+class ClientPool:
+    """A fixed size pool of kfp clients, which bounds the number of concurrent API calls."""
+
+    def __init__(self, client_factory, size: int = 4):
+        """
+        Arguments:
+            client_factory {callable} -- Function creating a new kfp client
+            size {int} -- The maximum number of clients, and so of concurrent calls
+        """
+        self._client_factory = client_factory
+        self._clients = queue.LifoQueue()
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def client(self):
+        """Context manager lending a client, creating it on first use"""
+        with self._semaphore:
+            try:
+                client = self._clients.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    client = self._client_factory()
+            try:
+                yield client
+            finally:
+                self._clients.put(client)
@@ -0,0 +1,456 @@
+"""Loading and compiling of pipeline functions"""
+from __future__ import annotations
+
+import os
+import json
+import shutil
+import hashlib
+import inspect
+import site
+import zipfile
+import tempfile
+import threading
+import contextlib
+import concurrent.futures
+import multiprocessing
+import traceback
+import importlib.util
+import logging
+import sys
+
+from .constants import COMPILE_CACHE_DIR
+from .telemetry import count, span
+
+
+# Components loaded by each pipeline module as it was executed, keyed by the module path
+_component_loads = {}
+
+
+@contextlib.contextmanager
+def _track_component_loads():
+    """Context manager recording the components loaded with kfp.components: the paths of the
+    spec files, the digests of the spec texts and the URLs"""
+    import kfp.components as components
+    loaded = {"files": [], "texts": [], "urls": []}
+
+    def record(filename=None, url=None, text=None):
+        if filename:
+            loaded["files"].append(os.path.abspath(filename))
+        if url:
+            loaded["urls"].append(url)
+        if text is not None:
+            loaded["texts"].append(hashlib.sha256(str(text).encode()).hexdigest())
+
+    def tracking(load, argument: str):
+        def tracking_load(*args, **kwargs):
+            if argument:
+                record(**{argument: args[0] if args else next(iter(kwargs.values()), None)})
+            else:
+                record(**{key: value for key, value in kwargs.items() if key in ("filename", "url", "text")})
+            return load(*args, **kwargs)
+        return tracking_load
+
+    # The argument recorded by each loader, load_component takes keyword arguments only
+    arguments = {"load_component_from_file": "filename", "load_component_from_text": "text",
+                 "load_component_from_url": "url", "load_component": None}
+    originals = {name: getattr(components, name) for name in arguments if hasattr(components, name)}
+    for name, load in originals.items():
+        setattr(components, name, tracking(load, arguments[name]))
+    try:
+        yield loaded
+    finally:
+        for name, load in originals.items():
+            setattr(components, name, load)
+
+
+@span("stage.load_function")
+def load_function(pipeline_function_name: str, full_path_to_pipeline: str) -> object:
+    """Function to load python function from filepath and filename
+
+    Arguments:
+        pipeline_function_name {str} -- The name of the pipeline function
+        full_path_to_pipeline {str} -- The full path name including the filename of the python file that 
+                                        describes the pipeline you want to run on Kubeflow
+
+    Returns:
+        object -- [description]
+    """
+    logging.info(
+        f"Loading the pipeline function from: {full_path_to_pipeline}")
+    logging.info(
+        f"The name of the pipeline function is: {pipeline_function_name}")
+    sys.path.append(os.path.split(full_path_to_pipeline)[0])
+    spec = importlib.util.spec_from_file_location(
+        pipeline_function_name, full_path_to_pipeline)
+    foo = importlib.util.module_from_spec(spec)
+    with _track_component_loads() as component_loads:
+        spec.loader.exec_module(foo)
+    _component_loads[os.path.abspath(full_path_to_pipeline)] = component_loads
+    pipeline_func = getattr(foo, pipeline_function_name)
+    logging.info("Succesfully loaded the pipeline function.")
+    return pipeline_func
+
+
+def _installed_prefixes() -> tuple:
+    """Function to return the directories of the standard library and installed packages"""
+    prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix, *site.getsitepackages()}
+    with contextlib.suppress(AttributeError):
+        prefixes.add(site.getusersitepackages())
+    return tuple(os.path.join(os.path.abspath(prefix), "") for prefix in prefixes)
+
+
+def _digest_files(digest, paths, base_dir: str):
+    """Function to add the relative paths and contents of files to a digest"""
+    for path in sorted(set(paths)):
+        digest.update(os.path.relpath(path, base_dir).encode())
+        digest.update(b"\0")
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+
+
+def _compile_cache_key(pipeline_function: object, v2_compatible: bool, cache_key_extra: str = None) -> str:
+    """Function to compute the content address of a compiled pipeline.
+
+    The key covers the pipeline module source, the sources of every imported module which
+    is not part of the standard library or an installed package, the components the module
+    loaded as it was executed (spec files and texts), the function name, the compiler mode
+    and the kfp version. Components loaded when compiling are covered by the manifest of
+    the cached pipeline, see _cached_package.
+
+    Arguments:
+        pipeline_function {object} -- The kubeflow pipeline function
+        v2_compatible {bool} -- Whether to compile in V2_COMPATIBLE mode
+        cache_key_extra {str} -- Optional extra value the compiled pipeline depends on
+
+    Returns:
+        str -- The hex digest identifying the compiled pipeline. If None it cannot be cached,
+            e.g. as it loaded a component from a URL
+    """
+    import kfp
+
+    try:
+        source_file = os.path.abspath(inspect.getsourcefile(pipeline_function))
+    except TypeError:
+        return None
+    component_loads = _component_loads.get(source_file, {})
+    if component_loads.get("urls"):
+        logging.info(f"Not caching the compiled pipeline, it loads components from URLs: {component_loads['urls']}")
+        return None
+    pipeline_dir = os.path.dirname(source_file)
+    installed = _installed_prefixes()
+    files = {source_file, *component_loads.get("files", [])}
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and module_file.endswith(".py") and not os.path.abspath(module_file).startswith(installed):
+            files.add(os.path.abspath(module_file))
+
+    digest = hashlib.sha256()
+    for part in (kfp.__version__, pipeline_function.__name__, str(bool(v2_compatible)), cache_key_extra or "",
+                 *sorted(component_loads.get("texts", []))):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    _digest_files(digest, files, pipeline_dir)
+    return digest.hexdigest()
+
+
+def _cached_package(cache_dir: str, cache_key: str) -> str:
+    """Function to return the path of the cached pipeline of a cache key.
+
+    The manifest of the key lists the component spec files loaded when compiling the
+    pipeline, and the digest of their contents is part of the package name.
+    """
+    package_dir = os.path.join(cache_dir, COMPILE_CACHE_DIR)
+    manifest_path = os.path.join(package_dir, cache_key + ".json")
+    files = []
+    if os.path.exists(manifest_path):
+        with contextlib.suppress(OSError, ValueError):
+            with open(manifest_path) as f:
+                files = json.load(f)["files"]
+    if not files:
+        return os.path.join(package_dir, cache_key + ".zip")
+    digest = hashlib.sha256()
+    _digest_files(digest, files, package_dir)
+    return os.path.join(package_dir, f"{cache_key}-{digest.hexdigest()[:16]}.zip")
+
+
+def _store_package(cache_dir: str, cache_key: str, pipeline_name_zip: str, component_files: list) -> str:
+    """Function to move a compiled pipeline into the cache, with the manifest of the
+    component spec files loaded when compiling it, see _cached_package"""
+    manifest_path = os.path.join(cache_dir, COMPILE_CACHE_DIR, cache_key + ".json")
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"files": sorted(set(component_files))}, f)
+    os.replace(tmp_path, manifest_path)
+    cached_zip = _cached_package(cache_dir, cache_key)
+    os.replace(pipeline_name_zip, cached_zip)
+    return cached_zip
+
+
+def _write_package(workflow_path: str, pipeline_name_zip: str, compression_level: int):
+    """Function to zip a compiled workflow at a compression level, as the kfp compiler does"""
+    if compression_level == 0:
+        package = zipfile.ZipFile(pipeline_name_zip, "w", compression=zipfile.ZIP_STORED)
+    else:
+        package = zipfile.ZipFile(pipeline_name_zip, "w", compression=zipfile.ZIP_DEFLATED,
+                                  compresslevel=compression_level)
+    with package:
+        package.write(workflow_path, arcname="pipeline.yaml")
+
+
+@span("stage.pipeline_compile")
+def pipeline_compile(pipeline_function: object,
+                     v2_compatible: bool = False,
+                     cache_dir: str = None,
+                     cache_key_extra: str = None,
+                     output_dir: str = None,
+                     compression_level: int = None) -> str:
+    """Function to compile pipeline. The pipeline is compiled to a zip file. 
+
+    The zip file gets a unique name, so concurrent compiles of the same function never
+    overwrite each other. With a cache_dir a cached pipeline is used in place, and a newly
+    compiled pipeline is written straight into the cache, so the package is never copied.
+    Pipelines loading components from URLs or from spec texts when compiling are not cached.
+
+    Arguments:
+        pipeline_func {object} -- The kubeflow pipeline function
+        v2_compatible {bool} --  Whether to compile in V2_COMPATIBLE mode
+        cache_dir {str} -- Optional directory of previously compiled pipelines, keyed by content
+        cache_key_extra {str} -- Optional extra value the compiled pipeline depends on, e.g. the github sha
+        output_dir {str} -- Optional directory to write the compiled pipeline to, defaults to the temporary directory
+        compression_level {int} -- Optional zip compression level, from 0 (stored) to 9, defaults to the compiler's
+
+    Returns:
+        str -- The path of the compiled kubeflow pipeline
+    """
+    import kfp
+    import kfp.compiler as compiler
+
+    if cache_dir and compression_level is not None:
+        cache_key_extra = f"{cache_key_extra or ''}|zip{compression_level}"
+    cache_key = _compile_cache_key(pipeline_function, v2_compatible, cache_key_extra) if cache_dir else None
+    cached_zip = _cached_package(cache_dir, cache_key) if cache_key else None
+    if cached_zip and os.path.exists(cached_zip):
+        logging.info(f"Reused the compiled pipeline from the cache: {cached_zip} ({os.path.getsize(cached_zip)} bytes)")
+        return cached_zip
+
+    package_dir = os.path.dirname(cached_zip) if cached_zip else output_dir or tempfile.gettempdir()
+    os.makedirs(package_dir, exist_ok=True)
+    fd, pipeline_name_zip = tempfile.mkstemp(prefix=f"{pipeline_function.__name__}-", suffix=".zip", dir=package_dir)
+    os.close(fd)
+    if v2_compatible:
+        c = compiler.Compiler(mode=kfp.dsl.PipelineExecutionMode.V2_COMPATIBLE)
+    else:
+        c = compiler.Compiler()
+    # The pipeline function may load components as it is called by the compiler
+    with _track_component_loads() as component_loads:
+        if compression_level is None:
+            c.compile(pipeline_function, pipeline_name_zip)
+        else:
+            workflow_path = pipeline_name_zip[:-len(".zip")] + ".yaml"
+            c.compile(pipeline_function, workflow_path)
+            _write_package(workflow_path, pipeline_name_zip, compression_level)
+            os.remove(workflow_path)
+    package_size = os.path.getsize(pipeline_name_zip)
+    count("package_bytes", package_size)
+    logging.info(f"The pipeline function is compiled to {pipeline_name_zip} ({package_size} bytes).")
+    if cached_zip and (component_loads["urls"] or component_loads["texts"]):
+        logging.info("Not caching the compiled pipeline, it loads components from URLs or texts when compiled")
+        uncached_zip = os.path.join(output_dir or tempfile.gettempdir(), os.path.basename(pipeline_name_zip))
+        shutil.move(pipeline_name_zip, uncached_zip)
+        return uncached_zip
+    if cached_zip:
+        cached_zip = _store_package(cache_dir, cache_key, pipeline_name_zip, component_loads["files"])
+        logging.info(f"Stored the compiled pipeline in the cache: {cached_zip}")
+        return cached_zip
+    return pipeline_name_zip
+
+
+@span("stage.compile_manifest_entry")
+def _compile_manifest_entry(code_path: str,
+                            function: str,
+                            v2_compatible: bool,
+                            cache_dir: str = None,
+                            github_sha: str = None,
+                            compression_level: int = None,
+                            output_dir: str = None) -> str:
+    """Function to load and compile one manifest pipeline, run in a worker process.
+
+    Each pipeline is compiled to a uniquely named package, so pipelines sharing a function
+    name do not overwrite each other. If github_sha is given the pipeline function is
+    called with it to build versioned pipeline components. Packages which are not cached
+    are written to output_dir, which the caller removes once they are uploaded.
+
+    Returns:
+        str -- The absolute path of the compiled pipeline
+    """
+    pipeline_function = load_function(pipeline_function_name=function, full_path_to_pipeline=code_path)
+    if github_sha:
+        pipeline_function = pipeline_function(github_sha=github_sha)
+    return os.path.abspath(pipeline_compile(pipeline_function=pipeline_function,
+                                            v2_compatible=v2_compatible,
+                                            cache_dir=cache_dir,
+                                            cache_key_extra=github_sha,
+                                            compression_level=compression_level,
+                                            output_dir=output_dir))
+
+
+@contextlib.contextmanager
+def _isolated_imports(warm_prefixes: tuple):
+    """Context manager restoring sys.path on exit, and unloading the modules imported within
+    it unless they were loaded from one of the warm_prefixes directories"""
+    saved_path, saved_modules = list(sys.path), set(sys.modules)
+    try:
+        yield
+    finally:
+        sys.path[:] = saved_path
+        for name in set(sys.modules) - saved_modules:
+            module_file = getattr(sys.modules[name], "__file__", None)
+            if module_file and not os.path.abspath(module_file).startswith(warm_prefixes):
+                del sys.modules[name]
+
+
+def _compile_worker_main(connection):
+    """Main loop of a compile worker process, see CompileWorkerPool.
+
+    The kfp SDK and other installed packages stay imported for the life of the worker. The
+    modules of a pipeline directory (the group) stay imported while the worker compiles
+    pipelines of that directory, and are unloaded when it moves to another group, so local
+    modules of the same name in different directories never clash.
+    """
+    try:
+        import kfp.compiler  # noqa: F401
+    except ImportError:
+        pass
+    installed = tuple({os.path.abspath(path) for path in (sys.prefix, sys.base_prefix, sys.exec_prefix)})
+    group, group_imports = None, contextlib.ExitStack()
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            request = None
+        if request is None:
+            group_imports.close()
+            return
+        if request["group"] != group:
+            group_imports.close()
+            group, group_imports = request["group"], contextlib.ExitStack()
+            group_imports.enter_context(_isolated_imports(installed))
+        try:
+            with _isolated_imports(installed + (os.path.join(group, ""),)):
+                connection.send({"path": _compile_manifest_entry(**request["arguments"])})
+        except Exception as exc:
+            logging.error(traceback.format_exc())
+            connection.send({"error": f"{type(exc).__name__}: {exc}"})
+
+
+class CompileWorkerPool:
+    """Pool of worker processes loading and compiling pipelines, each in its own import state.
+
+    Loading a pipeline executes its module, which may change sys.path, import local modules
+    whose names clash with those of other pipelines, or leave kfp DSL state behind. Each
+    pipeline is therefore loaded and compiled in a worker process, which restores its imports
+    afterwards, and only the path of the compiled package is returned. Workers are started
+    with a fresh interpreter and kept warm: a worker takes the pipelines of the directory it
+    compiled last first, so local modules shared by those pipelines are imported once.
+    """
+
+    def __init__(self, max_workers: int = None):
+        """
+        Arguments:
+            max_workers {int} -- The number of worker processes, defaults to the number of CPUs
+        """
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks = []
+        self._condition = threading.Condition()
+        self._threads = []
+        self._idle = 0
+        self._closed = False
+
+    def submit(self, code_path: str, **arguments) -> concurrent.futures.Future:
+        """Function to queue the compile of a pipeline, see _compile_manifest_entry for the arguments
+
+        Returns:
+            concurrent.futures.Future -- The future path of the compiled pipeline
+        """
+        code_path = os.path.abspath(code_path)
+        future = concurrent.futures.Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The compile worker pool is shut down")
+            self._tasks.append((os.path.dirname(code_path), dict(arguments, code_path=code_path), future))
+            if self._idle < len(self._tasks) and len(self._threads) < self._max_workers:
+                thread = threading.Thread(target=self._run_worker, name=f"kfp-compile-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._condition.notify()
+        return future
+
+    def _next_task(self, group: str):
+        """Function to wait for a task, preferring one of the group the worker compiled last"""
+        with self._condition:
+            self._idle += 1
+            while not self._tasks and not self._closed:
+                self._condition.wait()
+            self._idle -= 1
+            if not self._tasks:
+                return None
+            index = next((index for index, task in enumerate(self._tasks) if task[0] == group), 0)
+            return self._tasks.pop(index)
+
+    def _start_process(self):
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(target=_compile_worker_main, args=(child_connection,), daemon=True)
+        process.start()
+        child_connection.close()
+        return process, connection
+
+    def _run_worker(self):
+        """Function feeding one worker process, restarted if it dies"""
+        process, connection = self._start_process()
+        group = None
+        try:
+            while True:
+                task = self._next_task(group)
+                if task is None:
+                    return
+                group, arguments, future = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    connection.send({"group": group, "arguments": arguments})
+                    reply = connection.recv()
+                except (EOFError, OSError):
+                    process.join()
+                    future.set_exception(RuntimeError(f"The compile worker exited with code {process.exitcode}"))
+                    process, connection = self._start_process()
+                    group = None
+                    continue
+                if "error" in reply:
+                    future.set_exception(RuntimeError(reply["error"]))
+                else:
+                    future.set_result(reply["path"])
+        finally:
+            with contextlib.suppress(OSError):
+                connection.send(None)
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+
+    def shutdown(self, wait: bool = True):
+        """Function to stop the workers once the queued compiles are done"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
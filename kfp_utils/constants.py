@@ -0,0 +1,46 @@
+"""Defaults and markers shared by the kfp_utils modules"""
+
+# Resolved name -> ID mappings are considered fresh for this many seconds
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+RESOLUTION_CACHE_FILE = "resolution-cache.json"
+# A catalog index sync lists everything, dropping deleted resources, when the last full sync is this old
+CATALOG_FULL_SYNC_INTERVAL = 7 * 24 * 60 * 60
+COMPILE_CACHE_DIR = "compile"
+
+# ID tokens are refreshed when they expire in less than this many seconds
+TOKEN_REFRESH_MARGIN = 5 * 60
+TOKEN_CACHE_FILE = "id-tokens.json"
+
+# API calls failing with these HTTP statuses, or with connection errors, are retried
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+DEFAULT_MAX_RETRIES = 4
+# The circuit opens after this many consecutive failed calls to a host, for this many seconds
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+# A resource found when retrying its creation must be at most this many seconds older than
+# the first attempt, allowing for the clock difference between the client and the server
+CREATION_CLOCK_SKEW = 2
+
+# Default socket of the worker, in the home directory which docker action steps share
+WORKER_SOCKET_NAME = "kfp-worker.sock"
+# The environment variables passed from an action step to the worker
+WORKER_ENV_PREFIXES = ("INPUT_", "GITHUB_", "RUNNER_", "OTEL_")
+
+# Run states after which a run no longer changes
+FINISHED_RUN_STATES = ("Succeeded", "Failed", "Error", "Skipped", "Terminated")
+DEFAULT_WAIT_TIMEOUT = 60 * 60
+
+# Marker recorded in pipeline and version descriptions to deduplicate uploads
+PACKAGE_DIGEST_PREFIX = "kfp-package-digest:"
+# Recurring runs created by reconcile_recurring_runs record the digest of their spec in their
+# description, so unchanged jobs are recognised and jobs it manages are told from others
+JOB_SPEC_DIGEST_PREFIX = "kfp-job-spec-digest:"
+# Workflow annotations which change on every compile without changing the pipeline
+VOLATILE_ANNOTATIONS = ("pipelines.kubeflow.org/pipeline_compilation_time",)
+
+# Parameter values with a longer representation are logged summarized
+PARAM_LOG_MAX_LENGTH = 200
+
+# How a deploy to several clusters is judged: every target must succeed, at least one,
+# or every target marked required
+DEPLOY_FAILURE_POLICIES = ("all", "any", "required")
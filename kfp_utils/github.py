@@ -0,0 +1,34 @@
+"""Outputs and job summaries of the GitHub action steps"""
+from __future__ import annotations
+
+import os
+import logging
+
+
+def set_output(name: str, value: str):
+    """Function to set an output of the GitHub action step
+
+    Arguments:
+        name {str} -- The name of the output
+        value {str} -- The value of the output
+    """
+    output_path = os.getenv("GITHUB_OUTPUT")
+    if not output_path:
+        logging.info(f"Output {name}: {value}")
+        return
+    with open(output_path, "a") as f:
+        if "\n" in str(value):
+            f.write(f"{name}<<EOF_{name}\n{value}\nEOF_{name}\n")
+        else:
+            f.write(f"{name}={value}\n")
+
+
+def append_step_summary(markdown: str):
+    """Function to add markdown to the job summary of the GitHub action step
+
+    Arguments:
+        markdown {str} -- The markdown to add
+    """
+    if os.getenv("GITHUB_STEP_SUMMARY"):
+        with open(os.getenv("GITHUB_STEP_SUMMARY"), "a") as f:
+            f.write(markdown)
@@ -0,0 +1,537 @@
+"""Reconciling of recurring runs and garbage collection by retention rules"""
+from __future__ import annotations
+
+import os
+import json
+import collections
+import hashlib
+import functools
+import concurrent.futures
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from .constants import JOB_SPEC_DIGEST_PREFIX
+from .github import append_step_summary, set_output
+from .telemetry import span
+from .listing import _client_host, _format_timestamp, _list_all, _list_filtered, _newest_first
+from .params import read_pipeline_params, yaml_load
+from .cache import ResolutionCache
+from .resilience import is_not_found
+from .pipelines import find_experiment_id, find_pipeline_id, find_pipeline_version_id, forget_resolved_ids
+from .runs import RateLimiter
+
+if TYPE_CHECKING:
+    import kfp
+
+
+def read_recurring_runs(recurring_runs_path: str) -> list:
+    """Function to read the desired recurring runs (jobs) of a reconcile.
+
+    The file is a YAML list with one entry per job, e.g.
+
+        - name: nightly-train
+          pipeline: train                  # name of the pipeline
+          version: train-v2                # optional, defaults to the default version of the pipeline
+          experiment: training             # optional, defaults to EXPERIMENT_NAME
+          cron: "0 0 2 * * *"              # cron schedule, with seconds, or
+          interval: 3600                   # seconds between runs
+          params_path: params.yaml#prod    # optional, see read_pipeline_params
+          params: {epochs: 3}              # optional, overrides params_path
+          max_concurrency: 1               # optional
+          no_catchup: true                 # optional
+          start_time: 2024-01-01T00:00:00Z # optional, as is end_time
+          service_account: pipeline-runner # optional, defaults to PIPELINE_SERVICE_ACCOUNT
+          description: Nightly training    # optional
+          enabled: true                    # optional
+
+    Arguments:
+        recurring_runs_path {str} -- Path to the YAML file
+
+    Returns:
+        list -- The desired jobs
+    """
+    import yaml
+    with open(recurring_runs_path) as f:
+        try:
+            jobs = yaml_load(f) or []
+        except yaml.YAMLError:
+            raise ValueError("The recurring runs could not be loaded correctly.")
+    if not isinstance(jobs, list):
+        raise ValueError("The recurring runs must be a list of jobs.")
+    names = set()
+    for index, job in enumerate(jobs):
+        missing = [key for key in ("name", "pipeline") if not job.get(key)]
+        if missing:
+            raise ValueError(f"Job {index} in the recurring runs is missing: {', '.join(missing)}")
+        if bool(job.get("cron")) == bool(job.get("interval")):
+            raise ValueError(f"The job {job['name']} must have either a cron or an interval schedule")
+        if job["name"] in names:
+            raise ValueError(f"The job {job['name']} is listed twice")
+        names.add(job["name"])
+    logging.info(f"Read {len(jobs)} recurring runs from {recurring_runs_path}")
+    return jobs
+
+
+def _job_spec_digest(spec: dict) -> str:
+    """Function to compute the digest of the resolved spec of a job"""
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _job_description_digest(description: str) -> str:
+    """Function to extract the spec digest recorded in a job description"""
+    for line in (description or "").splitlines():
+        if line.startswith(JOB_SPEC_DIGEST_PREFIX):
+            return line[len(JOB_SPEC_DIGEST_PREFIX):].strip()
+    return None
+
+
+def _list_recurring_runs(client: kfp.Client, experiment_id: str, page_size: int = 100) -> list:
+    """Function to list every job of an experiment"""
+    return _list_all(client.list_recurring_runs, "jobs", page_size, experiment_id=experiment_id)
+
+
+@span("stage.plan_recurring_runs")
+def plan_recurring_runs(client: kfp.Client,
+                        jobs: list,
+                        namespace: str,
+                        experiment_name: str = None,
+                        service_account: str = None,
+                        prune: bool = False,
+                        max_concurrency: int = 8,
+                        cache: ResolutionCache = None) -> list:
+    """Function to compare desired jobs with the jobs of their experiments.
+
+    The pipelines, versions and experiments of the jobs are resolved once each, and the jobs
+    of each experiment are listed once. A job is unchanged when the digest of its resolved
+    spec (pipeline, version, parameters, schedule and options) matches the digest recorded
+    in the description of the existing job of the same name. Other jobs of that name created
+    by an earlier reconcile, left behind when a replaced job could not be deleted, are deleted.
+    Only the experiments of the desired jobs are listed, so the jobs of other experiments
+    are never disabled or deleted.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        jobs {list} -- The desired jobs, see read_recurring_runs
+        namespace {str} -- The Kubeflow namespace of the experiments
+        experiment_name {str} -- Default experiment of the jobs
+        service_account {str} -- Default Kubernetes service account of the jobs
+        prune {bool} -- Whether jobs created by an earlier reconcile and no longer desired are
+            deleted, instead of disabled
+        max_concurrency {int} -- The maximum number of concurrent API calls
+        cache {ResolutionCache} -- Optional cache of resolved IDs
+
+    Returns:
+        list -- One change per job: its name, the action (create, update, enable, disable,
+            delete or unchanged), and the existing job and desired spec it applies to
+    """
+    missing_experiment = [job["name"] for job in jobs if not job.get("experiment") and not experiment_name]
+    if missing_experiment:
+        raise ValueError(f"No experiment given for the jobs: {', '.join(missing_experiment)}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        experiment_names = {job.get("experiment") or experiment_name for job in jobs}
+        experiments = dict(zip(experiment_names, pool.map(
+            lambda name: find_experiment_id(name, namespace, client, cache=cache), experiment_names)))
+        pipeline_names = {job["pipeline"] for job in jobs}
+        pipelines = dict(zip(pipeline_names, pool.map(
+            lambda name: find_pipeline_id(name, client, cache=cache), pipeline_names)))
+        version_keys = {(pipelines[job["pipeline"]], job["version"]) for job in jobs if job.get("version")}
+        versions = dict(zip(version_keys, pool.map(
+            lambda key: find_pipeline_version_id(key[0], key[1], client, cache=cache), version_keys)))
+        existing = dict(zip(experiments.values(), pool.map(
+            lambda experiment_id: _list_recurring_runs(client, experiment_id), experiments.values())))
+
+    changes = []
+    desired = set()
+    for job in jobs:
+        experiment_id = experiments[job.get("experiment") or experiment_name]
+        pipeline_id = pipelines[job["pipeline"]]
+        params = dict(read_pipeline_params(job["params_path"])) if job.get("params_path") else {}
+        params.update(job.get("params") or {})
+        spec = {
+            "experiment_id": experiment_id,
+            "job_name": job["name"],
+            "pipeline_id": None if job.get("version") else pipeline_id,
+            "version_id": versions.get((pipeline_id, job.get("version"))),
+            "params": params,
+            "cron_expression": job.get("cron"),
+            "interval_second": job.get("interval"),
+            "max_concurrency": job.get("max_concurrency", 1),
+            "no_catchup": job.get("no_catchup"),
+            "start_time": job.get("start_time"),
+            "end_time": job.get("end_time"),
+            "service_account": job.get("service_account") or service_account,
+        }
+        digest = _job_spec_digest(spec)
+        spec["description"] = "\n".join(filter(None, (job.get("description"), f"{JOB_SPEC_DIGEST_PREFIX} {digest}")))
+        spec["enabled"] = job.get("enabled", True)
+        desired.add((experiment_id, job["name"]))
+        same_name = [item for item in existing[experiment_id] if item.name == job["name"]]
+        current = next((item for item in same_name if _job_description_digest(item.description) == digest),
+                       same_name[0] if same_name else None)
+        changes.extend({"name": item.name, "action": "delete", "job": item, "spec": None}
+                       for item in same_name if item is not current and _job_description_digest(item.description))
+        if not current:
+            action = "create"
+        elif _job_description_digest(current.description) != digest:
+            action = "update"
+        elif bool(current.enabled) != spec["enabled"]:
+            action = "enable" if spec["enabled"] else "disable"
+        else:
+            action = "unchanged"
+        changes.append({"name": job["name"], "action": action, "job": current, "spec": spec})
+    for experiment_id, items in existing.items():
+        for item in items:
+            if (experiment_id, item.name) in desired or not _job_description_digest(item.description):
+                continue
+            if prune:
+                changes.append({"name": item.name, "action": "delete", "job": item, "spec": None})
+            elif item.enabled:
+                changes.append({"name": item.name, "action": "disable", "job": item, "spec": None})
+    return changes
+
+
+@span("stage.apply_recurring_run_change")
+def _apply_recurring_run_change(client: kfp.Client, change: dict, rate_limiter: RateLimiter) -> str:
+    """Function to make the API calls of one change of a reconcile
+
+    Jobs cannot be modified, an updated job is replaced: the new job is created first, and
+    the old one deleted once it is, so a failure never leaves the job without a schedule.
+
+    Returns:
+        str -- The ID of the job after the change
+    """
+    job, spec = change["job"], change["spec"]
+    job_id = job.id if job else None
+    if change["action"] in ("create", "update"):
+        rate_limiter.wait()
+        job_id = client.create_recurring_run(**spec).id
+    if change["action"] in ("update", "delete"):
+        rate_limiter.wait()
+        try:
+            client.delete_job(job.id)
+        except Exception as exc:
+            if change["action"] == "delete":
+                raise
+            # The next reconcile deletes the old job, as a job of that name not matching the spec
+            raise RuntimeError(f"Created the job {job_id} but failed to delete the job it replaces {job.id}: {exc}")
+    if change["action"] in ("enable", "disable"):
+        rate_limiter.wait()
+        getattr(client, f"{change['action']}_job")(job.id)
+    return job_id
+
+
+def reconcile_recurring_runs(client: kfp.Client,
+                             jobs: list,
+                             namespace: str,
+                             experiment_name: str = None,
+                             service_account: str = None,
+                             prune: bool = False,
+                             dry_run: bool = False,
+                             max_concurrency: int = 8,
+                             rate_limit: float = None,
+                             cache: ResolutionCache = None) -> list:
+    """Function to make the recurring runs of the experiments match the desired jobs.
+
+    Only the changes found by plan_recurring_runs are applied, concurrently: missing jobs are
+    created, changed jobs are replaced (created again, then the old job deleted), and jobs
+    are enabled or disabled. Jobs of the experiments which were created by an earlier reconcile and are no
+    longer desired are disabled, or deleted with prune. Jobs created otherwise are left alone.
+    If changes fail with a 404 while IDs are cached, the names of the jobs are resolved again
+    and the reconcile made once more.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        jobs {list} -- The desired jobs, see read_recurring_runs
+        namespace {str} -- The Kubeflow namespace of the experiments
+        experiment_name {str} -- Default experiment of the jobs
+        service_account {str} -- Default Kubernetes service account of the jobs
+        prune {bool} -- Whether to delete jobs no longer desired instead of disabling them
+        dry_run {bool} -- Whether to only report the changes
+        max_concurrency {int} -- The maximum number of concurrent API calls
+        rate_limit {float} -- Optional maximum number of changes made per second
+        cache {ResolutionCache} -- Optional cache of resolved IDs
+
+    Returns:
+        list -- One result per job: its name, the action, the job ID and any error
+    """
+    rate_limiter = RateLimiter(rate_limit)
+    for attempt in range(2):
+        changes = plan_recurring_runs(client, jobs, namespace, experiment_name=experiment_name,
+                                      service_account=service_account, prune=prune,
+                                      max_concurrency=max_concurrency, cache=cache)
+        results = [{"name": change["name"], "action": change["action"],
+                    "job_id": change["job"].id if change["job"] else None} for change in changes]
+        if dry_run:
+            return results
+        not_found = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = {pool.submit(_apply_recurring_run_change, client, change, rate_limiter): result
+                       for change, result in zip(changes, results) if change["action"] != "unchanged"}
+            for future in concurrent.futures.as_completed(futures):
+                result = futures[future]
+                try:
+                    result["job_id"] = future.result()
+                except Exception as exc:
+                    logging.error(f"Failed to {result['action']} the job {result['name']}: {exc}")
+                    result["error"] = str(exc)
+                    not_found = not_found or is_not_found(exc)
+        if not (cache and not_found) or attempt:
+            return results
+        logging.warning("Changes failed with a 404, reconciling again with the names of the jobs resolved again")
+        for job in jobs:
+            forget_resolved_ids(cache, client, namespace=namespace,
+                                experiment_name=job.get("experiment") or experiment_name,
+                                pipeline_name=job["pipeline"],
+                                pipeline_id=cache.get("pipeline", _client_host(client), job["pipeline"]),
+                                version_name=job.get("version"))
+
+
+def report_recurring_runs(results: list, results_path: str = None, dry_run: bool = False) -> bool:
+    """Function to log the changes of a reconcile, and write them to a JSON file and the step summary
+
+    Arguments:
+        results {list} -- The results returned by reconcile_recurring_runs
+        results_path {str} -- Optional path of the JSON file to write
+        dry_run {bool} -- Whether the changes were only planned
+
+    Returns:
+        bool -- Whether every change succeeded
+    """
+    actions = collections.Counter(result["action"] for result in results)
+    failed = [result for result in results if result.get("error")]
+    for result in results:
+        if result["action"] != "unchanged" or result.get("error"):
+            logging.info(f"{result['action']:>9}  {result['name']}  {result.get('error') or result['job_id'] or ''}")
+    summary = ", ".join(f"{number} {action}" for action, number in sorted(actions.items()))
+    logging.info(f"{'Planned' if dry_run else 'Reconciled'} {len(results)} recurring runs: {summary}"
+                 f"{f', {len(failed)} failed' if failed else ''}")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+        set_output("RESULTS_PATH", results_path)
+    if os.getenv("GITHUB_STEP_SUMMARY"):
+        lines = [f"### Kubeflow recurring runs{' (dry run)' if dry_run else ''}", "", summary, "",
+                 "| Job | Action | Job ID | Error |", "| --- | --- | --- | --- |"]
+        lines += [f"| {result['name']} | {result['action']} | {result['job_id'] or ''} | {result.get('error') or ''} |"
+                  for result in results if result["action"] != "unchanged" or result.get("error")]
+        append_step_summary("\n".join(lines) + "\n")
+    return not failed
+
+
+def read_retention_policy(retention_policy_path: str) -> dict:
+    """Function to read what a garbage collection keeps.
+
+    The file is YAML, e.g.
+
+        pipelines:
+          - prefix: train_pipeline_    # pipelines whose name starts with the prefix
+            keep: 10                   # the newest pipelines kept, older ones are deleted
+            keep_versions: 5           # optional, the newest versions kept of each kept pipeline
+        runs:
+          - experiment: training       # optional, defaults to every run of the namespace
+            archive_after_days: 30     # optional, older runs are archived
+            delete_after_days: 90      # optional, older archived runs are deleted
+
+    Arguments:
+        retention_policy_path {str} -- Path to the YAML file
+
+    Returns:
+        dict -- The policy, with the pipelines and runs rules
+    """
+    import yaml
+    with open(retention_policy_path) as f:
+        try:
+            policy = yaml_load(f) or {}
+        except yaml.YAMLError:
+            raise ValueError("The retention policy could not be loaded correctly.")
+    if not isinstance(policy, dict) or not (policy.get("pipelines") or policy.get("runs")):
+        raise ValueError("The retention policy must have pipelines and/or runs rules.")
+    for index, rule in enumerate(policy.get("pipelines") or []):
+        if not rule.get("prefix") or not isinstance(rule.get("keep"), int) or rule["keep"] < 0:
+            raise ValueError(f"Pipelines rule {index} of the retention policy needs a prefix and a keep count")
+    for index, rule in enumerate(policy.get("runs") or []):
+        if not rule.get("archive_after_days") and not rule.get("delete_after_days"):
+            raise ValueError(f"Runs rule {index} of the retention policy needs archive_after_days or delete_after_days")
+    logging.info(f"Read the retention policy {retention_policy_path}")
+    return policy
+
+
+@span("stage.plan_retention")
+def plan_retention(client: kfp.Client,
+                   policy: dict,
+                   namespace: str = None,
+                   now: datetime = None,
+                   max_concurrency: int = 8,
+                   cache: ResolutionCache = None) -> list:
+    """Function to find the pipelines, versions and runs a retention policy does not keep.
+
+    Pipelines of each prefix are listed once, newest first, and those beyond the keep count
+    are deleted with their versions. The versions of the kept pipelines are listed, and
+    those beyond keep_versions are deleted, except the default version. Runs created before
+    the cutoffs are listed with a server-side filter where available.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        policy {dict} -- The retention policy, see read_retention_policy
+        namespace {str} -- The Kubeflow namespace of the runs
+        now {datetime} -- Optional time the run cutoffs are relative to, defaults to now
+        max_concurrency {int} -- The maximum number of concurrent API calls
+        cache {ResolutionCache} -- Optional cache of resolved IDs, to resolve experiments
+
+    Returns:
+        list -- One change per resource: its kind (pipeline, version or run), the action
+            (delete or archive), its ID, name, creation time and the pipeline of a version
+    """
+    now = now or datetime.now(timezone.utc)
+    changes = []
+
+    def change(kind: str, action: str, item, **extra) -> dict:
+        return dict(kind=kind, action=action, id=item.id, name=item.name,
+                    created_at=_format_timestamp(item.created_at), **extra)
+
+    def plan_versions(pipeline, keep_versions: int) -> list:
+        versions = _newest_first(_list_all(client.list_pipeline_versions, "versions", pipeline_id=pipeline.id,
+                                           sort_by="created_at desc"))
+        default_version = getattr(getattr(pipeline, "default_version", None), "id", None)
+        return [change("version", "delete", version, pipeline_id=pipeline.id, pipeline_name=pipeline.name)
+                for version in versions[keep_versions:] if version.id != default_version]
+
+    def plan_runs(rule: dict) -> list:
+        kwargs = {"namespace": namespace}
+        if rule.get("experiment"):
+            kwargs = {"experiment_id": find_experiment_id(rule["experiment"], namespace, client, cache=cache)}
+        cutoffs = [_format_timestamp(now - timedelta(days=rule[key]))
+                   for key in ("archive_after_days", "delete_after_days") if rule.get(key)]
+        # Only runs created before the newer cutoff of the two can be archived or deleted
+        list_runs = functools.partial(
+            _list_filtered, client.list_runs, "runs",
+            {"op": 6, "key": "created_at", "timestampValue": max(cutoffs)},  # LESS_THAN
+            lambda run: _format_timestamp(run.created_at) < max(cutoffs), sort_by="created_at desc")
+        try:
+            runs = list_runs(**kwargs)
+        except Exception as exc:
+            if not (cache and rule.get("experiment") and is_not_found(exc)):
+                raise
+            forget_resolved_ids(cache, client, namespace=namespace, experiment_name=rule["experiment"])
+            runs = list_runs(experiment_id=find_experiment_id(rule["experiment"], namespace, client, cache=cache))
+        planned = []
+        for run in runs:
+            created_at = _format_timestamp(run.created_at)
+            archived = getattr(run, "storage_state", None) == "STORAGESTATE_ARCHIVED"
+            if rule.get("delete_after_days") and created_at < _format_timestamp(now - timedelta(days=rule["delete_after_days"])) \
+                    and (archived or not rule.get("archive_after_days")):
+                planned.append(change("run", "delete", run))
+            elif rule.get("archive_after_days") and not archived \
+                    and created_at < _format_timestamp(now - timedelta(days=rule["archive_after_days"])):
+                planned.append(change("run", "archive", run))
+        return planned
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        version_plans = []
+        for rule in policy.get("pipelines") or []:
+            pipelines = _newest_first(_list_filtered(
+                client.list_pipelines, "pipelines",
+                {"op": 9, "key": "name", "stringValue": rule["prefix"]},  # IS_SUBSTRING
+                lambda pipeline: pipeline.name.startswith(rule["prefix"]),
+                sort_by="created_at desc"))
+            logging.info(f"Found {len(pipelines)} pipelines named {rule['prefix']}*, keeping {rule['keep']}")
+            changes.extend(change("pipeline", "delete", pipeline) for pipeline in pipelines[rule["keep"]:])
+            if rule.get("keep_versions") is not None:
+                version_plans.extend(pool.submit(plan_versions, pipeline, rule["keep_versions"])
+                                     for pipeline in pipelines[:rule["keep"]])
+        run_plans = [pool.submit(plan_runs, rule) for rule in policy.get("runs") or []]
+        for future in version_plans + run_plans:
+            changes.extend(future.result())
+    return changes
+
+
+@span("stage.apply_retention_change")
+def _apply_retention_change(client: kfp.Client, change: dict, rate_limiter: RateLimiter):
+    """Function to make the API call of one change of a garbage collection"""
+    rate_limiter.wait()
+    if change["kind"] == "pipeline":
+        client.delete_pipeline(change["id"])
+    elif change["kind"] == "version":
+        client.delete_pipeline_version(change["id"])
+    elif change["action"] == "archive":
+        client.archive_run(change["id"])
+    else:
+        client.delete_run(change["id"])
+
+
+def apply_retention(client: kfp.Client,
+                    policy: dict,
+                    namespace: str = None,
+                    dry_run: bool = False,
+                    max_concurrency: int = 8,
+                    rate_limit: float = None,
+                    cache: ResolutionCache = None) -> list:
+    """Function to delete and archive what a retention policy does not keep, see plan_retention.
+
+    The changes are made with concurrent API calls, at most rate_limit per second, and the
+    deleted pipelines and versions are dropped from the cache.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        policy {dict} -- The retention policy, see read_retention_policy
+        namespace {str} -- The Kubeflow namespace of the runs
+        dry_run {bool} -- Whether to only report the changes
+        max_concurrency {int} -- The maximum number of concurrent API calls
+        rate_limit {float} -- Optional maximum number of changes made per second
+        cache {ResolutionCache} -- Optional cache of resolved IDs
+
+    Returns:
+        list -- The changes, with the error of those which failed
+    """
+    changes = plan_retention(client, policy, namespace, max_concurrency=max_concurrency, cache=cache)
+    if dry_run:
+        return changes
+    rate_limiter = RateLimiter(rate_limit)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {pool.submit(_apply_retention_change, client, change, rate_limiter): change for change in changes}
+        for future in concurrent.futures.as_completed(futures):
+            change = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                logging.error(f"Failed to {change['action']} the {change['kind']} {change['name']}: {exc}")
+                change["error"] = str(exc)
+                continue
+            if cache and change["kind"] == "pipeline":
+                cache.invalidate("pipeline", _client_host(client), change["name"])
+            elif cache and change["kind"] == "version":
+                cache.invalidate("version", f"{_client_host(client)}|{change['pipeline_id']}", change["name"])
+    return changes
+
+
+def report_retention(changes: list, results_path: str = None, dry_run: bool = False) -> bool:
+    """Function to log the changes of a garbage collection, and write them to a JSON file and the step summary
+
+    Arguments:
+        changes {list} -- The changes returned by apply_retention
+        results_path {str} -- Optional path of the JSON file to write
+        dry_run {bool} -- Whether the changes were only planned
+
+    Returns:
+        bool -- Whether every change succeeded
+    """
+    totals = collections.Counter((change["kind"], change["action"]) for change in changes)
+    failures = collections.Counter((change["kind"], change["action"]) for change in changes if change.get("error"))
+    for (kind, action), number in sorted(totals.items()):
+        logging.info(f"{'Would ' + action if dry_run else action.capitalize() + 'd'} {number} {kind}s"
+                     f"{f', {failures[kind, action]} failed' if failures[kind, action] else ''}")
+    if not changes:
+        logging.info("Nothing to garbage collect")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(changes, f, indent=2)
+        set_output("RESULTS_PATH", results_path)
+    if os.getenv("GITHUB_STEP_SUMMARY"):
+        lines = [f"### Kubeflow garbage collection{' (dry run)' if dry_run else ''}", "",
+                 "| Kind | Action | Count | Failed |", "| --- | --- | ---: | ---: |"]
+        lines += [f"| {kind} | {action} | {number} | {failures[kind, action]} |"
+                  for (kind, action), number in sorted(totals.items())]
+        append_step_summary("\n".join(lines) + "\n")
+    return not failures
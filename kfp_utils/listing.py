@@ -0,0 +1,141 @@
+"""Name lookups and paging over the list API calls"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from .telemetry import count
+
+if TYPE_CHECKING:
+    import kfp
+
+
+def _client_host(client: kfp.Client) -> str:
+    """Function to return the API host of a client, used to scope cached IDs"""
+    config = getattr(client, "_existing_config", None)
+    return getattr(config, "host", None) or ""
+
+
+def _name_filter(name: str) -> str:
+    """Function to build a KFP API filter matching a resource by exact name"""
+    return json.dumps({
+        "predicates": [{
+            "op": 1,  # EQUALS
+            "key": "name",
+            "stringValue": name,
+        }]
+    })
+
+
+def _find_by_name(list_func, items_attr: str, name: str, page_size: int, page_token: str, **kwargs) -> str:
+    """Function to find the ID of a named resource in a paginated listing, see _find_item_by_name
+
+    Returns:
+        str -- The resource id. If None no match
+    """
+    item = _find_item_by_name(list_func, items_attr, name, page_size, page_token, **kwargs)
+    return item.id if item else None
+
+
+def _find_item_by_name(list_func, items_attr: str, name: str, page_size: int, page_token: str, accept=None,
+                       **kwargs):
+    """Function to find a named resource in a paginated listing.
+
+    The listing is first requested with a server-side name filter, so a lookup normally
+    costs a single request. If the SDK or the server does not support filtering on the
+    listing, it falls back to paging through all resources.
+
+    Arguments:
+        list_func {callable} -- The kfp client list function
+        items_attr {str} -- The attribute of the response holding the resources
+        name {str} -- The name of the resource of interest
+        page_size {int} -- The number of resources to collect a each API request
+        page_token {str} -- The page token to use for the first API request
+
+    Keyword Arguments:
+        accept {callable} -- Optional function a resource of that name must also satisfy
+
+    Returns:
+        object -- The resource. If None no match
+    """
+    start_token = page_token
+    name_filter = _name_filter(name)
+    while True:
+        try:
+            if name_filter:
+                response = list_func(page_size=page_size, page_token=page_token, filter=name_filter, **kwargs)
+            else:
+                response = list_func(page_size=page_size, page_token=page_token, **kwargs)
+        except Exception as exc:
+            # Older SDKs lack the filter argument and older servers reject the filter
+            if not name_filter or not (isinstance(exc, TypeError) or getattr(exc, "status", None) == 400):
+                raise
+            logging.info(f"Server-side filtering unavailable ({exc}), falling back to paging")
+            name_filter = None
+            page_token = start_token
+            continue
+        count(f"pages.{items_attr}")
+        for item in getattr(response, items_attr) or []:
+            if item.name == name and (accept is None or accept(item)):
+                return item
+        # Start need to know where to do next itteration from
+        page_token = response.next_page_token
+        # If no next token break
+        if not page_token:
+            return None
+
+
+def _list_all(list_func, items_attr: str, page_size: int = 100, **kwargs) -> list:
+    """Function to collect every resource of a paginated listing
+
+    Arguments:
+        list_func {callable} -- The kfp client list function
+        items_attr {str} -- The attribute of the response holding the resources
+        page_size {int} -- The number of resources to collect a each API request
+
+    Returns:
+        list -- The resources
+    """
+    items, page_token = [], ""
+    while True:
+        response = list_func(page_size=page_size, page_token=page_token, **kwargs)
+        count(f"pages.{items_attr}")
+        items.extend(getattr(response, items_attr) or [])
+        page_token = response.next_page_token
+        if not page_token:
+            return items
+
+
+def _list_filtered(list_func, items_attr: str, predicate: dict, accept, **kwargs) -> list:
+    """Function to list the resources matching a filter predicate.
+
+    The listing is filtered server-side when the SDK and server support it, and accept is
+    applied to the listed resources in any case.
+    """
+    try:
+        items = _list_all(list_func, items_attr, filter=json.dumps({"predicates": [predicate]}), **kwargs)
+    except Exception as exc:
+        if not (isinstance(exc, TypeError) or getattr(exc, "status", None) == 400):
+            raise
+        logging.info(f"Server-side filtering unavailable ({exc}), listing every resource")
+        items = _list_all(list_func, items_attr, **kwargs)
+    return [item for item in items if accept(item)]
+
+
+def _newest_first(items: list) -> list:
+    return sorted(items, key=lambda item: _format_timestamp(item.created_at), reverse=True)
+
+
+def _format_timestamp(value) -> str:
+    """Function to format an API timestamp (datetime or string) so that they sort as strings"""
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return str(value or "")
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
@@ -0,0 +1,53 @@
+"""Digests of compiled pipeline packages"""
+from __future__ import annotations
+
+import json
+import hashlib
+import zipfile
+import tarfile
+
+from .constants import PACKAGE_DIGEST_PREFIX, VOLATILE_ANNOTATIONS
+from .params import yaml_load
+
+
+def _read_package_workflow(pipeline_name_zip: str) -> dict:
+    """Function to read the workflow from a compiled pipeline package (zip, tar.gz or yaml)"""
+    if zipfile.is_zipfile(pipeline_name_zip):
+        with zipfile.ZipFile(pipeline_name_zip) as package:
+            member = next(name for name in package.namelist() if name.endswith((".yaml", ".yml", ".json")))
+            return yaml_load(package.read(member))
+    if tarfile.is_tarfile(pipeline_name_zip):
+        with tarfile.open(pipeline_name_zip) as package:
+            member = next(info for info in package.getmembers() if info.isfile())
+            return yaml_load(package.extractfile(member).read())
+    with open(pipeline_name_zip) as f:
+        return yaml_load(f)
+
+
+def package_digest(pipeline_name_zip: str) -> str:
+    """Function to compute a canonical digest of a compiled pipeline package.
+
+    The digest is taken over the workflow itself rather than the archive bytes, with keys
+    sorted and compile timestamps removed, so recompiling an unchanged pipeline gives the
+    same digest.
+
+    Arguments:
+        pipeline_name_zip {str} -- The name of the compiled pipeline
+
+    Returns:
+        str -- The digest, formatted as sha256:<hex>
+    """
+    workflow = _read_package_workflow(pipeline_name_zip)
+    annotations = (workflow.get("metadata") or {}).get("annotations") or {}
+    for annotation in VOLATILE_ANNOTATIONS:
+        annotations.pop(annotation, None)
+    canonical = json.dumps(workflow, sort_keys=True, separators=(",", ":"), default=str)
+    return "sha256:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _description_digest(description: str) -> str:
+    """Function to extract the package digest recorded in a pipeline or version description"""
+    for line in (description or "").splitlines():
+        if line.startswith(PACKAGE_DIGEST_PREFIX):
+            return line[len(PACKAGE_DIGEST_PREFIX):].strip()
+    return None
@@ -0,0 +1,199 @@
+"""Reading and merging of pipeline parameters"""
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import itertools
+import logging
+
+from .constants import PARAM_LOG_MAX_LENGTH
+
+
+# Parsed parameter files, keyed by the absolute path, see _read_params_documents
+_params_cache = {}
+
+
+def _yaml_loader():
+    """Function to return the libyaml based safe loader when PyYAML was built with it"""
+    import yaml
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def yaml_load(stream):
+    """Function to safely load one YAML document, with the C loader when available"""
+    import yaml
+    return yaml.load(stream, Loader=_yaml_loader())
+
+
+def _parse_params_documents(pipeline_parameters_path: str, content: bytes) -> list:
+    """Function to parse the documents of a parameters file, by extension: .json, .jsonl or YAML"""
+    import yaml
+    if pipeline_parameters_path.endswith(".jsonl"):
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    if pipeline_parameters_path.endswith(".json"):
+        return [json.loads(content)]
+    return [document for document in yaml.load_all(content, Loader=_yaml_loader()) if document is not None]
+
+
+def _read_params_documents(pipeline_parameters_path: str) -> list:
+    """Function to read the parsed documents of a parameters file, cached by modification time and content.
+
+    An unchanged file (same modification time and size) is not read again. A touched file
+    is read and hashed, and only parsed again if its content changed.
+    """
+    path = os.path.abspath(pipeline_parameters_path)
+    stat = os.stat(path)
+    cached = _params_cache.get(path)
+    if cached and cached["mtime"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+        return cached["documents"]
+    with open(path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if not cached or cached["digest"] != digest:
+        cached = {"digest": digest, "documents": _parse_params_documents(path, content)}
+    cached.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+    _params_cache[path] = cached
+    return cached["documents"]
+
+
+def read_pipeline_params(pipeline_parameters_path: str) -> dict:
+    """Function to read pipeline parameters from YAML, JSON or JSONL
+
+    Files with several documents (multi-document YAML or JSONL) are merged in order, later
+    documents overriding earlier ones. A key may be appended to the path, as in
+    params.yaml#staging, to select the parameters under that top-level key, merged from the
+    documents defining it. The path is only split at its last "#", and only if the part before
+    it is an existing file. Parsed files are cached, see _read_params_documents.
+
+    Arguments:
+        pipeline_parameters_path {str} -- Path to YAML file containing set parameters, optionally followed by #key
+    Returns:
+        dict -- Dictionary containing the parameters
+    """
+    import yaml
+    path, _, key = pipeline_parameters_path.rpartition("#")
+    if not (key and os.path.isfile(path)):
+        # A "#" in the file name itself is not a key
+        path, key = pipeline_parameters_path, ""
+    try:
+        documents = _read_params_documents(path)
+    except (yaml.YAMLError, ValueError):
+        logging.info("The yaml parameters could not be loaded correctly.")
+        raise ValueError(
+            "The yaml parameters could not be loaded correctly.")
+    if key:
+        documents = [document[key] for document in documents if isinstance(document, dict) and key in document]
+        if not documents:
+            raise ValueError(f"No parameters under the key {key} in {path}")
+    pipeline_params = {}
+    for document in documents:
+        if not isinstance(document, dict):
+            raise ValueError(f"The parameters in {pipeline_parameters_path} must be a mapping.")
+        pipeline_params.update(document)
+    logging.info(f"Read {len(pipeline_params)} parameters from {pipeline_parameters_path}")
+    return pipeline_params
+
+
+def parse_raw_params(pipeline_params: str) -> dict:
+    """Function to parse raw YAML string into parameters dict
+
+    Arguments:
+        pipeline_params {str} -- Raw YAML string containing set parameters
+    Returns:
+        dict -- Dictionary containing the parameters
+    """
+    result = yaml_load(pipeline_params)
+    logging.info(f"Parsed {len(result or {})} parameters from a raw string of {len(pipeline_params)} characters")
+    return result
+
+
+def summarize_params(pipeline_params: dict, max_length: int = PARAM_LOG_MAX_LENGTH) -> dict:
+    """Function to shorten parameter values for logging.
+
+    Values whose representation is longer than max_length are replaced by their type, size
+    and digest, so large embedded data does not flood the logs but changes stay visible.
+
+    Arguments:
+        pipeline_params {dict} -- The parameters
+        max_length {int} -- The longest value representation logged in full
+
+    Returns:
+        dict -- The parameters with long values summarized
+    """
+    summary = {}
+    for name, value in (pipeline_params or {}).items():
+        try:
+            text = value if isinstance(value, str) else json.dumps(value, default=str, sort_keys=True)
+        except TypeError:
+            # Keys of mixed types, e.g. {1: a, "x": b}, cannot be sorted
+            text = json.dumps(value, default=str)
+        if len(text) <= max_length:
+            summary[name] = value
+            continue
+        size = f"{len(value)} items" if isinstance(value, (list, dict)) else f"{len(text)} chars"
+        digest = hashlib.sha256(text.encode()).hexdigest()[:12]
+        summary[name] = f"<{type(value).__name__}, {size}, sha256:{digest}> {text[:max_length // 2]}..."
+    return summary
+
+
+def merge_pipeline_params(pipeline_parameters_path: str, pipeline_parameters: str) -> dict:
+    """Function to merge the parameters from a YAML file with the parameters passed directly
+
+    Arguments:
+        pipeline_parameters_path {str} -- Optional path to parameters YAML file
+        pipeline_parameters {str} -- Optional raw YAML string, overriding matching keys in the file
+    Returns:
+        dict -- Dictionary containing the merged parameters
+    """
+    file_pipeline_params = {} if not pipeline_parameters_path else read_pipeline_params(pipeline_parameters_path)
+    raw_pipeline_params = {} if not pipeline_parameters else parse_raw_params(pipeline_parameters)
+    pipeline_params = file_pipeline_params.copy()
+    pipeline_params.update(raw_pipeline_params)
+    logging.info(f"Merged parameters (overridden directly: {sorted(raw_pipeline_params)}): "
+                 f"{summarize_params(pipeline_params)}")
+    return pipeline_params
+
+
+def read_parameter_sweep(sweep_path: str):
+    """Function to read the parameter sets of a sweep, one set per run.
+
+    A .jsonl file is streamed from disk with one JSON object per line. Otherwise the file
+    is YAML, either a list of parameter sets or a mapping with a grid of values to take
+    the cartesian product of and/or an explicit list of runs, e.g.
+
+        grid:
+          learning_rate: [0.1, 0.01]
+          batch_size: [32, 64]
+        runs:
+          - {learning_rate: 0.001, batch_size: 128}
+
+    Arguments:
+        sweep_path {str} -- Path to the YAML or JSONL sweep file
+
+    Returns:
+        iterator -- The parameter sets, as dictionaries
+    """
+    import yaml
+    if sweep_path.endswith(".jsonl"):
+        with open(sweep_path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(sweep_path) as f:
+        try:
+            sweep = yaml_load(f) or []
+        except yaml.YAMLError:
+            raise ValueError("The parameter sweep could not be loaded correctly.")
+    if isinstance(sweep, list):
+        yield from sweep
+        return
+    if not isinstance(sweep, dict) or not ("grid" in sweep or "runs" in sweep):
+        raise ValueError("The parameter sweep must be a list of parameter sets, or define a grid and/or runs.")
+    grid = sweep.get("grid") or {}
+    if grid:
+        names = list(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            yield dict(zip(names, values))
+    yield from sweep.get("runs") or []
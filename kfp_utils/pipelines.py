@@ -0,0 +1,364 @@
+"""Uploading and finding pipelines, versions and experiments"""
+from __future__ import annotations
+
+import os
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from .constants import PACKAGE_DIGEST_PREFIX
+from .telemetry import count, span
+from .listing import _client_host, _find_by_name
+from .packages import _description_digest, package_digest
+from .cache import ResolutionCache
+from .resilience import is_not_found
+from .client import AsyncKfpClient, create_client, run_with_async_client
+
+if TYPE_CHECKING:
+    import kfp
+
+
+@span("stage.find_pipeline_version_by_digest")
+def find_pipeline_version_by_digest(pipeline_id: str,
+                                    digest: str,
+                                    client: kfp.Client,
+                                    page_size: int = 100,
+                                    cache: ResolutionCache = None) -> str:
+    """Function to find a pipeline version which was uploaded from an identical package.
+
+    Versions are listed newest first, as a matching version is usually a recent one.
+
+    Arguments:
+        pipeline_id {str} -- The ID of the pipeline of interest
+        digest {str} -- The package digest, see package_digest
+        client {kfp.Client} -- The kfp client
+        page_size {int} -- The number of pipeline versions to collect a each API request
+
+    Keyword Arguments:
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+
+    Returns:
+        str -- The pipeline version id. If None no match
+    """
+    scope = f"{_client_host(client)}|{pipeline_id}"
+    version_id = cache.get("digest", scope, digest) if cache else None
+    if version_id:
+        return version_id
+    page_token = ""
+    while True:
+        versions = client.list_pipeline_versions(
+            pipeline_id=pipeline_id, page_size=page_size, page_token=page_token, sort_by="created_at desc")
+        count("pages.versions")
+        for version in versions.versions or []:
+            if _description_digest(version.description) == digest:
+                if cache:
+                    cache.put("digest", scope, digest, version.id)
+                return version.id
+        page_token = versions.next_page_token
+        if not page_token:
+            return None
+
+
+def _find_pipeline_id_or_none(pipeline_name: str, client: kfp.Client, cache: ResolutionCache = None) -> str:
+    try:
+        return find_pipeline_id(pipeline_name, client, cache=cache)
+    except ValueError:
+        return None
+
+
+async def upload_package_async(async_client: AsyncKfpClient,
+                               pipeline_name_zip: str,
+                               pipeline_name: str,
+                               pipeline_version_name: str = None,
+                               cache: ResolutionCache = None,
+                               deduplicate: bool = False) -> tuple:
+    """Function to upload a compiled pipeline as a new pipeline, or as a new version of it.
+
+    The package digest is computed while the pipeline is looked up. If uploading a version
+    fails with a 404 while the pipeline ID is cached, the pipeline is looked up again and the
+    upload made once more.
+
+    Arguments:
+        async_client {AsyncKfpClient} -- The async kfp client
+        pipeline_name_zip {str} -- The name of the compiled pipeline
+        pipeline_name {str} -- The name of the pipeline
+        pipeline_version_name {str} -- Optional name of the pipeline version
+
+    Keyword Arguments:
+        cache {ResolutionCache} -- Optional cache of resolved IDs, updated with the uploaded IDs
+        deduplicate {bool} -- Whether to reuse an existing pipeline or version uploaded from an
+            identical package instead of uploading it again, whatever the name of that version
+
+    Returns:
+        tuple -- The pipeline id and the pipeline version id (None if no version was uploaded)
+    """
+    client = async_client.client
+    scope = _client_host(client)
+    lookup_pipeline = pipeline_version_name or deduplicate
+    digest, pipeline_id = await asyncio.gather(
+        async_client.run(package_digest, pipeline_name_zip) if deduplicate else asyncio.sleep(0),
+        async_client.run(_find_pipeline_id_or_none, pipeline_name, client, cache) if lookup_pipeline else asyncio.sleep(0))
+    description = f"{PACKAGE_DIGEST_PREFIX} {digest}" if digest else None
+    package_size = os.path.getsize(pipeline_name_zip)
+
+    async def upload_version(pipeline_id: str) -> tuple:
+        if not pipeline_id:
+            response = await async_client.upload_pipeline(
+                pipeline_package_path=pipeline_name_zip,
+                pipeline_name=pipeline_name,
+                description=description)
+            count("upload_bytes", package_size)
+            pipeline_id = response.id
+            if cache:
+                cache.put("pipeline", scope, pipeline_name, pipeline_id)
+        elif digest:
+            version_id = await async_client.run(
+                find_pipeline_version_by_digest, pipeline_id, digest, client, cache=cache)
+            if version_id:
+                logging.info(f"Skipped the upload of {pipeline_version_name}, an identical package is already "
+                             f"version {version_id}")
+                return pipeline_id, version_id
+        version = await async_client.upload_pipeline_version(
+            pipeline_package_path=pipeline_name_zip,
+            pipeline_version_name=pipeline_version_name,
+            pipeline_id=pipeline_id,
+            description=description)
+        count("upload_bytes", package_size)
+        if cache:
+            cache.put("version", f"{scope}|{pipeline_id}", pipeline_version_name, version.id)
+            if digest:
+                cache.put("digest", f"{scope}|{pipeline_id}", digest, version.id)
+        return pipeline_id, version.id
+
+    if pipeline_version_name:
+        try:
+            return await upload_version(pipeline_id)
+        except Exception as exc:
+            if not (cache and pipeline_id and is_not_found(exc)):
+                raise
+            forget_resolved_ids(cache, client, pipeline_name=pipeline_name)
+            fresh_pipeline_id = await async_client.run(_find_pipeline_id_or_none, pipeline_name, client, cache)
+            if fresh_pipeline_id == pipeline_id:
+                raise
+            logging.warning(f"The cached pipeline {pipeline_id} no longer exists, "
+                            f"uploading to {fresh_pipeline_id or 'a new pipeline'}")
+            return await upload_version(fresh_pipeline_id)
+
+    if pipeline_id and digest:
+        try:
+            pipeline = await async_client.get_pipeline(pipeline_id)
+        except Exception as exc:
+            if not (cache and is_not_found(exc)):
+                raise
+            forget_resolved_ids(cache, client, pipeline_name=pipeline_name)
+            pipeline_id = await async_client.run(_find_pipeline_id_or_none, pipeline_name, client, cache)
+            pipeline = await async_client.get_pipeline(pipeline_id) if pipeline_id else None
+        if pipeline and _description_digest(pipeline.description) == digest:
+            logging.info(f"Skipped the upload, an identical package is already pipeline {pipeline_id}")
+            return pipeline_id, None
+    response = await async_client.upload_pipeline(
+        pipeline_package_path=pipeline_name_zip,
+        pipeline_name=pipeline_name,
+        description=description)
+    count("upload_bytes", package_size)
+    if cache:
+        cache.put("pipeline", scope, pipeline_name, response.id)
+    return response.id, None
+
+
+@span("stage.upload")
+def _upload_package(client: kfp.Client,
+                    pipeline_name_zip: str,
+                    pipeline_name: str,
+                    pipeline_version_name: str = None,
+                    cache: ResolutionCache = None,
+                    deduplicate: bool = False) -> tuple:
+    """Function to upload a compiled pipeline, see upload_package_async"""
+    return run_with_async_client(client, upload_package_async, pipeline_name_zip, pipeline_name,
+                                 pipeline_version_name, cache=cache, deduplicate=deduplicate)
+
+
+def upload_pipeline(pipeline_name_zip: str,
+                    pipeline_name: str,
+                    kubeflow_url: str,
+                    client_id: str = None,
+                    pipeline_version_name: str = None,
+                    cache: ResolutionCache = None,
+                    deduplicate: bool = False,
+                    existing_token: str = None) -> tuple:
+    """Function to upload pipeline to kubeflow, authenticated with an IAP client ID or an ID token.
+
+    Arguments:
+        pipeline_name_zip {str} -- The name of the compiled pipeline
+        pipeline_name {str} -- The name of the pipeline. This will be the name in the kubeflow UI.
+        kubeflow_url {str} -- URL of the Kubeflow server
+        client_id {str} -- IAP Client ID for auth
+        pipeline_version_name {str} -- The name of the pipeline version. This will be the name of
+            this version in the kubeflow UI.
+        cache {ResolutionCache} -- Optional cache of resolved IDs, updated with the uploaded IDs
+        deduplicate {bool} -- Whether to skip the upload when an identical package is already on the server
+        existing_token {str} -- ID token for auth to kfp, used instead of client_id
+
+    Returns:
+        tuple -- The client used (see create_client), the pipeline id and the pipeline version id
+            (None if no version was uploaded). With deduplicate the IDs may be those of an
+            identical pipeline or version already on the server
+    """
+    client = create_client(kubeflow_url, client_id=client_id, existing_token=existing_token)
+    pipeline_id, version_id = _upload_package(client, pipeline_name_zip, pipeline_name, pipeline_version_name,
+                                              cache=cache, deduplicate=deduplicate)
+    return client, pipeline_id, version_id
+
+
+def upload_pipeline_by_token(pipeline_name_zip: str,
+                             pipeline_name: str,
+                             kubeflow_url: str,
+                             existing_token: str,
+                             pipeline_version_name: str = None,
+                             cache: ResolutionCache = None,
+                             deduplicate: bool = False) -> tuple:
+    """Function to upload pipeline to kubeflow with an ID token, see upload_pipeline"""
+    return upload_pipeline(pipeline_name_zip, pipeline_name, kubeflow_url,
+                           pipeline_version_name=pipeline_version_name, cache=cache,
+                           deduplicate=deduplicate, existing_token=existing_token)
+
+
+@span("stage.find_pipeline_id")
+def find_pipeline_id(pipeline_name: str,
+                     client: kfp.Client,
+                     page_size: str = 100,
+                     page_token: str = "",
+                     cache: ResolutionCache = None) -> str:
+    """Function to find the pipeline id of a pipeline. 
+
+    Arguments:
+        pipeline_name {str} -- The name of the pipeline of interest
+        client {kfp.Client} -- The kfp client
+        page_size {str} -- The number of pipelines to collect a each API request
+
+    Keyword Arguments:
+        page_token {str} -- The page token to use for the API request (default: {" "})
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+
+    Returns:
+        [type] -- The pipeline id. If None no match
+    """
+    scope = _client_host(client)
+    pipeline_id = cache.get("pipeline", scope, pipeline_name) if cache else None
+    if pipeline_id:
+        logging.info(f"The pipeline id is: {pipeline_id} (cached)")
+        return pipeline_id
+    logging.info(f"Searching for pipeline name {pipeline_name}")
+    pipeline_id = _find_by_name(client.list_pipelines, "pipelines", pipeline_name, page_size, page_token)
+    if not pipeline_id:
+        raise ValueError("Failed to find pipeline with the name: {}".format(
+            pipeline_name))
+    logging.info(f"The pipeline id is: {pipeline_id}")
+    if cache:
+        cache.put("pipeline", scope, pipeline_name, pipeline_id)
+    return pipeline_id
+
+
+@span("stage.find_pipeline_version_id")
+def find_pipeline_version_id(pipeline_id: str,
+                             version_name: str,
+                             client: kfp.Client,
+                             page_size: str = 100,
+                             page_token: str = "",
+                             cache: ResolutionCache = None) -> str:
+    """Function to find the pipeline id of a pipeline.
+
+    Arguments:
+        pipeline_id {str} -- The ID of the pipeline of interest
+        version_name -- The name of the version of interest
+        client {kfp.Client} -- The kfp client
+        page_size {str} -- The number of pipeline versions to collect a each API request
+
+    Keyword Arguments:
+        page_token {str} -- The page token to use for the API request (default: {" "})
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+
+    Returns:
+        [type] -- The pipeline version id. If None no match
+    """
+    scope = f"{_client_host(client)}|{pipeline_id}"
+    version_id = cache.get("version", scope, version_name) if cache else None
+    if version_id:
+        logging.info(f"The pipeline version id is: {version_id} (cached)")
+        return version_id
+    logging.info(f"Retrieving versions for pipeline ID {pipeline_id}")
+    version_id = _find_by_name(client.list_pipeline_versions, "versions", version_name, page_size, page_token,
+                               pipeline_id=pipeline_id)
+    if not version_id:
+        raise ValueError("Failed to find pipeline version with the name: {}".format(
+            version_name))
+    logging.info(f"The pipeline version id is: {version_id}")
+    if cache:
+        cache.put("version", scope, version_name, version_id)
+    return version_id
+
+
+@span("stage.find_experiment_id")
+def find_experiment_id(experiment_name: str,
+                       namespace: str,
+                       client: kfp.Client,
+                       page_size: int = 100,
+                       page_token: str = "",
+                       cache: ResolutionCache = None) -> str:
+    """Function to return the experiment id
+
+    Arguments:
+        experiment_name {str} -- The experiment name
+        namespace {str} -- The namespace to search for the experiment
+        client {kfp.Client} -- The kfp client
+        page_size {str} -- The number of experiments to collect a each API request
+
+    Keyword Arguments:
+        page_token {str} -- The page token to use for the API request (default: {" "})
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+
+    Returns:
+        str -- The experiment id
+    """
+    scope = f"{_client_host(client)}|{namespace}"
+    experiment_id = cache.get("experiment", scope, experiment_name) if cache else None
+    if experiment_id:
+        logging.info("Succesfully collected the experiment id (cached)")
+        return experiment_id
+    experiment_id = _find_by_name(client.list_experiments, "experiments", experiment_name, page_size, page_token,
+                                  namespace=namespace)
+    if not experiment_id:
+        raise ValueError("Failed to find experiment with the name: {}".format(
+            experiment_name))
+    logging.info("Succesfully collected the experiment id")
+    if cache:
+        cache.put("experiment", scope, experiment_name, experiment_id)
+    return experiment_id
+
+
+def forget_resolved_ids(cache: ResolutionCache,
+                        client: kfp.Client,
+                        namespace: str = None,
+                        experiment_name: str = None,
+                        pipeline_name: str = None,
+                        pipeline_id: str = None,
+                        version_name: str = None):
+    """Function to drop cached IDs, after a call using them failed with a 404, so that the
+    names are resolved again
+
+    Arguments:
+        cache {ResolutionCache} -- The cache of resolved IDs
+        client {kfp.Client} -- The kfp client
+        namespace {str} -- The namespace of the experiment
+        experiment_name {str} -- Optional name of the experiment to forget
+        pipeline_name {str} -- Optional name of the pipeline to forget
+        pipeline_id {str} -- The ID of the pipeline of the version
+        version_name {str} -- Optional name of the pipeline version to forget
+    """
+    scope = _client_host(client)
+    if experiment_name:
+        cache.invalidate("experiment", f"{scope}|{namespace}", experiment_name)
+    if pipeline_name:
+        cache.invalidate("pipeline", scope, pipeline_name)
+    if pipeline_id and version_name:
+        cache.invalidate("version", f"{scope}|{pipeline_id}", version_name)
@@ -0,0 +1,321 @@
+"""Retries, circuit breaking and idempotency checks of API calls"""
+from __future__ import annotations
+
+import functools
+import time
+from datetime import datetime, timezone
+import inspect
+import random
+import threading
+import logging
+from typing import TYPE_CHECKING
+
+from .constants import (
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CREATION_CLOCK_SKEW, DEFAULT_MAX_RETRIES, RETRYABLE_STATUSES)
+from .telemetry import call_stats, CallStats, span
+from .listing import _client_host, _find_item_by_name, _format_timestamp
+
+if TYPE_CHECKING:
+    import kfp
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a host which failed too many consecutive calls"""
+
+
+class CircuitBreaker:
+    """Thread safe circuit breaker for the calls to one host.
+
+    After failure_threshold consecutive failed calls the circuit opens and calls fail fast
+    for reset_timeout seconds. A single trial call is then let through, which closes the
+    circuit if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        """
+        Arguments:
+            failure_threshold {int} -- The number of consecutive failures opening the circuit
+            reset_timeout {float} -- The number of seconds the circuit stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Function to check a call may be made, raises CircuitOpenError otherwise"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"Circuit open after {self._failures} consecutive failures, not calling the API")
+            # Half open: let this call through and fail fast on the others until it returns
+            self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(f"Opening the circuit after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+# Circuit breakers shared by the clients of each host
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    """Function to return the circuit breaker shared by the clients of a host"""
+    with _circuit_breakers_lock:
+        return _circuit_breakers.setdefault(host, CircuitBreaker())
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Function to decide whether a failed API call may succeed when retried
+
+    Arguments:
+        exc {Exception} -- The exception raised by the call
+
+    Returns:
+        bool -- True for throttling, server and gateway errors and for connection errors
+    """
+    status = getattr(exc, "status", None)
+    if status:
+        return status in RETRYABLE_STATUSES
+    # urllib3 raises its own exception types for connection, protocol and read errors
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__module__ == "urllib3.exceptions"
+
+
+def is_not_found(exc: Exception) -> bool:
+    """Function to decide whether an API call failed because a resource it refers to does not exist,
+    e.g. one whose cached ID is stale"""
+    return getattr(exc, "status", None) == 404
+
+
+def _retry_after(exc: Exception) -> float:
+    """Function to read the number of seconds to wait from the Retry-After header of an error"""
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def call_with_retry(func, *args,
+                    operation: str = None,
+                    max_retries: int = DEFAULT_MAX_RETRIES,
+                    base_delay: float = 0.5,
+                    max_delay: float = 30.0,
+                    check_existing=None,
+                    breaker: CircuitBreaker = None,
+                    stats: CallStats = None,
+                    on_retry=None,
+                    **kwargs):
+    """Function to call an API operation, retrying retryable failures.
+
+    Retries wait with exponential backoff and full jitter, or as long as the server asks
+    with a Retry-After header. Operations which are not idempotent (uploads and run
+    creation) may have succeeded on the server even though the call failed, e.g. when
+    the response was lost by the proxy, so they are only retried with a check_existing
+    function, which is called before every retry and whose result, if any, is returned
+    instead of repeating the operation.
+
+    Arguments:
+        func {callable} -- The API operation
+
+    Keyword Arguments:
+        operation {str} -- The name of the operation in the statistics, defaults to the function name
+        max_retries {int} -- The maximum number of retries
+        base_delay {float} -- The delay before the first retry in seconds
+        max_delay {float} -- The maximum delay between two attempts in seconds
+        check_existing {callable} -- Function returning the result of an earlier attempt
+            which succeeded on the server, or None
+        breaker {CircuitBreaker} -- Optional circuit breaker of the host
+        stats {CallStats} -- Optional statistics to record the call in
+        on_retry {callable} -- Optional function called with the attempt number and the
+            exception before every retry
+
+    Returns:
+        object -- The result of the operation
+    """
+    operation = operation or getattr(func, "__name__", "call")
+    started = time.perf_counter()
+    attempt = 0
+    failed = True
+    try:
+        while True:
+            if breaker:
+                breaker.allow()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if breaker and retryable:
+                    breaker.record_failure()
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                attempt += 1
+                logging.warning(f"{operation} failed ({exc}), retry {attempt} of {max_retries} in {delay:.1f}s")
+                if on_retry:
+                    on_retry(attempt, exc)
+                time.sleep(min(delay, max_delay))
+                if check_existing:
+                    existing = check_existing()
+                    if existing is not None:
+                        logging.info(f"{operation} had succeeded before failing, using its result")
+                        if breaker:
+                            breaker.record_success()
+                        failed = False
+                        return existing
+                continue
+            if breaker:
+                breaker.record_success()
+            failed = False
+            return result
+    finally:
+        if stats:
+            stats.record(operation, attempt + 1, time.perf_counter() - started, failed=failed)
+
+
+class ResilientClient:
+    """Wrapper of a kfp client retrying its API calls, see call_with_retry.
+
+    Listing and get calls are retried as they are idempotent. Pipeline and version uploads,
+    run and recurring run creation are retried after checking that the failed attempt did
+    not create the resource: a resource of the same name, created after the first attempt
+    started and not returned by an earlier call of the client. Other attributes are those
+    of the wrapped client. The calls of RestClient which kfp.Client lacks are made with the
+    generated API clients of the kfp.Client.
+    """
+
+    # Non idempotent operations, with the function finding the resource an attempt may have created
+    _CHECKS = {
+        "upload_pipeline": "_existing_pipeline",
+        "upload_pipeline_version": "_existing_pipeline_version",
+        "run_pipeline": "_existing_run",
+        "create_recurring_run": "_existing_recurring_run",
+    }
+    # Operations missing from kfp.Client, with the generated API client and method making them
+    _API_CALLS = {
+        "archive_run": ("_run_api", "archive_run"),
+        "delete_run": ("_run_api", "delete_run"),
+        "enable_job": ("_job_api", "enable_job"),
+    }
+
+    def __init__(self, client: kfp.Client, max_retries: int = DEFAULT_MAX_RETRIES, stats: CallStats = None):
+        """
+        Arguments:
+            client {kfp.Client} -- The kfp client to wrap
+            max_retries {int} -- The maximum number of retries of each call
+            stats {CallStats} -- The statistics to record the calls in, defaults to call_stats
+        """
+        self.client = client
+        self.max_retries = max_retries
+        self.stats = stats or call_stats
+        self.breaker = circuit_breaker(_client_host(client))
+        # IDs of the resources created through this client, which a later creation of the same name must not reuse
+        self._created = set()
+
+    def call(self, operation: str, *args, max_retries: int = None, on_retry=None, **kwargs):
+        """Function to call a method of the wrapped client with retries
+
+        Arguments:
+            operation {str} -- The name of the client method
+
+        Keyword Arguments:
+            max_retries {int} -- The maximum number of retries, defaults to the client's
+            on_retry {callable} -- Optional function called before every retry, see call_with_retry
+
+        Returns:
+            object -- The result of the method
+        """
+        method = self._method(operation)
+        check_existing = None
+        if operation in self._CHECKS:
+            arguments = inspect.signature(method).bind_partial(*args, **kwargs).arguments
+            since = _format_timestamp(datetime.fromtimestamp(time.time() - CREATION_CLOCK_SKEW, timezone.utc))
+            check_existing = functools.partial(getattr(self, self._CHECKS[operation]), arguments, since)
+        with span(f"api.{operation}"):
+            result = call_with_retry(method, *args, operation=operation,
+                                     max_retries=self.max_retries if max_retries is None else max_retries,
+                                     check_existing=check_existing, breaker=self.breaker, stats=self.stats,
+                                     on_retry=on_retry, **kwargs)
+        if check_existing and getattr(result, "id", None):
+            self._created.add(result.id)
+        return result
+
+    def _method(self, operation: str):
+        """Function to return the method of the wrapped client making an operation"""
+        if operation in self._API_CALLS and not hasattr(self.client, operation):
+            api, api_operation = self._API_CALLS[operation]
+            api_method = getattr(getattr(self.client, api), api_operation)
+            return lambda resource_id: api_method(id=resource_id)
+        return getattr(self.client, operation)
+
+    def _find(self, list_operation: str, items_attr: str, name: str, since: str, **kwargs):
+        """Function to find the resource a failed attempt may have created: the newest of that
+        name, created since the first attempt started, and not created by an earlier call"""
+        if not name:
+            return None
+        list_func = functools.partial(self.call, list_operation)
+
+        def accept(item) -> bool:
+            return item.id not in self._created and _format_timestamp(item.created_at) >= since
+        return _find_item_by_name(list_func, items_attr, name, page_size=100, page_token="", accept=accept,
+                                  sort_by="created_at desc", **kwargs)
+
+    def _existing_pipeline(self, arguments: dict, since: str):
+        return self._find("list_pipelines", "pipelines", arguments.get("pipeline_name"), since)
+
+    def _existing_pipeline_version(self, arguments: dict, since: str):
+        if not arguments.get("pipeline_id"):
+            return None
+        return self._find("list_pipeline_versions", "versions", arguments.get("pipeline_version_name"), since,
+                          pipeline_id=arguments["pipeline_id"])
+
+    def _existing_run(self, arguments: dict, since: str):
+        if not arguments.get("experiment_id"):
+            return None
+        return self._find("list_runs", "runs", arguments.get("job_name"), since,
+                          experiment_id=arguments["experiment_id"])
+
+    def _existing_recurring_run(self, arguments: dict, since: str):
+        if not arguments.get("experiment_id"):
+            return None
+        return self._find("list_recurring_runs", "jobs", arguments.get("job_name"), since,
+                          experiment_id=arguments["experiment_id"])
+
+    def __getattr__(self, name: str):
+        if name in self._API_CALLS:
+            return functools.partial(self.call, name)
+        attribute = getattr(self.client, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+        return functools.partial(self.call, name)
+
+
+def resilient(client: kfp.Client, max_retries: int = DEFAULT_MAX_RETRIES) -> ResilientClient:
+    """Function to wrap a kfp client in a ResilientClient, unless it already is one"""
+    if isinstance(client, ResilientClient):
+        return client
+    return ResilientClient(client, max_retries=max_retries)
@@ -0,0 +1,542 @@
+"""Starting, waiting for and reporting pipeline runs and parameter sweeps"""
+from __future__ import annotations
+
+import json
+import asyncio
+import functools
+import time
+import random
+import threading
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from .constants import DEFAULT_WAIT_TIMEOUT, FINISHED_RUN_STATES
+from .github import set_output
+from .telemetry import count, span
+from .listing import _client_host, _parse_timestamp
+from .params import merge_pipeline_params
+from .cache import ResolutionCache
+from .resilience import is_not_found
+from .client import AsyncKfpClient, run_with_async_client
+from .pipelines import find_experiment_id, find_pipeline_id, find_pipeline_version_id, forget_resolved_ids
+
+if TYPE_CHECKING:
+    import kfp
+
+
+def resolve_pipeline_ids(client: kfp.Client,
+                         pipeline_name: str,
+                         pipeline_id: str,
+                         pipeline_version_name: str = None,
+                         cache: ResolutionCache = None,
+                         pipeline_version_id: str = None) -> tuple:
+    """Function to resolve the pipeline and pipeline version to run
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        pipeline_name {str} -- The name of the pipeline
+        pipeline_id {str} -- The ID of the pipeline, takes precedence over name if provided
+        pipeline_version_name {str} -- Name of the pipeline version, if pipeline_name was provided
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+        pipeline_version_id {str} -- The ID of the pipeline version, takes precedence over
+            pipeline_version_name if provided
+
+    Returns:
+        tuple -- The pipeline id and the pipeline version id (None for the default version)
+    """
+    if pipeline_id or pipeline_version_id:
+        return pipeline_id, pipeline_version_id
+    resolved_pipeline_id = find_pipeline_id(pipeline_name, client, cache=cache)
+    logging.info(f"Found ID for pipeline {pipeline_name}: {resolved_pipeline_id}")
+    resolved_version_id = None
+    if pipeline_version_name:
+        resolved_version_id = find_pipeline_version_id(resolved_pipeline_id, pipeline_version_name, client,
+                                                       cache=cache)
+        logging.info(f"Found ID for pipeline version {pipeline_version_name}: {resolved_version_id}")
+    return resolved_pipeline_id, resolved_version_id
+
+
+async def _resolve_run_ids(async_client: AsyncKfpClient,
+                           experiment_name: str,
+                           namespace: str,
+                           pipeline_name: str,
+                           pipeline_id: str,
+                           pipeline_version_name: str = None,
+                           pipeline_version_id: str = None,
+                           cache: ResolutionCache = None) -> tuple:
+    """Function to resolve the experiment, pipeline and pipeline version of runs concurrently
+
+    Returns:
+        tuple -- The experiment id, the pipeline id and the pipeline version id
+    """
+    client = async_client.client
+    experiment_id, (resolved_pipeline_id, resolved_version_id) = await asyncio.gather(
+        async_client.run(find_experiment_id,
+                         experiment_name=experiment_name, client=client, namespace=namespace, cache=cache),
+        async_client.run(resolve_pipeline_ids,
+                         client, pipeline_name, pipeline_id, pipeline_version_name, cache=cache,
+                         pipeline_version_id=pipeline_version_id))
+    return experiment_id, resolved_pipeline_id, resolved_version_id
+
+
+async def _refresh_run_ids(exc: Exception, ids: tuple, async_client: AsyncKfpClient,
+                           experiment_name: str,
+                           namespace: str,
+                           pipeline_name: str,
+                           pipeline_id: str,
+                           pipeline_version_name: str = None,
+                           pipeline_version_id: str = None,
+                           cache: ResolutionCache = None) -> tuple:
+    """Function to resolve the IDs of runs again after creating a run with them failed with
+    a 404, as the cached IDs may be those of deleted resources. Raises exc when the IDs did
+    not come from the cache or are unchanged.
+
+    Returns:
+        tuple -- The fresh experiment id, pipeline id and pipeline version id
+    """
+    if not cache or not is_not_found(exc):
+        raise exc
+    forget_resolved_ids(cache, async_client.client, namespace=namespace, experiment_name=experiment_name,
+                        pipeline_name=None if pipeline_id else pipeline_name, pipeline_id=ids[1],
+                        version_name=pipeline_version_name)
+    fresh_ids = await _resolve_run_ids(async_client, experiment_name, namespace, pipeline_name, pipeline_id,
+                                       pipeline_version_name, pipeline_version_id, cache=cache)
+    if fresh_ids == ids:
+        raise exc
+    logging.warning(f"Cached IDs were stale ({str(exc).splitlines()[0]}), retrying with the resolved IDs {fresh_ids}")
+    return fresh_ids
+
+
+async def run_pipeline_async(async_client: AsyncKfpClient,
+                             pipeline_name: str,
+                             pipeline_id: str,
+                             experiment_name: str,
+                             pipeline_parameters_path: str,
+                             pipeline_parameters: str,
+                             namespace: str,
+                             service_account: str,
+                             pipeline_version_name: str = None,
+                             run_name: str = None,
+                             cache: ResolutionCache = None,
+                             pipeline_version_id: str = None):
+    """Function to trigger a run of an existing pipeline.
+
+    The experiment lookup, the pipeline and version lookups and the parameter loading are
+    independent, so they run concurrently. If creating the run fails with a 404 while IDs
+    are cached, the names are resolved again and the run created once more.
+
+    Arguments:
+        async_client {AsyncKfpClient} -- The async kfp client
+        pipeline_name {str} -- The name of the pipeline to trigger
+        pipeline_id {str} -- The ID of the pipeline to trigger, takes precedence over name if provided
+        experiment_name {str} -- The name of the experiment to place the run in
+        pipeline_parameters_path {str} -- Optional path to parameters YAML file
+        namespace {str} -- The Kubeflow namespace of the pipeline
+        service_account {str} -- Optional, name of the Kubernetes service account to run the pipeline with
+        pipeline_version_name {str} -- Name of the pipeline version, if pipeline_name was provided
+        run_name {str} -- Name of the pipeline run
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+        pipeline_version_id {str} -- The ID of the pipeline version to trigger, e.g. the one
+            just uploaded, takes precedence over pipeline_version_name if provided
+
+    Returns:
+        object -- The created run
+    """
+    names = (experiment_name, namespace, pipeline_name, pipeline_id, pipeline_version_name, pipeline_version_id)
+    ids, pipeline_params = await asyncio.gather(
+        _resolve_run_ids(async_client, *names, cache=cache),
+        async_client.run(merge_pipeline_params, pipeline_parameters_path, pipeline_parameters))
+    logging.info(f"The expriment id is: {ids[0]}")
+    job_name = f"{pipeline_name}_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}" if not run_name else run_name
+    logging.info(f"The job name is: {job_name}")
+
+    async def create(ids: tuple):
+        experiment_id, resolved_pipeline_id, resolved_version_id = ids
+        logging.info(
+            f"experiment_id: {experiment_id}, job_name:{job_name}, pipeline_params:{sorted(pipeline_params)}, pipeline_id:{pipeline_id}, version_id:{resolved_version_id}, namespace:{namespace}")
+        return await async_client.run_pipeline(
+            experiment_id=experiment_id,
+            job_name=job_name,
+            params=pipeline_params,
+            pipeline_id=resolved_pipeline_id,
+            version_id=resolved_version_id,
+            service_account=service_account)
+    try:
+        run = await create(ids)
+    except Exception as exc:
+        run = await create(await _refresh_run_ids(exc, ids, async_client, *names, cache=cache))
+    logging.info(
+        "Successfully started the pipeline, head over to kubeflow and check it out")
+    return run
+
+
+@span("stage.run_pipeline")
+def run_pipeline(client: kfp.Client,
+                 pipeline_name: str,
+                 pipeline_id: str,
+                 experiment_name: str,
+                 pipeline_parameters_path: str,
+                 pipeline_parameters: str,
+                 namespace: str,
+                 service_account: str,
+                 pipeline_version_name: str = None,
+                 run_name: str = None,
+                 cache: ResolutionCache = None,
+                 pipeline_version_id: str = None):
+    """Function to trigger a run of an existing pipeline, see run_pipeline_async
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+
+    Returns:
+        object -- The created run
+    """
+    return run_with_async_client(client, run_pipeline_async,
+                                 pipeline_name=pipeline_name,
+                                 pipeline_id=pipeline_id,
+                                 experiment_name=experiment_name,
+                                 pipeline_parameters_path=pipeline_parameters_path,
+                                 pipeline_parameters=pipeline_parameters,
+                                 namespace=namespace,
+                                 service_account=service_account,
+                                 pipeline_version_name=pipeline_version_name,
+                                 run_name=run_name,
+                                 cache=cache,
+                                 pipeline_version_id=pipeline_version_id)
+
+
+def run_url(client: kfp.Client, run_id: str) -> str:
+    """Function to return the link to a run in the Kubeflow UI
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        run_id {str} -- The ID of the run
+
+    Returns:
+        str -- The URL of the run
+    """
+    get_url_prefix = getattr(client, "_get_url_prefix", None)
+    prefix = get_url_prefix() if get_url_prefix else _client_host(client)
+    return f"{prefix}/#/runs/details/{run_id}"
+
+
+def _poll_run_states(client: kfp.Client, run_ids: set, experiment_id: str = None, page_size: int = 100) -> dict:
+    """Function to collect the current state of runs.
+
+    A single run is fetched directly. Several runs of an experiment are collected with
+    list calls over the experiment, newest first, stopping once every run was seen.
+    """
+    if len(run_ids) == 1 or not experiment_id:
+        return {run_id: client.get_run(run_id).run.status for run_id in run_ids}
+    states = {}
+    page_token = ""
+    while True:
+        runs = client.list_runs(experiment_id=experiment_id, page_size=page_size, page_token=page_token,
+                                sort_by="created_at desc")
+        count("pages.runs")
+        for run in runs.runs or []:
+            if run.id in run_ids:
+                states[run.id] = run.status
+        page_token = runs.next_page_token
+        if not page_token or len(states) == len(run_ids):
+            return states
+
+
+@span("stage.wait_for_runs")
+def wait_for_runs(client: kfp.Client,
+                  run_ids: list,
+                  experiment_id: str = None,
+                  timeout: float = DEFAULT_WAIT_TIMEOUT,
+                  initial_interval: float = 5.0,
+                  max_interval: float = 60.0) -> dict:
+    """Function to wait for runs to finish.
+
+    Runs are polled with an interval which starts at initial_interval and grows up to
+    max_interval while nothing changes, with jitter so that many waiting jobs do not poll
+    in lockstep. When several runs of one experiment are tracked they are polled together
+    with list calls instead of one request per run.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        run_ids {list} -- The IDs of the runs to wait for
+        experiment_id {str} -- Optional experiment of the runs, to poll them in batches
+        timeout {float} -- The number of seconds to wait for at most
+        initial_interval {float} -- The initial number of seconds between polls
+        max_interval {float} -- The maximum number of seconds between polls
+
+    Returns:
+        dict -- The last known state of every run, "Timeout" for runs which did not finish
+    """
+    deadline = time.monotonic() + timeout
+    states = {run_id: None for run_id in run_ids}
+    pending = set(run_ids)
+    interval = initial_interval
+    while True:
+        polled = _poll_run_states(client, pending, experiment_id)
+        changed = any(states[run_id] != state for run_id, state in polled.items())
+        states.update(polled)
+        pending = {run_id for run_id in pending if states[run_id] not in FINISHED_RUN_STATES}
+        logging.info(f"{len(run_ids) - len(pending)} of {len(run_ids)} runs finished")
+        if not pending:
+            return states
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning(f"Timed out waiting for {len(pending)} runs")
+            return dict(states, **{run_id: "Timeout" for run_id in pending})
+        interval = initial_interval if changed else min(max_interval, interval * 1.5)
+        time.sleep(min(remaining, interval * random.uniform(0.8, 1.2)))
+
+
+def run_step_durations(client: kfp.Client, run_id: str) -> dict:
+    """Function to collect the state and duration of every step of a run
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        run_id {str} -- The ID of the run
+
+    Returns:
+        dict -- The state and duration in seconds of each step, by step name
+    """
+    run_detail = client.get_run(run_id)
+    manifest = getattr(run_detail.pipeline_runtime, "workflow_manifest", None)
+    workflow = json.loads(manifest) if manifest else {}
+    nodes = (workflow.get("status") or {}).get("nodes") or {}
+    steps = {}
+    for node in nodes.values():
+        if node.get("type") != "Pod":
+            continue
+        duration = None
+        if node.get("startedAt") and node.get("finishedAt"):
+            duration = (_parse_timestamp(node["finishedAt"]) - _parse_timestamp(node["startedAt"])).total_seconds()
+        steps[node.get("displayName") or node.get("name")] = {"state": node.get("phase"), "duration": duration}
+    return steps
+
+
+def report_run(client: kfp.Client, run, wait: bool = False, timeout: float = DEFAULT_WAIT_TIMEOUT) -> bool:
+    """Function to set the run outputs of the action, optionally waiting for the run to finish
+
+    Sets RUN_ID and WORKFLOW_URL and, when waiting, RUN_STATUS and STEP_DURATIONS.
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        run {object} -- The run, as returned by run_pipeline
+        wait {bool} -- Whether to wait for the run to finish
+        timeout {float} -- The number of seconds to wait for at most
+
+    Returns:
+        bool -- Whether the run succeeded, always True when not waiting
+    """
+    url = run_url(client, run.id)
+    logging.info(f"The run is available at: {url}")
+    set_output("RUN_ID", run.id)
+    set_output("WORKFLOW_URL", url)
+    if not wait:
+        return True
+    status = wait_for_runs(client, [run.id], timeout=timeout)[run.id]
+    logging.info(f"The run finished with the state: {status}")
+    steps = run_step_durations(client, run.id)
+    for name, step in steps.items():
+        logging.info(f"{step['state']:>10}  {name}  {step['duration']}s")
+    set_output("RUN_STATUS", status)
+    set_output("STEP_DURATIONS", json.dumps(steps))
+    return status == "Succeeded"
+
+
+def wait_for_sweep(client: kfp.Client, results: dict, timeout: float = DEFAULT_WAIT_TIMEOUT,
+                   results_path: str = None) -> bool:
+    """Function to wait for the runs of a sweep to finish, adding their final state to the results
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        results {dict} -- The results returned by run_pipeline_sweep
+        timeout {float} -- The number of seconds to wait for at most
+        results_path {str} -- Optional path of the JSON file to rewrite the results to
+
+    Returns:
+        bool -- Whether every run succeeded
+    """
+    run_ids = [outcome["run_id"] for outcome in results["runs"] if outcome.get("run_id")]
+    states = wait_for_runs(client, run_ids, experiment_id=results["experiment_id"], timeout=timeout)
+    for outcome in results["runs"]:
+        if outcome.get("run_id"):
+            outcome["final_state"] = states[outcome["run_id"]]
+    succeeded = sum(1 for state in states.values() if state == "Succeeded")
+    logging.info(f"{succeeded} of {len(results['runs'])} runs succeeded")
+    set_output("RUN_STATUS", "Succeeded" if succeeded == len(results["runs"]) else "Failed")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return succeeded == len(results["runs"])
+
+
+class RateLimiter:
+    """Thread safe limiter spacing calls evenly at a maximum rate."""
+
+    def __init__(self, rate: float = None):
+        """
+        Arguments:
+            rate {float} -- The maximum number of calls per second, unlimited if not set
+        """
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Function to reserve the next call slot
+
+        Returns:
+            float -- The number of seconds to wait before making the call
+        """
+        if not self._interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self._interval
+        return max(0.0, delay)
+
+    def wait(self):
+        """Function to block until the next call is allowed"""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+async def run_pipeline_sweep_async(async_client: AsyncKfpClient,
+                                   pipeline_name: str,
+                                   pipeline_id: str,
+                                   experiment_name: str,
+                                   namespace: str,
+                                   service_account: str,
+                                   parameter_sets,
+                                   pipeline_parameters_path: str = None,
+                                   pipeline_parameters: str = None,
+                                   pipeline_version_name: str = None,
+                                   run_name: str = None,
+                                   max_concurrency: int = 8,
+                                   max_retries: int = 3,
+                                   rate_limit: float = None,
+                                   cache: ResolutionCache = None,
+                                   results_path: str = None) -> dict:
+    """Function to trigger one run of an existing pipeline per parameter set.
+
+    The experiment and pipeline IDs are resolved once. Runs are then created concurrently on
+    one event loop, with at most max_concurrency requests in flight and at most rate_limit
+    per second.
+    Failed submissions are retried with exponential backoff and jitter, after checking the
+    run was not created by the failed attempt. Submissions failing with a 404 while IDs are
+    cached are retried once, after the names are resolved again (once for the sweep).
+
+    Arguments:
+        async_client {AsyncKfpClient} -- The async kfp client
+        pipeline_name {str} -- The name of the pipeline to trigger
+        pipeline_id {str} -- The ID of the pipeline to trigger, takes precedence over name if provided
+        experiment_name {str} -- The name of the experiment to place the runs in
+        namespace {str} -- The Kubeflow namespace of the pipeline
+        service_account {str} -- Optional, name of the Kubernetes service account to run the pipeline with
+        parameter_sets {iterable} -- The parameter sets, see read_parameter_sweep
+        pipeline_parameters_path {str} -- Optional path to parameters YAML file shared by all runs
+        pipeline_parameters {str} -- Optional raw YAML string with parameters shared by all runs
+        pipeline_version_name {str} -- Name of the pipeline version, if pipeline_name was provided
+        run_name {str} -- Prefix of the run names, defaults to the pipeline name
+        max_concurrency {int} -- The maximum number of runs being created at once
+        max_retries {int} -- The number of times a failed run creation is retried
+        rate_limit {float} -- The maximum number of runs created per second, unlimited if not set
+        cache {ResolutionCache} -- Optional cache of previously resolved IDs
+        results_path {str} -- Optional path of the JSON file to write the results to
+
+    Returns:
+        dict -- The resolved IDs and the outcome of every run
+    """
+    client = async_client.client
+    names = (experiment_name, namespace, pipeline_name, pipeline_id, pipeline_version_name)
+    ids, base_params = await asyncio.gather(
+        _resolve_run_ids(async_client, *names, cache=cache),
+        async_client.run(merge_pipeline_params, pipeline_parameters_path, pipeline_parameters))
+    refreshes = {}
+
+    async def refresh(exc: Exception, stale_ids: tuple) -> tuple:
+        if not cache or not is_not_found(exc):
+            raise exc
+        # The submissions failing with the same stale IDs share one resolution
+        if stale_ids not in refreshes:
+            refreshes[stale_ids] = asyncio.ensure_future(
+                _refresh_run_ids(exc, stale_ids, async_client, *names, cache=cache))
+        return await refreshes[stale_ids]
+    name_prefix = f"{run_name or pipeline_name}_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
+    rate_limiter = RateLimiter(rate_limit)
+    in_flight = asyncio.Semaphore(max_concurrency)
+
+    async def submit(index: int, params: dict) -> dict:
+        nonlocal ids
+        outcome = {"index": index, "run_name": f"{name_prefix}_{index:04d}", "params": params}
+        pipeline_params = dict(base_params, **params)
+
+        def create(run_ids: tuple):
+            experiment_id, resolved_pipeline_id, resolved_version_id = run_ids
+            # Retries check the run was not created by the failed attempt, see ResilientClient
+            return async_client.run(
+                client.call, "run_pipeline",
+                experiment_id=experiment_id,
+                job_name=outcome["run_name"],
+                params=pipeline_params,
+                pipeline_id=resolved_pipeline_id,
+                version_id=resolved_version_id,
+                service_account=service_account,
+                max_retries=max_retries,
+                on_retry=lambda attempt, exc: outcome.update(attempts=attempt + 1))
+        try:
+            outcome["attempts"] = 1
+            await asyncio.sleep(rate_limiter.reserve())
+            run_ids = ids
+            try:
+                created_run = await create(run_ids)
+            except Exception as exc:
+                ids = await refresh(exc, run_ids)
+                created_run = await create(ids)
+            outcome["run_id"] = created_run.id
+            outcome["status"] = "started"
+            logging.info(f"Started {outcome['run_name']}: {outcome['run_id']}")
+        except Exception as exc:
+            outcome.update(status="failed", error=str(exc))
+            logging.error(f"Failed to start {outcome['run_name']}: {exc}")
+        finally:
+            in_flight.release()
+        return outcome
+
+    tasks = []
+    for index, params in enumerate(parameter_sets):
+        # Wait while max_concurrency runs are in flight, so streamed sweeps are not read ahead
+        await in_flight.acquire()
+        tasks.append(asyncio.ensure_future(submit(index, params or {})))
+    runs = list(await asyncio.gather(*tasks))
+
+    failed = sum(1 for outcome in runs if outcome["status"] == "failed")
+    logging.info(f"{len(runs) - failed} of {len(runs)} runs started")
+    results = {"experiment_id": ids[0],
+               "pipeline_id": ids[1],
+               "version_id": ids[2],
+               "started": len(runs) - failed,
+               "failed": failed,
+               "runs": runs}
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+        set_output("RESULTS_PATH", results_path)
+    return results
+
+
+@span("stage.run_pipeline_sweep")
+def run_pipeline_sweep(client: kfp.Client, *args, max_concurrency: int = 8, **kwargs) -> dict:
+    """Function to trigger one run of an existing pipeline per parameter set, see run_pipeline_sweep_async
+
+    Arguments:
+        client {kfp.Client} -- The kfp client
+        max_concurrency {int} -- The maximum number of runs being created at once
+
+    Returns:
+        dict -- The resolved IDs and the outcome of every run
+    """
+    sweep = functools.partial(run_pipeline_sweep_async, max_concurrency=max_concurrency)
+    return run_with_async_client(client, sweep, *args, max_concurrency=max_concurrency, **kwargs)
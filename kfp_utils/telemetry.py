@@ -0,0 +1,231 @@
+"""Timings, counters and API call statistics of an action run"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import threading
+import contextlib
+import logging
+from datetime import datetime, timezone
+
+from .github import append_step_summary, set_output
+
+
+class Timings:
+    """Thread safe record of the timed spans and counters of an action run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._spans = []
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, seconds: float, attributes: dict = None):
+        """Function to record a finished span
+
+        Arguments:
+            name {str} -- The name of the span, e.g. stage.pipeline_compile or api.list_runs
+            start {float} -- The start time of the span, seconds since the epoch
+            seconds {float} -- The duration of the span
+            attributes {dict} -- Optional attributes of the span
+        """
+        with self._lock:
+            self._spans.append({"name": name, "offset": round(start - self.started, 6),
+                                "seconds": round(seconds, 6), "attributes": attributes or {}})
+
+    def reset(self):
+        """Function to drop the recorded spans and counters, and restart the clock"""
+        with self._lock:
+            self.started = time.time()
+            self._spans = []
+            self._counters = {}
+
+    def count(self, name: str, value: int = 1):
+        """Function to add to a counter, e.g. the pages listed or the bytes uploaded"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def report(self) -> dict:
+        """Function to summarize the spans, with count, total, p50, p95 and max seconds per span name
+
+        Returns:
+            dict -- The summary, the counters and every span
+        """
+        with self._lock:
+            spans = list(self._spans)
+            counters = dict(self._counters)
+        durations = {}
+        for recorded in spans:
+            durations.setdefault(recorded["name"], []).append(recorded["seconds"])
+        summary = {}
+        for name, seconds in sorted(durations.items()):
+            seconds.sort()
+            summary[name] = {"count": len(seconds),
+                             "total_seconds": round(sum(seconds), 6),
+                             "p50_seconds": _percentile(seconds, 50),
+                             "p95_seconds": _percentile(seconds, 95),
+                             "max_seconds": seconds[-1]}
+        return {"started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                "wall_seconds": round(time.time() - self.started, 6),
+                "spans": summary,
+                "counters": counters,
+                "events": spans}
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    """Function to return the nearest-rank percentile of sorted values"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# Timings of the spans and counters of this process
+timings = Timings()
+_tracer = None
+
+
+def _otel_tracer():
+    """Function to return an OpenTelemetry tracer, when OTEL_EXPORTER_OTLP_ENDPOINT is set and
+    the opentelemetry packages are installed, or None"""
+    global _tracer
+    if _tracer is None:
+        _tracer = False
+        if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+            try:
+                from opentelemetry import trace
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            except ImportError:
+                logging.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry is not installed, "
+                                "spans are not exported")
+                return None
+            provider = TracerProvider(resource=Resource.create(
+                {"service.name": os.getenv("OTEL_SERVICE_NAME") or "kfp-github-action"}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+            _tracer = trace.get_tracer("kfp_utils")
+    return _tracer or None
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Context manager timing a block of code, also usable as a function decorator.
+
+    The span is recorded in timings and, when configured, exported to OpenTelemetry.
+
+    Arguments:
+        name {str} -- The name of the span
+
+    Keyword Arguments:
+        attributes -- Optional attributes of the span
+    """
+    tracer = _otel_tracer()
+    otel_span = tracer.start_as_current_span(name, attributes=attributes) if tracer else contextlib.nullcontext()
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        with otel_span:
+            yield
+    finally:
+        timings.record(name, start, time.perf_counter() - started, attributes)
+
+
+def count(name: str, value: int = 1):
+    """Function to add to a counter of the timing report, see Timings.count"""
+    timings.count(name, value)
+
+
+def _timing_markdown(report: dict) -> str:
+    """Function to format a timing report as a markdown step summary"""
+    lines = ["### Kubeflow action timings", "",
+             f"Total: {report['wall_seconds']:.2f}s", "",
+             "| Span | Count | Total (s) | p50 (s) | p95 (s) | Max (s) |",
+             "| --- | ---: | ---: | ---: | ---: | ---: |"]
+    for name, stats in report["spans"].items():
+        lines.append(f"| {name} | {stats['count']} | {stats['total_seconds']:.3f} | {stats['p50_seconds']:.3f} "
+                     f"| {stats['p95_seconds']:.3f} | {stats['max_seconds']:.3f} |")
+    if report["counters"]:
+        lines += ["", "| Counter | Value |", "| --- | ---: |"]
+        lines += [f"| {name} | {value} |" for name, value in sorted(report["counters"].items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_timing_report(report_path: str = None) -> dict:
+    """Function to write the timing report of this process.
+
+    The report is written as JSON to report_path and set as the TIMING_REPORT_PATH output,
+    and as a markdown table to the step summary when run in GitHub Actions. Spans exported
+    to OpenTelemetry are flushed.
+
+    Arguments:
+        report_path {str} -- Optional path of the JSON report
+
+    Returns:
+        dict -- The report, see Timings.report
+    """
+    report = timings.report()
+    report["api_calls"] = call_stats.summary()
+    log_call_stats()
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        set_output("TIMING_REPORT_PATH", report_path)
+    append_step_summary(_timing_markdown(report))
+    if _tracer:
+        from opentelemetry import trace
+        trace.get_tracer_provider().force_flush()
+    return report
+
+
+class CallStats:
+    """Thread safe record of the attempts and latency of the API calls, per operation"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, attempts: int, latency: float, failed: bool):
+        """Function to record a call
+
+        Arguments:
+            operation {str} -- The name of the API operation
+            attempts {int} -- The number of attempts made
+            latency {float} -- The time spent in the call, including retries, in seconds
+            failed {bool} -- Whether the call failed after its last attempt
+        """
+        with self._lock:
+            stats = self._stats.setdefault(
+                operation, {"calls": 0, "attempts": 0, "failures": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["attempts"] += attempts
+            stats["failures"] += int(failed)
+            stats["total_seconds"] += latency
+            stats["max_seconds"] = max(stats["max_seconds"], latency)
+
+    def reset(self):
+        """Function to drop the recorded statistics"""
+        with self._lock:
+            self._stats = {}
+
+    def summary(self) -> dict:
+        """Function to return a copy of the statistics, keyed by operation"""
+        with self._lock:
+            return {operation: dict(stats) for operation, stats in self._stats.items()}
+
+    def log_summary(self):
+        """Function to log the statistics of every operation"""
+        for operation, stats in sorted(self.summary().items()):
+            logging.info(
+                f"{operation}: {stats['calls']} calls, {stats['attempts']} attempts, {stats['failures']} failed, "
+                f"{stats['total_seconds'] / stats['calls']:.3f}s mean, {stats['max_seconds']:.3f}s max")
+
+
+# Statistics of all API calls made through a ResilientClient
+call_stats = CallStats()
+
+
+def log_call_stats():
+    """Function to log the statistics of the API calls made by this process"""
+    call_stats.log_summary()
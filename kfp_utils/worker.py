@@ -0,0 +1,281 @@
+"""A warm worker process running the actions of a job"""
+from __future__ import annotations
+
+import os
+import io
+import json
+import time
+import tempfile
+import threading
+import socket
+import socketserver
+import traceback
+import base64
+import contextlib
+import logging
+import sys
+
+from .constants import WORKER_ENV_PREFIXES, WORKER_SOCKET_NAME
+from .telemetry import call_stats, timings, write_timing_report
+from .compilation import _isolated_imports
+from . import cache
+from .client import CREDENTIALS_PATH
+from .actions import ACTIONS
+
+
+def run_main(main):
+    """Function to run the main function of an action and report its timings. The JSON report
+    is only written if the TIMING_REPORT_PATH input is set, so nothing lands in the workspace unasked
+
+    Arguments:
+        main {callable} -- The main function of the action
+    """
+    try:
+        main()
+    finally:
+        write_timing_report(os.getenv("INPUT_TIMING_REPORT_PATH") or None)
+
+
+def run_action(main, action: str):
+    """Function to run an action, on the worker given by the WORKER_SOCKET input if it is
+    listening, or else in this process.
+
+    Arguments:
+        main {callable} -- The main function of the action
+        action {str} -- The name of the action, e.g. trigger-pipeline
+    """
+    socket_path = os.getenv("INPUT_WORKER_SOCKET")
+    if socket_path and not str.isspace(socket_path):
+        try:
+            connection = _connect_worker(socket_path)
+        except OSError as exc:
+            logging.warning(f"The worker at {socket_path} is unavailable ({exc}), running the action in this process")
+        else:
+            sys.exit(submit_to_worker(connection, action))
+    run_main(main)
+
+
+def _connect_worker(socket_path: str) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def submit_to_worker(connection: socket.socket, action: str) -> int:
+    """Function to run an action on a worker, see serve.
+
+    The step's inputs and GitHub environment are sent to the worker, its log is printed as
+    it runs, and its outputs and job summary are added to the step's.
+
+    Arguments:
+        connection {socket.socket} -- The connection to the worker
+        action {str} -- The name of the action, e.g. trigger-pipeline
+
+    Returns:
+        int -- The exit code of the action
+    """
+    request = {"action": action,
+               "cwd": os.getcwd(),
+               "env": {name: value for name, value in os.environ.items() if name.startswith(WORKER_ENV_PREFIXES)}}
+    logging.info(f"Running {action} on the worker")
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "log" in message:
+                sys.stdout.write(message["log"])
+                sys.stdout.flush()
+                continue
+            if message.get("error"):
+                logging.error(message["error"])
+            for name, content in (("GITHUB_OUTPUT", message.get("outputs")),
+                                  ("GITHUB_STEP_SUMMARY", message.get("summary"))):
+                if content and os.getenv(name):
+                    with open(os.getenv(name), "a") as f:
+                        f.write(content)
+            return message["exit_code"]
+    raise ConnectionError("The worker closed the connection before the action finished")
+
+
+class _LogStream(io.TextIOBase):
+    """Text stream sending every written line to a worker client"""
+
+    def __init__(self, send):
+        self._send = send
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._send({"log": line + "\n"})
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self._send({"log": self._buffer})
+            self._buffer = ""
+
+
+class _Worker:
+    """State of a worker: what each job must not leak into the next"""
+
+    def __init__(self, path_map: dict):
+        self.path_map = path_map
+        self.lock = threading.Lock()
+        self.last_job = time.monotonic()
+        self.env = dict(os.environ)
+        # Modules loaded from these directories (the interpreter, installed packages and
+        # kfp_utils) are kept warm between jobs, others (the pipeline code) are unloaded
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        self.warm_prefixes = tuple({os.path.abspath(path) for path in
+                                    (sys.prefix, sys.base_prefix, sys.exec_prefix, package_dir)})
+
+    def map_path(self, value: str) -> str:
+        for prefix, local_prefix in self.path_map.items():
+            if value == prefix or value.startswith(prefix.rstrip("/") + "/"):
+                return local_prefix + value[len(prefix.rstrip("/")):]
+        return value
+
+    def main(self, action: str):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action {action}")
+        return ACTIONS[action]
+
+    def run(self, request: dict, send) -> dict:
+        """Function to run one job, with the environment, working directory and output
+        files of the requesting step, and restore the worker afterwards"""
+        with self.lock, tempfile.TemporaryDirectory(prefix="kfp-worker-") as job_dir, \
+                _isolated_imports(self.warm_prefixes):
+            self.last_job = time.monotonic()
+            saved_env, saved_cwd = dict(os.environ), os.getcwd()
+            saved_streams = sys.stdout, sys.stderr
+            handlers = [handler for handler in logging.getLogger().handlers
+                        if isinstance(handler, logging.StreamHandler)]
+            saved_handler_streams = [handler.stream for handler in handlers]
+            log_stream = _LogStream(send)
+            saved_tempdir = tempfile.tempdir
+            wrote_credentials = False
+            exit_code = 1
+            try:
+                os.environ.clear()
+                os.environ.update(self.env)
+                os.environ.update({name: self.map_path(value) for name, value in request["env"].items()})
+                os.environ["GITHUB_OUTPUT"] = os.path.join(job_dir, "outputs")
+                os.environ["GITHUB_STEP_SUMMARY"] = os.path.join(job_dir, "summary")
+                os.chdir(self.map_path(request["cwd"]))
+                # Compiled packages and other temporary files of the job are removed with its directory
+                tempfile.tempdir = job_dir
+                sys.stdout = sys.stderr = log_stream
+                for handler in handlers:
+                    handler.setStream(log_stream)
+                timings.reset()
+                call_stats.reset()
+                if os.getenv("INPUT_ENCODED_GOOGLE_APPLICATION_CREDENTIALS"):
+                    # As the entrypoint of the action does
+                    credentials = base64.b64decode(os.getenv("INPUT_ENCODED_GOOGLE_APPLICATION_CREDENTIALS"))
+                    with open(os.open(CREDENTIALS_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                        f.write(credentials)
+                    wrote_credentials = True
+                try:
+                    run_main(self.main(request["action"]))
+                    exit_code = 0
+                except SystemExit as exc:
+                    exit_code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+                except Exception:
+                    traceback.print_exc()
+                log_stream.flush()
+            finally:
+                if wrote_credentials:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(CREDENTIALS_PATH)
+                tempfile.tempdir = saved_tempdir
+                for handler, stream in zip(handlers, saved_handler_streams):
+                    handler.setStream(stream)
+                sys.stdout, sys.stderr = saved_streams
+                os.chdir(saved_cwd)
+                os.environ.clear()
+                os.environ.update(saved_env)
+            result = {"exit_code": exit_code}
+            for name, file_name in (("outputs", "outputs"), ("summary", "summary")):
+                path = os.path.join(job_dir, file_name)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        result[name] = f.read()
+            return result
+
+
+def serve(socket_path: str = None, path_map: dict = None, idle_timeout: float = 0):
+    """Function to run a worker, which runs actions sent by their steps over a Unix socket.
+
+    The worker imports the kfp SDK once, and keeps its clients (with their connections and
+    ID tokens) and its resolution caches between jobs, so a job only costs the API calls
+    it makes. Jobs run one at a time, each with the environment and working directory of
+    its step. Modules of the pipeline code are unloaded after every job.
+
+    Docker action steps see the files of the job under other paths than the worker, e.g.
+    /github/workspace. path_map maps these paths, in the working directory and the
+    inputs, to the worker's.
+
+    Arguments:
+        socket_path {str} -- Path of the socket, defaults to kfp-worker.sock in the home directory
+        path_map {dict} -- Optional mapping of path prefixes of the steps to the worker's
+        idle_timeout {float} -- Number of seconds without a job after which the worker stops, 0 to never stop
+    """
+    import kfp
+    import kfp.compiler  # noqa: F401
+
+    socket_path = socket_path or os.path.join(os.path.expanduser("~"), WORKER_SOCKET_NAME)
+    worker = _Worker(path_map or {})
+    # Clients are shared by the whole process anyway, resolution caches only in a worker
+    cache._reuse_caches = True
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def send(message: dict):
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+                self.wfile.flush()
+            try:
+                request = json.loads(self.rfile.readline())
+                started = time.perf_counter()
+                result = worker.run(request, send)
+                logging.info(f"Ran {request['action']} in {time.perf_counter() - started:.3f}s, "
+                             f"exit code {result['exit_code']}")
+            except Exception as exc:
+                logging.error(f"Failed to run a job: {exc}")
+                result = {"exit_code": 1, "error": f"The worker failed to run the action: {exc}"}
+            try:
+                send(result)
+            except OSError:
+                logging.warning("The step disconnected before the job finished")
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    # The socket is created with the mode left by the umask, so it is private from the start
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    logging.info(f"The worker (kfp {kfp.__version__}) is listening on {socket_path}")
+
+    def stop_when_idle():
+        while True:
+            time.sleep(min(idle_timeout, 10))
+            if not worker.lock.locked() and time.monotonic() - worker.last_job > idle_timeout:
+                logging.info(f"Stopping the worker after {idle_timeout}s without a job")
+                server.shutdown()
+                return
+    if idle_timeout:
+        threading.Thread(target=stop_when_idle, daemon=True).start()
+    try:
+        with server:
+            server.serve_forever()
+    finally:
+        os.remove(socket_path)
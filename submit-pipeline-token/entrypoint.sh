@@ -1,3 +0,0 @@
-#!/bin/bash
-
-python  /main.py
@@ -1 +0,0 @@
-../kfp_utils.py
\ No newline at end of file
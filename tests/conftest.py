@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+pytest.importorskip("kfp_server_api")
+
+import kfp_utils  # noqa: E402
+from fake_kfp_server import FakeKfpServer, fake_id_token  # noqa: E402
+
+
+@pytest.fixture
+def fake_server():
+    """Fixture starting fake KFP servers, fake_server(**options) returns a started server"""
+    servers = []
+
+    def start(**options):
+        server = FakeKfpServer(**options).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def make_client():
+    """Fixture returning a client of a fake server, make_client(server, max_retries=...)"""
+    def make(server: FakeKfpServer, max_retries: int = 0):
+        return kfp_utils.create_client(server.url, existing_token=fake_id_token("tests"), max_retries=max_retries)
+    return make
+
+
+@pytest.fixture
+def make_sdk_client():
+    """Fixture returning a kfp.Client of a fake server, as used without a token or key file, see
+    ClientFactory.new_client, make_sdk_client(server, max_retries=...)"""
+    kfp = pytest.importorskip("kfp")
+
+    def make(server: FakeKfpServer, max_retries: int = 0):
+        client = kfp.Client(host=server.url, existing_token=fake_id_token("tests"))
+        return kfp_utils.ResilientClient(client, max_retries=max_retries)
+    return make
+
+
+@pytest.fixture(scope="module")
+def fake_catalog(request):
+    """Fixture starting a fake KFP server with a catalog of request.param pipelines and experiments,
+    shared by the tests of a module, parametrize it with indirect=True"""
+    size = request.param
+    with FakeKfpServer(pipelines=size, versions=1, experiments=size, runs=0) as server:
+        yield server
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import kfp_utils
+
+pytest.importorskip("google.oauth2.service_account")
+rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+
+
+@pytest.fixture
+def credentials(tmp_path, fake_server):
+    """Fixture writing a service account key minting ID tokens at the fake server, returns the server and key path"""
+    server = fake_server(pipelines=0, experiments=0)
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()).decode()
+    path = tmp_path / "sa.json"
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "client_email": "tests@project.iam.gserviceaccount.com",
+        "private_key_id": "key",
+        "private_key": private_key,
+        "token_uri": f"{server.url}/token",
+    }))
+    return server, str(path)
+
+
+def test_token_is_reused_without_reading_the_key(tmp_path, credentials):
+    server, path = credentials
+    cache = kfp_utils.TokenCache(cache_dir=str(tmp_path / "cache"))
+
+    token = cache.get_token("client-id", path)
+    (tmp_path / "sa.json").unlink()
+    assert cache.get_token("client-id", path) == token
+    assert server.requests["POST /token"] == 1
+
+
+def test_token_is_refreshed_near_expiry(tmp_path, credentials):
+    server, path = credentials
+    # The fake tokens expire in an hour, within the refresh margin
+    cache = kfp_utils.TokenCache(cache_dir=str(tmp_path / "cache"), refresh_margin=3700)
+
+    cache.get_token("client-id", path)
+    cache.get_token("client-id", path)
+    assert server.requests["POST /token"] == 2
+
+
+def test_token_is_shared_through_the_cache_file(tmp_path, credentials):
+    server, path = credentials
+    cache_dir = str(tmp_path / "cache")
+
+    token = kfp_utils.TokenCache(cache_dir=cache_dir).get_token("client-id", path)
+    assert kfp_utils.TokenCache(cache_dir=cache_dir).get_token("client-id", path) == token
+    assert kfp_utils.TokenCache(cache_dir=cache_dir).get_token("other-client-id", path) != token
+    assert server.requests["POST /token"] == 2
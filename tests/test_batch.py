@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import kfp_utils
+
+pytest.importorskip("kfp.compiler")
+
+PIPELINE = """import kfp.dsl as dsl
+
+
+@dsl.pipeline(name="{name}")
+def {name}(message: str = "hello"):
+    dsl.ContainerOp(name="echo", image="alpine:3.16", command=["echo"], arguments=[message])
+"""
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Fixture writing pipelines and a manifest of them, including one which does not load"""
+    for name in ("train", "evaluate"):
+        (tmp_path / f"{name}.py").write_text(PIPELINE.format(name=name))
+    (tmp_path / "broken.py").write_text("import missing_module\n")
+    path = tmp_path / "manifest.yaml"
+    path.write_text(f"""
+- code_path: {tmp_path / "train.py"}
+  function: train
+  version_name: train-v2
+  params: {{message: trained}}
+  run: true
+- code_path: {tmp_path / "evaluate.py"}
+  function: evaluate
+  name: evaluate-pipeline
+- code_path: {tmp_path / "broken.py"}
+  function: broken
+""")
+    return str(path)
+
+
+def test_read_pipeline_manifest_rejects_incomplete_entries(tmp_path):
+    path = tmp_path / "manifest.yaml"
+    path.write_text("- code_path: train.py\n")
+    with pytest.raises(ValueError, match="missing: function"):
+        kfp_utils.read_pipeline_manifest(str(path))
+
+
+def test_submit_pipelines(fake_server, make_client, manifest, tmp_path, monkeypatch):
+    server = fake_server(pipelines=0, experiments=1, runs=0)
+    pool = kfp_utils.ClientPool(lambda: make_client(server), size=2)
+    entries = kfp_utils.read_pipeline_manifest(manifest)
+
+    results = kfp_utils.submit_pipelines(entries, pool, namespace="kubeflow", experiment_name="experiment-00000",
+                                         github_sha="abc123", max_workers=2)
+
+    train, evaluate, broken = results
+    assert (train["name"], train["status"]) == ("train_abc123", "started")
+    assert server.versions[train["pipeline_id"]][train["version_id"]]["name"] == "train-v2"
+    run = server.runs[train["run_id"]]
+    assert {"name": "message", "value": "trained"} in run["pipeline_spec"]["parameters"]
+    assert {"key": {"id": train["version_id"], "type": "PIPELINE_VERSION"},
+            "relationship": "CREATOR"} in run["resource_references"]
+    assert (evaluate["name"], evaluate["status"]) == ("evaluate-pipeline", "uploaded")
+    assert server.pipelines[evaluate["pipeline_id"]]["name"] == "evaluate-pipeline"
+    assert broken["status"] == "failed" and broken["error"].startswith("compile:")
+    assert server.requests["POST /runs"] == 1
+
+    output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output))
+    assert not kfp_utils.report_batch_results(results, str(tmp_path / "results.json"))
+    assert json.loads((tmp_path / "results.json").read_text()) == results
+    assert output.read_text() == f"RESULTS_PATH={tmp_path / 'results.json'}\n"
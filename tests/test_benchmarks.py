@@ -0,0 +1,132 @@
+"""Benchmarks of the kfp_utils API paths against catalogs of the fake KFP server, see fake_kfp_server.py.
+
+Each scenario runs against catalogs of 10 to 100k pipelines and experiments, and asserts the
+number of API requests of each call, so a lookup falling back to paging fails the test whatever
+the timings. The timings are reported by pytest-benchmark, and can be compared with a baseline:
+
+    python -m pytest tests/test_benchmarks.py --benchmark-autosave
+    python -m pytest tests/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=median:50%
+
+Run the rest of the tests without the benchmarks with --benchmark-skip.
+"""
+import itertools
+import os
+
+import pytest
+
+import kfp_utils
+
+pytest.importorskip("pytest_benchmark")
+
+from conftest import REPO_ROOT  # noqa: E402
+from fake_kfp_server import fake_id_token  # noqa: E402
+
+SIZES = [10, 100, 1000, 10000, 100000]
+ROUNDS = 5
+
+WORKFLOW = """apiVersion: argoproj.io/v1alpha1
+kind: Workflow
+metadata:
+  generateName: benchmark-pipeline-
+spec:
+  entrypoint: benchmark-pipeline
+  templates:
+  - name: benchmark-pipeline
+    container: {image: alpine:3.16, command: [echo, hello]}
+"""
+
+_unique = itertools.count()
+
+
+def _last(prefix: str, size: int) -> str:
+    """Function to return the name of the last generated resource, the worst case when paging"""
+    width = max(5, len(str(size - 1)))
+    return f"{prefix}-{size - 1:0{width}d}"
+
+
+def scenario_find_pipeline_id(client, size: int, package: str):
+    kfp_utils.find_pipeline_id(_last("pipeline", size), client)
+
+
+def scenario_find_experiment_id(client, size: int, package: str):
+    kfp_utils.find_experiment_id(_last("experiment", size), "kubeflow", client)
+
+
+def scenario_find_pipeline_version_id(client, size: int, package: str):
+    pipeline_id = kfp_utils.find_pipeline_id(_last("pipeline", size), client)
+    kfp_utils.find_pipeline_version_id(pipeline_id, "version-0", client)
+
+
+def scenario_run_pipeline(client, size: int, package: str):
+    kfp_utils.run_pipeline(client=client,
+                           pipeline_name=_last("pipeline", size),
+                           pipeline_id=None,
+                           experiment_name=_last("experiment", size),
+                           pipeline_parameters_path=None,
+                           pipeline_parameters="message: benchmark",
+                           namespace="kubeflow",
+                           service_account=None,
+                           pipeline_version_name="version-0",
+                           run_name=f"benchmark-{next(_unique)}")
+
+
+def scenario_upload_pipeline(client, size: int, package: str):
+    kfp_utils.pipelines._upload_package(client, package, f"benchmark-pipeline-{next(_unique)}")
+
+
+def scenario_upload_pipeline_version(client, size: int, package: str):
+    kfp_utils.pipelines._upload_package(client, package, _last("pipeline", size), f"benchmark-version-{next(_unique)}")
+
+
+# The scenarios and the API requests of each call, whatever the catalog size
+SCENARIOS = {
+    "find_pipeline_id": (scenario_find_pipeline_id, 1),
+    "find_experiment_id": (scenario_find_experiment_id, 1),
+    "find_pipeline_version_id": (scenario_find_pipeline_version_id, 2),
+    "run_pipeline": (scenario_run_pipeline, 4),
+    "upload_pipeline": (scenario_upload_pipeline, 1),
+    "upload_pipeline_version": (scenario_upload_pipeline_version, 2),
+}
+
+
+@pytest.fixture(scope="module")
+def package(tmp_path_factory):
+    path = tmp_path_factory.mktemp("benchmark") / "benchmark_pipeline.yaml"
+    path.write_text(WORKFLOW)
+    return str(path)
+
+
+@pytest.mark.parametrize("fake_catalog", SIZES, indirect=True)
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_api(benchmark, fake_catalog, package, name):
+    scenario, expected_requests = SCENARIOS[name]
+    client = kfp_utils.create_client(fake_catalog.url, existing_token=fake_id_token("benchmark"))
+    # The scenarios add pipelines and runs to the catalog, never experiments
+    size = len(fake_catalog.experiments)
+    requests = []
+
+    def call():
+        before = fake_catalog.request_count
+        scenario(client, size, package)
+        requests.append(fake_catalog.request_count - before)
+
+    benchmark.group = name
+    benchmark.extra_info["catalog"] = size
+    benchmark.pedantic(call, rounds=ROUNDS, iterations=1)
+    assert requests and set(requests) == {expected_requests}
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_pipeline_compile(benchmark, tmp_path, cached):
+    pytest.importorskip("kfp")
+    function = kfp_utils.load_function("benchmark_pipeline", os.path.join(REPO_ROOT, "benchmarks", "sample_pipeline.py"))
+    options = {"cache_dir": str(tmp_path / "cache")} if cached else {}
+    paths = []
+
+    def compile_pipeline():
+        paths.append(kfp_utils.pipeline_compile(function, output_dir=str(tmp_path), **options))
+
+    benchmark.group = "pipeline_compile"
+    benchmark.pedantic(compile_pipeline, rounds=ROUNDS, iterations=1)
+    # Cached compiles all use the package of the first one, uncached ones each write their own
+    assert len(set(paths)) == (1 if cached else len(paths))
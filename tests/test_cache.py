@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+import kfp_utils
+
+
+def _indexed(index, table: str) -> list:
+    return sorted(row[0] for row in index._db.execute(f"SELECT name FROM {table}"))
+
+
+def test_catalog_index_full_sync_drops_deleted(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=4, versions=2, experiments=3)
+    client = make_client(server)
+    index = kfp_utils.CatalogIndex(str(tmp_path / "catalog.sqlite"))
+    pipeline_ids = list(server.pipelines)
+    index.sync(client, namespace="kubeflow", all_versions=True)
+    assert _indexed(index, "pipelines") == [f"pipeline-{number:05d}" for number in range(4)]
+    assert len(_indexed(index, "versions")) == 8
+
+    del server.pipelines[pipeline_ids[0]]
+    del server.versions[pipeline_ids[0]]
+    del server.versions[pipeline_ids[1]][next(iter(server.versions[pipeline_ids[1]]))]
+    del server.experiments[next(iter(server.experiments))]
+    server._add_pipeline("pipeline-new")
+
+    # Incremental syncs add what is new, and drop the pipelines whose versions are no longer found
+    index.sync(client, namespace="kubeflow", all_versions=True)
+    assert _indexed(index, "pipelines") == ["pipeline-00001", "pipeline-00002", "pipeline-00003", "pipeline-new"]
+    assert len(_indexed(index, "versions")) == 6
+    assert len(_indexed(index, "experiments")) == 3
+
+    index.sync(client, namespace="kubeflow", all_versions=True, full_sync_interval=0)
+    assert _indexed(index, "pipelines") == ["pipeline-00001", "pipeline-00002", "pipeline-00003", "pipeline-new"]
+    assert len(_indexed(index, "versions")) == 5
+    assert _indexed(index, "experiments") == ["experiment-00001", "experiment-00002"]
+    index.close()
+
+
+def test_catalog_index_stale_id_is_resolved_again(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=1, experiments=1, runs=0)
+    client = make_client(server)
+    index = kfp_utils.CatalogIndex(str(tmp_path / "catalog.sqlite"))
+    index.sync(client, namespace="kubeflow")
+    old_id = next(iter(server.pipelines))
+    del server.pipelines[old_id]
+    new_id = server._add_pipeline("pipeline-00000")["id"]
+
+    run = kfp_utils.run_pipeline(client, "pipeline-00000", None, "experiment-00000", None, None, "kubeflow", None,
+                                 cache=index)
+    assert server.runs[run.id]["pipeline_spec"]["pipeline_id"] == new_id
+    assert index.get("pipeline", kfp_utils.listing._client_host(client), "pipeline-00000") == new_id
+    index.close()
+
+
+def test_catalog_index_failed_sync_is_rolled_back(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=3, experiments=1, runs=0)
+    client = make_client(server)
+    index = kfp_utils.CatalogIndex(str(tmp_path / "catalog.sqlite"))
+    host = kfp_utils.listing._client_host(client)
+
+    def row(pipeline):
+        # The oldest pipeline, stored last, has a column the table does not
+        column = "missing" if pipeline.name == "pipeline-00000" else "name"
+        return {"host": host, column: pipeline.name}
+    with pytest.raises(sqlite3.OperationalError):
+        index._sync_listing("pipelines", host, client.list_pipelines, "pipelines", row)
+    assert _indexed(index, "pipelines") == []
+    assert index._db.execute("SELECT COUNT(*) FROM sync_marks").fetchone() == (0,)
+
+    index.sync(client, namespace="kubeflow")
+    assert _indexed(index, "pipelines") == ["pipeline-00000", "pipeline-00001", "pipeline-00002"]
+    index.close()
@@ -0,0 +1,105 @@
+import itertools
+import os
+import textwrap
+
+import pytest
+
+import kfp_utils
+
+pytest.importorskip("kfp.compiler")
+
+COMPONENT = """name: Echo
+inputs:
+- {{name: message, type: String}}
+implementation:
+  container:
+    image: {image}
+    command: [echo, {{inputValue: message}}]
+"""
+
+PIPELINE = """import os
+
+import kfp.components as components
+import kfp.dsl as dsl
+
+import {helper}
+
+here = os.path.dirname(os.path.abspath(__file__))
+echo = components.load_component_from_file(os.path.join(here, "echo.yaml"))
+
+
+@dsl.pipeline(name="cached-pipeline")
+def cached_pipeline(message: str = {helper}.MESSAGE):
+    late_echo = components.load_component_from_file(os.path.join(here, "late_echo.yaml"))
+    late_echo(message).after(echo(message))
+"""
+
+_helpers = itertools.count()
+
+
+@pytest.fixture
+def pipeline_file(tmp_path):
+    """Fixture writing a pipeline module loading components when executed and when compiled,
+    and importing a helper module of a name unique to the test"""
+    helper = f"cache_helper_{next(_helpers)}"
+    (tmp_path / "echo.yaml").write_text(COMPONENT.format(image="alpine:3.16"))
+    (tmp_path / "late_echo.yaml").write_text(COMPONENT.format(image="alpine:3.16"))
+    (tmp_path / f"{helper}.py").write_text('MESSAGE = "hello"\n')
+    (tmp_path / "pipeline.py").write_text(PIPELINE.format(helper=helper))
+    return tmp_path / "pipeline.py"
+
+
+def compile_pipeline(pipeline_file, cache_dir, **options):
+    function = kfp_utils.load_function("cached_pipeline", str(pipeline_file))
+    return kfp_utils.pipeline_compile(function, cache_dir=str(cache_dir), output_dir=str(cache_dir.parent), **options)
+
+
+def test_unchanged_pipeline_is_compiled_once(pipeline_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    path = compile_pipeline(pipeline_file, cache_dir)
+
+    assert compile_pipeline(pipeline_file, cache_dir) == path
+    assert os.path.dirname(path).startswith(str(cache_dir))
+    assert compile_pipeline(pipeline_file, cache_dir, cache_key_extra="other-sha") != path
+
+
+@pytest.mark.parametrize("edited", ["pipeline.py", "helper", "echo.yaml", "late_echo.yaml"])
+def test_edits_invalidate_the_cached_pipeline(pipeline_file, tmp_path, edited):
+    cache_dir = tmp_path / "cache"
+    path = compile_pipeline(pipeline_file, cache_dir)
+
+    if edited == "helper":
+        helper = next(tmp_path.glob("cache_helper_*.py"))
+        helper.write_text('MESSAGE = "goodbye"\n')
+    elif edited == "pipeline.py":
+        pipeline_file.write_text(pipeline_file.read_text() + "\n# edited\n")
+    else:
+        (tmp_path / edited).write_text(COMPONENT.format(image="alpine:3.17"))
+    edited_path = compile_pipeline(pipeline_file, cache_dir)
+
+    assert edited_path != path
+    assert os.path.exists(path)
+    assert compile_pipeline(pipeline_file, cache_dir) == edited_path
+
+
+def test_pipeline_loading_components_from_urls_is_not_cached(tmp_path, monkeypatch):
+    import kfp.components as components
+    monkeypatch.setattr(components, "load_component_from_url",
+                        lambda url: components.load_component_from_text(COMPONENT.format(image="alpine:3.16")))
+    (tmp_path / "url_pipeline.py").write_text(textwrap.dedent("""
+        import kfp.components as components
+        import kfp.dsl as dsl
+
+        echo = components.load_component_from_url("https://example.com/echo.yaml")
+
+
+        @dsl.pipeline(name="url-pipeline")
+        def url_pipeline(message: str = "hello"):
+            echo(message)
+        """))
+    function = kfp_utils.load_function("url_pipeline", str(tmp_path / "url_pipeline.py"))
+    cache_dir = tmp_path / "cache"
+
+    path = kfp_utils.pipeline_compile(function, cache_dir=str(cache_dir), output_dir=str(tmp_path))
+    assert kfp_utils.pipeline_compile(function, cache_dir=str(cache_dir), output_dir=str(tmp_path)) != path
+    assert not os.path.dirname(path).startswith(str(cache_dir))
@@ -0,0 +1,78 @@
+import zipfile
+
+import pytest
+
+import kfp_utils
+
+pytest.importorskip("kfp.compiler")
+
+PIPELINE = """import kfp.dsl as dsl
+
+import steps
+
+
+@dsl.pipeline(name="{name}")
+def {name}(message: str = "hello"):
+    dsl.ContainerOp(name="echo", image=steps.IMAGE, command=["echo"], arguments=[message])
+"""
+
+VERSIONED_PIPELINE = """import kfp.dsl as dsl
+
+
+def versioned(github_sha: str):
+    @dsl.pipeline(name="versioned")
+    def pipeline(message: str = "hello"):
+        dsl.ContainerOp(name="echo", image=f"alpine:{github_sha}", command=["echo"], arguments=[message])
+    return pipeline
+"""
+
+
+def _workflow(path: str) -> str:
+    with zipfile.ZipFile(path) as package:
+        return package.read(package.namelist()[0]).decode()
+
+
+@pytest.fixture
+def pipelines(tmp_path):
+    """Fixture writing pipelines in two directories, each importing its own local module named steps"""
+    for directory, image in (("first", "alpine:3.16"), ("second", "busybox:1.36")):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "steps.py").write_text(f'IMAGE = "{image}"\n')
+        for name in ("train", "evaluate"):
+            (tmp_path / directory / f"{name}.py").write_text(PIPELINE.format(name=name))
+    (tmp_path / "crash.py").write_text("import os\nos._exit(3)\n")
+    (tmp_path / "versioned.py").write_text(VERSIONED_PIPELINE)
+    return tmp_path
+
+
+def test_local_modules_of_different_directories_do_not_clash(pipelines, tmp_path):
+    tasks = [(directory, name) for directory in ("first", "second", "first") for name in ("train", "evaluate")]
+    with kfp_utils.CompileWorkerPool(max_workers=1) as pool:
+        futures = [pool.submit(code_path=str(pipelines / directory / f"{name}.py"), function=name,
+                               v2_compatible=False, output_dir=str(tmp_path))
+                   for directory, name in tasks]
+        paths = [future.result(timeout=120) for future in futures]
+
+    assert len(set(paths)) == len(paths)
+    for (directory, _), path in zip(tasks, paths):
+        assert ("image: alpine:3.16" if directory == "first" else "image: busybox:1.36") in _workflow(path)
+
+
+def test_failures_are_reported_per_pipeline(pipelines, tmp_path):
+    with kfp_utils.CompileWorkerPool(max_workers=1) as pool:
+        crash = pool.submit(code_path=str(pipelines / "crash.py"), function="crash", v2_compatible=False,
+                            output_dir=str(tmp_path))
+        missing = pool.submit(code_path=str(pipelines / "first" / "train.py"), function="missing",
+                              v2_compatible=False, output_dir=str(tmp_path))
+        versioned = pool.submit(code_path=str(pipelines / "versioned.py"), function="versioned",
+                                v2_compatible=False, github_sha="abc123", output_dir=str(tmp_path))
+
+        with pytest.raises(RuntimeError, match="exited with code 3"):
+            crash.result(timeout=120)
+        with pytest.raises(RuntimeError, match="AttributeError"):
+            missing.result(timeout=120)
+        # The worker which crashed is replaced
+        assert "image: alpine:abc123" in _workflow(versioned.result(timeout=120))
+
+    with pytest.raises(RuntimeError, match="shut down"):
+        pool.submit(code_path=str(pipelines / "versioned.py"), function="versioned", v2_compatible=False)
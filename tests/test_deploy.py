@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import kfp_utils
+from fake_kfp_server import fake_id_token
+
+
+@pytest.fixture
+def package(tmp_path):
+    path = tmp_path / "pipeline.yaml"
+    path.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\n")
+    return str(path)
+
+
+@pytest.fixture
+def clusters(fake_server, monkeypatch):
+    """Fixture starting two fake clusters and one rejecting every request, returns the servers by target name"""
+    monkeypatch.setenv("FAKE_ID_TOKEN", fake_id_token("tests"))
+    return {"dev": fake_server(pipelines=0, experiments=1, runs=0),
+            "prod": fake_server(pipelines=0, experiments=1, runs=0),
+            "broken": fake_server(pipelines=0, experiments=1, runs=0, error_rate=1.0, error_status=400)}
+
+
+def _targets(clusters, **options) -> list:
+    return [dict({"name": name, "kubeflow_url": server.url, "id_token_env": "FAKE_ID_TOKEN"}, **options.get(name, {}))
+            for name, server in clusters.items()]
+
+
+def _deploy(package, targets, **options) -> list:
+    return kfp_utils.deploy_pipeline(package, "train", targets, pipeline_version_name="train-v1", run=True,
+                                     namespace="kubeflow", experiment_name="experiment-00000", **options)
+
+
+def test_deploy_to_every_target(clusters, package, tmp_path, monkeypatch):
+    targets = _targets(clusters, prod={"run": False})
+    results = _deploy(package, targets)
+
+    dev, prod, broken = results
+    assert dev["status"] == "started" and dev["run_id"] in clusters["dev"].runs
+    assert dev["run_url"] == f"{clusters['dev'].url}/#/runs/details/{dev['run_id']}"
+    assert prod["status"] == "uploaded" and not clusters["prod"].runs
+    assert clusters["prod"].versions[prod["pipeline_id"]][prod["version_id"]]["name"] == "train-v1"
+    assert broken["status"] == "failed" and broken["error"].startswith("pending:")
+
+    summary = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+    assert not kfp_utils.report_deploy_results(results, str(tmp_path / "results.json"))
+    assert json.loads((tmp_path / "results.json").read_text()) == results
+    assert summary.read_text().startswith("### Kubeflow deploy failed")
+    assert kfp_utils.report_deploy_results(results, failure_policy="any")
+
+
+@pytest.mark.parametrize("required, succeeded", [(True, False), (False, True)])
+def test_required_policy(clusters, package, required, succeeded):
+    results = _deploy(package, _targets(clusters, broken={"required": required}), failure_policy="required")
+    assert [result["status"] for result in results] == ["started", "started", "failed"]
+    assert kfp_utils.deploy_succeeded(results, "required") is succeeded
+
+
+def test_targets_are_skipped_once_the_policy_cannot_be_met(clusters, package):
+    targets = _targets(clusters)
+    targets.insert(0, targets.pop())
+    results = _deploy(package, targets, max_workers=1)
+
+    assert [(result["target"], result["status"]) for result in results] == [
+        ("broken", "failed"), ("dev", "skipped"), ("prod", "skipped")]
+    assert not clusters["dev"].requests and not clusters["prod"].requests
+
+
+def test_read_deploy_targets(tmp_path, monkeypatch):
+    path = tmp_path / "targets.yaml"
+    path.write_text("- {name: dev, kubeflow_url: https://dev}\n- {name: prod, kubeflow_url: https://prod, "
+                    "id_token_env: PROD_ID_TOKEN}\n")
+    monkeypatch.setenv("PROD_ID_TOKEN", "token")
+    assert [target["name"] for target in kfp_utils.read_deploy_targets(str(path))] == ["dev", "prod"]
+
+    monkeypatch.delenv("PROD_ID_TOKEN")
+    with pytest.raises(ValueError, match="PROD_ID_TOKEN"):
+        kfp_utils.read_deploy_targets(str(path))
+    path.write_text("- {name: dev, kubeflow_url: https://dev}\n- {name: dev, kubeflow_url: https://prod}\n")
+    with pytest.raises(ValueError, match="listed twice"):
+        kfp_utils.read_deploy_targets(str(path))
+    with pytest.raises(ValueError, match="Unknown failure policy"):
+        kfp_utils.deploy_succeeded([], "most")
@@ -0,0 +1,145 @@
+import pytest
+
+import kfp_utils
+
+
+def _jobs(*names, **options):
+    return [dict({"name": name, "pipeline": "pipeline-00000", "cron": "0 0 * * * *"}, **options) for name in names]
+
+
+@pytest.mark.parametrize("filtering", [True, False])
+def test_reconcile_recurring_runs(fake_server, make_client, filtering):
+    server = fake_server(pipelines=2, experiments=2, filtering=filtering)
+    client = make_client(server)
+    reconcile = lambda jobs, **options: {  # noqa: E731
+        result["name"]: result for result in kfp_utils.reconcile_recurring_runs(
+            client, jobs, "kubeflow", experiment_name="experiment-00000", **options)}
+
+    results = reconcile(_jobs("nightly", "hourly"))
+    assert {name: result["action"] for name, result in results.items()} == {"nightly": "create", "hourly": "create"}
+    assert sorted(job["name"] for job in server.jobs.values()) == ["hourly", "nightly"]
+
+    results = reconcile(_jobs("nightly", "hourly"))
+    assert {result["action"] for result in results.values()} == {"unchanged"}
+    assert len(server.jobs) == 2
+
+    jobs = _jobs("nightly", "hourly")
+    jobs[0]["params"] = {"epochs": 3}
+    jobs[1]["enabled"] = False
+    results = reconcile(jobs)
+    assert results["nightly"]["action"] == "update"
+    assert results["hourly"]["action"] == "disable"
+    assert results["nightly"]["job_id"] in server.jobs
+    assert len(server.jobs) == 2
+    assert not server.jobs[results["hourly"]["job_id"]]["enabled"]
+
+    results = reconcile(_jobs("nightly", params={"epochs": 3}), prune=True)
+    assert results["hourly"]["action"] == "delete"
+    assert [job["name"] for job in server.jobs.values()] == ["nightly"]
+    assert not any(result.get("error") for result in results.values())
+
+
+def test_reconcile_recurring_runs_with_the_sdk_client(fake_server, make_sdk_client):
+    server = fake_server(pipelines=1, experiments=1)
+    client = make_sdk_client(server)
+    reconcile = lambda jobs: {  # noqa: E731
+        result["name"]: result for result in kfp_utils.reconcile_recurring_runs(
+            client, jobs, "kubeflow", experiment_name="experiment-00000")}
+
+    reconcile(_jobs("nightly", enabled=False))
+    job_id = next(iter(server.jobs))
+    assert not server.jobs[job_id]["enabled"]
+    results = reconcile(_jobs("nightly"))
+    assert results["nightly"]["action"] == "enable" and not results["nightly"].get("error")
+    assert server.jobs[job_id]["enabled"]
+
+
+def test_reconcile_leaves_unmanaged_jobs(fake_server, make_client):
+    server = fake_server(pipelines=1, experiments=1)
+    client = make_client(server)
+    experiment_id = next(iter(server.experiments))
+    client.create_recurring_run(experiment_id, "handmade", cron_expression="0 0 * * * *",
+                                pipeline_id=next(iter(server.pipelines)))
+
+    results = kfp_utils.reconcile_recurring_runs(client, [], "kubeflow", experiment_name="experiment-00000",
+                                                 prune=True)
+    assert results == []
+    assert [job["name"] for job in server.jobs.values()] == ["handmade"]
+
+
+@pytest.mark.parametrize("filtering", [True, False])
+def test_apply_retention(fake_server, make_client, filtering):
+    server = fake_server(pipelines=6, versions=4, experiments=1, runs=4, filtering=filtering)
+    client = make_client(server)
+    kept_runs = [run["id"] for run in server.runs.values()]
+    server._add_pipeline("other")
+    recent_run = server._add_run(next(iter(server.experiments)), "recent")
+    archived = next(iter(server.runs.values()))
+    archived["storage_state"] = "STORAGESTATE_ARCHIVED"
+    policy = {"pipelines": [{"prefix": "pipeline-", "keep": 2, "keep_versions": 1}],
+              "runs": [{"experiment": "experiment-00000", "archive_after_days": 30, "delete_after_days": 90}]}
+
+    changes = kfp_utils.apply_retention(client, policy, "kubeflow")
+    assert not any(change.get("error") for change in changes)
+    assert sorted(pipeline["name"] for pipeline in server.pipelines.values()) == \
+        ["other", "pipeline-00004", "pipeline-00005"]
+    for pipeline in server.pipelines.values():
+        if pipeline["name"] != "other":
+            assert list(server.versions[pipeline["id"]]) == [pipeline["default_version"]["id"]]
+    assert archived["id"] not in server.runs
+    assert recent_run["storage_state"] == "STORAGESTATE_AVAILABLE"
+    assert all(server.runs[run_id]["storage_state"] == "STORAGESTATE_ARCHIVED"
+               for run_id in kept_runs if run_id != archived["id"])
+
+
+def test_apply_retention_with_the_sdk_client(fake_server, make_sdk_client):
+    server = fake_server(pipelines=3, versions=2, experiments=1, runs=4)
+    client = make_sdk_client(server)
+    archived = next(iter(server.runs.values()))
+    archived["storage_state"] = "STORAGESTATE_ARCHIVED"
+    policy = {"pipelines": [{"prefix": "pipeline-", "keep": 1, "keep_versions": 1}],
+              "runs": [{"experiment": "experiment-00000", "archive_after_days": 30, "delete_after_days": 90}]}
+
+    changes = kfp_utils.apply_retention(client, policy, "kubeflow")
+    assert not any(change.get("error") for change in changes)
+    assert [pipeline["name"] for pipeline in server.pipelines.values()] == ["pipeline-00002"]
+    assert archived["id"] not in server.runs
+    assert all(run["storage_state"] == "STORAGESTATE_ARCHIVED" for run in server.runs.values())
+
+
+def test_replaced_job_is_kept_until_its_replacement_exists(fake_server, make_client, monkeypatch):
+    server = fake_server(pipelines=1, experiments=1)
+    client = make_client(server)
+    reconcile = lambda jobs: kfp_utils.reconcile_recurring_runs(  # noqa: E731
+        client, jobs, "kubeflow", experiment_name="experiment-00000")
+    old_id = reconcile(_jobs("nightly"))[0]["job_id"]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("injected failure")
+    with monkeypatch.context() as patch:
+        patch.setattr(client.client, "create_recurring_run", fail)
+        results = reconcile(_jobs("nightly", params={"epochs": 3}))
+    assert results[0]["action"] == "update" and results[0]["error"]
+    assert list(server.jobs) == [old_id]
+
+    with monkeypatch.context() as patch:
+        patch.setattr(client.client, "delete_job", fail)
+        results = reconcile(_jobs("nightly", params={"epochs": 3}))
+    assert results[0]["action"] == "update" and results[0]["error"]
+    assert len(server.jobs) == 2
+
+    results = reconcile(_jobs("nightly", params={"epochs": 3}))
+    assert sorted(result["action"] for result in results) == ["delete", "unchanged"]
+    assert len(server.jobs) == 1 and old_id not in server.jobs
+
+
+def test_reconcile_with_stale_cached_ids(fake_server, make_client):
+    server = fake_server(pipelines=1, experiments=1)
+    client = make_client(server)
+    cache = kfp_utils.ResolutionCache()
+    cache.put("pipeline", kfp_utils.listing._client_host(client), "pipeline-00000", "deleted-pipeline")
+
+    results = kfp_utils.reconcile_recurring_runs(client, _jobs("nightly"), "kubeflow",
+                                                 experiment_name="experiment-00000", cache=cache)
+    assert [(result["action"], result.get("error")) for result in results] == [("create", None)]
+    assert [job["name"] for job in server.jobs.values()] == ["nightly"]
@@ -0,0 +1,39 @@
+import pytest
+
+import kfp_utils
+
+
+@pytest.mark.parametrize("filtering", [True, False])
+def test_find_ids(fake_server, make_client, filtering):
+    server = fake_server(pipelines=250, versions=3, experiments=250, filtering=filtering)
+    client = make_client(server)
+
+    pipeline_id = kfp_utils.find_pipeline_id("pipeline-00240", client)
+    assert server.pipelines[pipeline_id]["name"] == "pipeline-00240"
+    version_id = kfp_utils.find_pipeline_version_id(pipeline_id, "version-1", client)
+    assert server.versions[pipeline_id][version_id]["name"] == "version-1"
+    experiment_id = kfp_utils.find_experiment_id("experiment-00249", "kubeflow", client)
+    assert server.experiments[experiment_id]["name"] == "experiment-00249"
+    with pytest.raises(ValueError):
+        kfp_utils.find_pipeline_id("missing", client)
+
+    lookups = sum(count for route, count in server.requests.items() if route.startswith("GET"))
+    # A filtered lookup is one request, the fallback is the rejected request and pages of 100
+    assert lookups == (4 if filtering else 1 + 3 + 1 + 1 + 1 + 3 + 1 + 3)
+
+
+@pytest.mark.parametrize("filtering", [True, False])
+def test_list_filtered(fake_server, make_client, filtering):
+    server = fake_server(pipelines=30, filtering=filtering)
+    client = make_client(server)
+    server._add_pipeline("other-pipeline-00001")
+
+    pipelines = kfp_utils.listing._list_filtered(
+        client.list_pipelines, "pipelines", {"op": 9, "key": "name", "stringValue": "pipeline-0001"},
+        lambda pipeline: pipeline.name.startswith("pipeline-0001"))
+    assert sorted(pipeline.name for pipeline in pipelines) == [f"pipeline-{index:05d}" for index in range(10, 20)]
+
+    runs = kfp_utils.listing._list_filtered(
+        client.list_pipelines, "pipelines", {"op": 6, "key": "created_at", "timestampValue": "2022-01-01T00:05:00Z"},
+        lambda pipeline: kfp_utils.listing._format_timestamp(pipeline.created_at) < "2022-01-01T00:05:00Z")
+    assert len(runs) == 5
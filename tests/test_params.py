@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import kfp_utils
+from kfp_utils import params
+
+MULTI_DOCUMENT = """epochs: 3
+staging: {region: eu, replicas: 1}
+---
+epochs: 5
+production: {region: us, replicas: 3}
+---
+staging: {replicas: 2}
+"""
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Fixture counting the parses of parameter files"""
+    calls = []
+    parse = params._parse_params_documents
+
+    def counting_parse(path, content):
+        calls.append(path)
+        return parse(path, content)
+    monkeypatch.setattr(params, "_parse_params_documents", counting_parse)
+    return calls
+
+
+def test_documents_are_merged_in_order(tmp_path):
+    path = tmp_path / "params.yaml"
+    path.write_text(MULTI_DOCUMENT)
+
+    merged = kfp_utils.read_pipeline_params(str(path))
+    assert merged["epochs"] == 5 and merged["staging"] == {"replicas": 2}
+    assert kfp_utils.read_pipeline_params(f"{path}#staging") == {"region": "eu", "replicas": 2}
+    assert kfp_utils.read_pipeline_params(f"{path}#production") == {"region": "us", "replicas": 3}
+    with pytest.raises(ValueError, match="No parameters under the key testing"):
+        kfp_utils.read_pipeline_params(f"{path}#testing")
+
+
+def test_hash_in_the_file_name_is_not_a_key(tmp_path):
+    path = tmp_path / "params#v2.yaml"
+    path.write_text("epochs: 3\n")
+    assert kfp_utils.read_pipeline_params(str(path)) == {"epochs": 3}
+
+    keyed = tmp_path / "params#v2#staging.yaml"
+    keyed.write_text("staging: {epochs: 1}\n")
+    assert kfp_utils.read_pipeline_params(f"{keyed}#staging") == {"epochs": 1}
+
+
+def test_json_and_jsonl(tmp_path):
+    (tmp_path / "params.json").write_text('{"epochs": 3, "layers": [1, 2]}')
+    (tmp_path / "params.jsonl").write_text('{"epochs": 3}\n\n{"epochs": 4, "seed": 1}\n')
+    assert kfp_utils.read_pipeline_params(str(tmp_path / "params.json")) == {"epochs": 3, "layers": [1, 2]}
+    assert kfp_utils.read_pipeline_params(str(tmp_path / "params.jsonl")) == {"epochs": 4, "seed": 1}
+
+
+@pytest.mark.parametrize("content", ["- epochs\n", "epochs: [3\n"])
+def test_invalid_parameters(tmp_path, content):
+    path = tmp_path / "params.yaml"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        kfp_utils.read_pipeline_params(str(path))
+
+
+def test_parsed_files_are_cached(tmp_path, parses):
+    path = tmp_path / "params.yaml"
+    path.write_text(MULTI_DOCUMENT)
+
+    kfp_utils.read_pipeline_params(str(path))
+    kfp_utils.read_pipeline_params(f"{path}#staging")
+    assert len(parses) == 1
+
+    # A touched file with the same content is hashed, not parsed
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    kfp_utils.read_pipeline_params(str(path))
+    assert len(parses) == 1
+
+    path.write_text(MULTI_DOCUMENT.replace("epochs: 5", "epochs: 7"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+    assert kfp_utils.read_pipeline_params(str(path))["epochs"] == 7
+    assert len(parses) == 2
+
+
+def test_run_with_keyed_parameters(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=1, experiments=1, runs=0)
+    client = make_client(server)
+    path = tmp_path / "params.yaml"
+    path.write_text(MULTI_DOCUMENT)
+
+    run = kfp_utils.run_pipeline(client=client,
+                                 pipeline_name="pipeline-00000",
+                                 pipeline_id=None,
+                                 experiment_name="experiment-00000",
+                                 pipeline_parameters_path=f"{path}#staging",
+                                 pipeline_parameters="replicas: 4\nmessage: hello",
+                                 namespace="kubeflow",
+                                 service_account=None,
+                                 run_name="params")
+
+    parameters = {parameter["name"]: parameter["value"]
+                  for parameter in server.runs[run.id]["pipeline_spec"]["parameters"]}
+    assert parameters == {"region": "eu", "replicas": "4", "message": "hello"}
+
+
+def test_summarize_params():
+    long_list = list(range(200))
+    summary = kfp_utils.summarize_params({"epochs": 3, "mixed": {1: "a", "x": "b"}, "data": long_list},
+                                         max_length=50)
+    assert summary["epochs"] == 3
+    assert summary["mixed"] == {1: "a", "x": "b"}
+    assert summary["data"].startswith("<list, 200 items, sha256:")
@@ -0,0 +1,108 @@
+import pytest
+
+import kfp_utils
+from fake_kfp_server import fake_id_token
+
+
+def _stale_cache(server, client, **entries) -> kfp_utils.ResolutionCache:
+    cache = kfp_utils.ResolutionCache()
+    host = kfp_utils.listing._client_host(client)
+    for name, stale_id in entries.items():
+        kind, _, name = name.partition("__")
+        scope = f"{host}|kubeflow" if kind == "experiment" else host
+        cache.put(kind, scope, name.replace("_", "-"), stale_id)
+    return cache
+
+
+def test_run_pipeline_with_stale_cached_ids(fake_server, make_client):
+    server = fake_server(pipelines=2, experiments=2)
+    client = make_client(server)
+    cache = _stale_cache(server, client, pipeline__pipeline_00001="deleted-pipeline",
+                         experiment__experiment_00001="deleted-experiment")
+
+    run = kfp_utils.run_pipeline(client, "pipeline-00001", None, "experiment-00001", None, None, "kubeflow", None,
+                                 run_name="stale", cache=cache)
+    host = kfp_utils.listing._client_host(client)
+    pipeline_id = cache.get("pipeline", host, "pipeline-00001")
+    assert server.pipelines[pipeline_id]["name"] == "pipeline-00001"
+    assert server.experiments[cache.get("experiment", f"{host}|kubeflow", "experiment-00001")]["name"] == \
+        "experiment-00001"
+    assert [created["id"] for created in server.runs.values() if created["name"] == "stale"] == [run.id]
+    assert server.runs[run.id]["pipeline_spec"]["pipeline_id"] == pipeline_id
+
+
+def test_sweep_with_stale_cached_ids(fake_server, make_client):
+    server = fake_server(pipelines=1, experiments=1, runs=0)
+    client = make_client(server)
+    cache = _stale_cache(server, client, pipeline__pipeline_00000="deleted-pipeline")
+
+    results = kfp_utils.run_pipeline_sweep(client, "pipeline-00000", None, "experiment-00000", "kubeflow", None,
+                                           [{"lr": lr} for lr in range(6)], cache=cache, max_concurrency=3)
+    assert results["started"] == 6
+    assert results["pipeline_id"] in server.pipelines
+    assert len(server.runs) == 6
+    assert server.requests["GET /pipelines"] == 1
+
+
+def test_upload_version_with_stale_cached_pipeline(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=1)
+    client = make_client(server)
+    package = tmp_path / "pipeline.yaml"
+    package.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\n")
+    cache = _stale_cache(server, client, pipeline__train="deleted-pipeline")
+
+    pipeline_id, version_id = kfp_utils.pipelines._upload_package(client, str(package), "train", "v1", cache=cache)
+    assert server.pipelines[pipeline_id]["name"] == "train"
+    assert server.versions[pipeline_id][version_id]["name"] == "v1"
+    assert cache.get("pipeline", kfp_utils.listing._client_host(client), "train") == pipeline_id
+
+
+def test_stale_error_is_raised_when_the_ids_are_unchanged(fake_server, make_client):
+    server = fake_server(pipelines=1, experiments=1, runs=0)
+    client = make_client(server)
+    cache = kfp_utils.ResolutionCache()
+    kfp_utils.find_experiment_id("experiment-00000", "kubeflow", client, cache=cache)
+    pipeline_id = next(iter(server.pipelines))
+    del server.pipelines[pipeline_id]
+
+    with pytest.raises(Exception) as exc_info:
+        kfp_utils.run_pipeline(client, None, pipeline_id, "experiment-00000", None, None, "kubeflow", None,
+                               cache=cache)
+    assert kfp_utils.is_not_found(exc_info.value)
+    assert not server.runs
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_deduplicated_upload_reuses_an_identical_version_of_any_name(fake_server, make_client, tmp_path, cached):
+    server = fake_server(pipelines=0)
+    client = make_client(server)
+    package = tmp_path / "pipeline.yaml"
+    package.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\n")
+    cache = kfp_utils.ResolutionCache() if cached else None
+    upload = lambda version_name: kfp_utils.pipelines._upload_package(  # noqa: E731
+        client, str(package), "train", version_name, cache=cache, deduplicate=True)
+
+    pipeline_id, first_id = upload("train_aaaa")
+    assert upload("train_bbbb") == (pipeline_id, first_id)
+    assert [version["name"] for version in server.versions[pipeline_id].values()] == ["train_aaaa"]
+    package.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\nmetadata: {name: changed}\n")
+    assert upload("train_cccc")[1] != first_id
+
+
+def test_deploy_runs_the_reused_version(fake_server, tmp_path, monkeypatch):
+    server = fake_server(pipelines=0, experiments=1, runs=0)
+    monkeypatch.setenv("FAKE_ID_TOKEN", fake_id_token("tests"))
+    package = tmp_path / "pipeline.yaml"
+    package.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\n")
+    targets = [{"name": "dev", "kubeflow_url": server.url, "id_token_env": "FAKE_ID_TOKEN"}]
+    deploy = lambda version_name: kfp_utils.deploy_pipeline(  # noqa: E731
+        str(package), "train", targets, pipeline_version_name=version_name, run=True, namespace="kubeflow",
+        experiment_name="experiment-00000", deduplicate=True)[0]
+
+    first = deploy("train_aaaa")
+    second = deploy("train_bbbb")
+    assert second["status"] == "started" and second["version_id"] == first["version_id"]
+    references = server.runs[second["run_id"]]["resource_references"]
+    assert {"id": first["version_id"], "type": "PIPELINE_VERSION"} in [reference["key"] for reference in references]
+    # The versions were only listed to find the identical one, the runs were started with the uploaded IDs
+    assert server.requests["GET /pipeline_versions"] == 1
@@ -0,0 +1,69 @@
+import collections
+
+import pytest
+
+import kfp_utils
+
+
+@pytest.fixture
+def faulty_client(fake_server, make_client):
+    """Fixture returning a fake server failing requests and losing creation responses, and its client"""
+    server = fake_server(pipelines=1, experiments=1, error_rate=0.2, lost_response_rate=0.5, retry_after=0, seed=3)
+    client = make_client(server, max_retries=10)
+    # Injected failures come in streaks, which must be retried rather than fail fast
+    client.breaker = None
+    return server, client
+
+
+def test_uploads_are_not_repeated(faulty_client, tmp_path):
+    server, client = faulty_client
+    package = tmp_path / "pipeline.yaml"
+    package.write_text("apiVersion: argoproj.io/v1alpha1\nkind: Workflow\n")
+
+    pipelines = [client.upload_pipeline(str(package), f"train-{index}") for index in range(5)]
+    names = collections.Counter(pipeline["name"] for pipeline in server.pipelines.values())
+    assert all(names[f"train-{index}"] == 1 for index in range(5))
+    assert [pipeline.id for pipeline in pipelines] == [
+        next(id for id, pipeline in server.pipelines.items() if pipeline["name"] == f"train-{index}")
+        for index in range(5)]
+
+    pipeline_id = pipelines[0].id
+    versions = [client.upload_pipeline_version(str(package), f"v{index}", pipeline_id=pipeline_id)
+                for index in range(5)]
+    assert sorted(version["name"] for version in server.versions[pipeline_id].values()) == \
+        [f"v{index}" for index in range(5)]
+    assert {version.id for version in versions} == set(server.versions[pipeline_id])
+    # Responses were lost, so the uploads were looked up before being retried
+    assert server.requests["GET /pipelines"] and server.requests["GET /pipeline_versions"]
+
+
+def test_runs_of_the_same_name_are_each_created_once(faulty_client):
+    server, client = faulty_client
+    experiment_id = next(iter(server.experiments))
+    pipeline_id = next(iter(server.pipelines))
+    older = server._add_run(experiment_id, "nightly", index=0)
+
+    runs = [client.run_pipeline(experiment_id, "nightly", pipeline_id=pipeline_id) for _ in range(5)]
+    nightly = [run_id for run_id, run in server.runs.items() if run["name"] == "nightly"]
+    assert len(nightly) == 6
+    assert sorted(run.id for run in runs) == sorted(run_id for run_id in nightly if run_id != older["id"])
+    assert server.requests["GET /runs"]
+
+
+def test_recurring_runs_of_the_same_name_are_each_created_once(faulty_client):
+    server, client = faulty_client
+    experiment_id = next(iter(server.experiments))
+    pipeline_id = next(iter(server.pipelines))
+
+    jobs = [client.create_recurring_run(experiment_id, "hourly", cron_expression="0 0 * * * *",
+                                        pipeline_id=pipeline_id) for _ in range(4)]
+    assert len(server.jobs) == 4
+    assert sorted(job.id for job in jobs) == sorted(server.jobs)
+    assert server.requests["GET /jobs"]
+
+
+def test_failed_attempts_are_retried(faulty_client):
+    server, client = faulty_client
+    for _ in range(20):
+        assert kfp_utils.find_pipeline_id("pipeline-00000", client)
+    assert server.requests["GET /pipelines"] > 20
@@ -0,0 +1,60 @@
+import json
+import threading
+
+import kfp_utils
+
+POLL = {"initial_interval": 0.05, "max_interval": 0.1}
+
+
+def finish_later(server, states: dict, delay: float):
+    """Function to set the states of runs of the fake server after a delay"""
+    def finish():
+        for run_id, state in states.items():
+            server.runs[run_id]["status"] = state
+    timer = threading.Timer(delay, finish)
+    timer.start()
+    return timer
+
+
+def test_wait_for_runs_polls_an_experiment_in_batches(fake_server, make_client):
+    server = fake_server(pipelines=0, experiments=1, runs=0)
+    client = make_client(server)
+    experiment_id = next(iter(server.experiments))
+    run_ids = [server._add_run(experiment_id, f"new-run-{index}")["id"] for index in range(3)]
+
+    finish_later(server, {run_ids[0]: "Succeeded", run_ids[1]: "Failed"}, delay=0)
+    timer = finish_later(server, {run_ids[2]: "Succeeded"}, delay=1.0)
+    states = kfp_utils.wait_for_runs(client, run_ids, experiment_id=experiment_id, timeout=10, **POLL)
+    timer.join()
+
+    assert states == {run_ids[0]: "Succeeded", run_ids[1]: "Failed", run_ids[2]: "Succeeded"}
+    # The three runs are listed together, then the one left is fetched by itself
+    assert server.requests["GET /runs"] == 1
+    assert server.requests["GET /runs/(?P<id>[^/]+)"] >= 1
+
+
+def test_wait_for_runs_times_out(fake_server, make_client):
+    server = fake_server(pipelines=0, experiments=1, runs=0)
+    client = make_client(server)
+    run_id = server._add_run(next(iter(server.experiments)), "stuck-run")["id"]
+
+    assert kfp_utils.wait_for_runs(client, [run_id], timeout=0.2, **POLL) == {run_id: "Timeout"}
+    assert server.requests["GET /runs/(?P<id>[^/]+)"] >= 2
+
+
+def test_report_run(fake_server, make_client, tmp_path, monkeypatch):
+    server = fake_server(pipelines=0, experiments=1, runs=0)
+    client = make_client(server)
+    run = client.get_run(server._add_run(next(iter(server.experiments)), "run")["id"]).run
+    output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output))
+
+    assert kfp_utils.report_run(client, run)
+    assert output.read_text() == f"RUN_ID={run.id}\nWORKFLOW_URL={server.url}/#/runs/details/{run.id}\n"
+
+    output.write_text("")
+    server.runs[run.id]["status"] = "Failed"
+    assert not kfp_utils.report_run(client, run, wait=True, timeout=10)
+    outputs = dict(line.split("=", 1) for line in output.read_text().splitlines())
+    assert outputs["RUN_STATUS"] == "Failed"
+    assert json.loads(outputs["STEP_DURATIONS"]) == {"step": {"state": "Failed", "duration": 0.0}}
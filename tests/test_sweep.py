@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import kfp_utils
+
+
+def test_read_parameter_sweep_grid_and_runs(tmp_path):
+    path = tmp_path / "sweep.yaml"
+    path.write_text("""
+grid:
+  learning_rate: [0.1, 0.01]
+  batch_size: [32, 64]
+runs:
+  - {learning_rate: 0.001, batch_size: 128}
+""")
+    assert list(kfp_utils.read_parameter_sweep(str(path))) == [
+        {"learning_rate": 0.1, "batch_size": 32},
+        {"learning_rate": 0.1, "batch_size": 64},
+        {"learning_rate": 0.01, "batch_size": 32},
+        {"learning_rate": 0.01, "batch_size": 64},
+        {"learning_rate": 0.001, "batch_size": 128},
+    ]
+
+
+def test_read_parameter_sweep_list_and_jsonl(tmp_path):
+    (tmp_path / "sweep.yaml").write_text("- {seed: 1}\n- {seed: 2}\n")
+    (tmp_path / "sweep.jsonl").write_text('{"seed": 1}\n\n{"seed": 2}\n')
+    for name in ("sweep.yaml", "sweep.jsonl"):
+        assert list(kfp_utils.read_parameter_sweep(str(tmp_path / name))) == [{"seed": 1}, {"seed": 2}]
+
+
+@pytest.mark.parametrize("text", ["seed: 1\n", "grid: [\n"])
+def test_read_parameter_sweep_rejects_invalid_sweeps(tmp_path, text):
+    path = tmp_path / "sweep.yaml"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(kfp_utils.read_parameter_sweep(str(path)))
+
+
+def test_run_pipeline_sweep(fake_server, make_client, tmp_path):
+    server = fake_server(pipelines=3, experiments=3, runs=0)
+    client = make_client(server)
+    sweep = tmp_path / "sweep.yaml"
+    sweep.write_text("grid:\n  learning_rate: [0.1, 0.01]\n  batch_size: [32, 64]\n")
+
+    results = kfp_utils.run_pipeline_sweep(client=client,
+                                           pipeline_name="pipeline-00001",
+                                           pipeline_id=None,
+                                           experiment_name="experiment-00002",
+                                           namespace="kubeflow",
+                                           service_account=None,
+                                           parameter_sets=kfp_utils.read_parameter_sweep(str(sweep)),
+                                           pipeline_parameters="epochs: 3\nbatch_size: 16",
+                                           pipeline_version_name="version-1",
+                                           run_name="sweep",
+                                           max_concurrency=2,
+                                           results_path=str(tmp_path / "results.json"))
+
+    assert (results["started"], results["failed"]) == (4, 0)
+    assert server.experiments[results["experiment_id"]]["name"] == "experiment-00002"
+    assert server.versions[results["pipeline_id"]][results["version_id"]]["name"] == "version-1"
+    created = {}
+    for outcome in results["runs"]:
+        run = server.runs[outcome["run_id"]]
+        assert run["name"] == outcome["run_name"] and run["name"].startswith("sweep_")
+        created[outcome["index"]] = {parameter["name"]: parameter["value"]
+                                     for parameter in run["pipeline_spec"]["parameters"]}
+    # The sweep parameters override the shared ones
+    assert created == {
+        0: {"epochs": "3", "learning_rate": "0.1", "batch_size": "32"},
+        1: {"epochs": "3", "learning_rate": "0.1", "batch_size": "64"},
+        2: {"epochs": "3", "learning_rate": "0.01", "batch_size": "32"},
+        3: {"epochs": "3", "learning_rate": "0.01", "batch_size": "64"},
+    }
+    # The names are resolved once for the sweep
+    assert server.requests["GET /experiments"] == 1
+    assert server.requests["GET /pipelines"] == 1
+    assert json.loads((tmp_path / "results.json").read_text()) == results
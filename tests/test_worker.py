@@ -0,0 +1,122 @@
+import base64
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+import kfp_utils
+from kfp_utils import cache, client, worker
+from kfp_utils.github import set_output
+
+from conftest import REPO_ROOT
+from fake_kfp_server import fake_id_token
+
+
+def submit(socket_path: str, action: str) -> int:
+    """Function to run an action on a worker from another process, as a step does. The worker
+    redirects the output of this process while it runs a job, so the step cannot share it"""
+    code = ("import sys, kfp_utils.worker as worker; "
+            "sys.exit(worker.submit_to_worker(worker._connect_worker(sys.argv[1]), sys.argv[2]))")
+    return subprocess.run([sys.executable, "-c", code, socket_path, action], timeout=120,
+                          env=dict(os.environ, PYTHONPATH=REPO_ROOT)).returncode
+
+
+@pytest.fixture
+def start_worker(tmp_path, monkeypatch):
+    """Fixture starting a worker in a thread, start_worker() returns the path of its socket"""
+    monkeypatch.setattr(cache, "_reuse_caches", False)
+    monkeypatch.setattr(cache, "_resolution_caches", {})
+    monkeypatch.setattr(worker, "CREDENTIALS_PATH", str(tmp_path / "gcloud-sa.json"))
+    socket_path = str(tmp_path / "worker.sock")
+    threads = []
+
+    def start():
+        thread = threading.Thread(target=worker.serve, args=(socket_path,), kwargs={"idle_timeout": 2}, daemon=True)
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 30
+        while not os.path.exists(socket_path):
+            assert time.monotonic() < deadline and thread.is_alive(), "The worker did not start"
+            time.sleep(0.05)
+        return socket_path
+    yield start
+    for thread in threads:
+        thread.join(timeout=10)
+
+
+def test_job_files_are_removed(start_worker, tmp_path, monkeypatch):
+    seen = {}
+
+    def probe():
+        seen["credentials"] = open(worker.CREDENTIALS_PATH).read()
+        fd, seen["temporary_file"] = tempfile.mkstemp(suffix=".zip")
+        os.close(fd)
+        set_output("PROBED", "yes")
+    monkeypatch.setitem(worker.ACTIONS, "probe", probe)
+    socket_path = start_worker()
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+    output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output))
+    monkeypatch.setenv("INPUT_ENCODED_GOOGLE_APPLICATION_CREDENTIALS", base64.b64encode(b'{"key": 1}').decode())
+    monkeypatch.chdir(tmp_path)
+
+    assert submit(socket_path, "probe") == 0
+    assert "PROBED=yes\n" in output.read_text()
+    assert seen["credentials"] == '{"key": 1}'
+    assert not os.path.exists(worker.CREDENTIALS_PATH)
+    assert not os.path.exists(seen["temporary_file"])
+    # The timing report is only written when asked for
+    assert not (tmp_path / "kfp-timing-report.json").exists()
+
+
+def test_jobs_reuse_the_resolved_ids(start_worker, fake_server, tmp_path, monkeypatch):
+    server = fake_server(pipelines=3, experiments=3, runs=0)
+    socket_path = start_worker()
+    output = tmp_path / "github_output"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_OUTPUT", str(output))
+    for name, value in {"KUBEFLOW_URL": server.url, "ID_TOKEN": fake_id_token("tests"),
+                        "PIPELINE_NAME": "pipeline-00002", "PIPELINE_VERSION_NAME": "version-1",
+                        "EXPERIMENT_NAME": "experiment-00001", "PIPELINE_NAMESPACE": "kubeflow",
+                        "PIPELINE_PARAMETERS": "epochs: 3", "RUN_NAME": "worker-run"}.items():
+        monkeypatch.setenv(f"INPUT_{name}", value)
+
+    requests = []
+    for _ in range(2):
+        before = dict(server.requests)
+        assert submit(socket_path, "trigger-pipeline-token") == 0
+        requests.append({route: count - before.get(route, 0) for route, count in server.requests.items()
+                         if count != before.get(route, 0)})
+
+    run_ids = [line.split("=", 1)[1] for line in output.read_text().splitlines() if line.startswith("RUN_ID=")]
+    assert len(set(run_ids)) == 2 and all(run_id in server.runs for run_id in run_ids)
+    assert requests[0]["POST /runs"] == 1 and len(requests[0]) > 1
+    # The second job finds the IDs in the resolution cache kept by the worker
+    assert requests[1] == {"POST /runs": 1}
+
+
+def test_action_runs_in_process_without_a_worker(tmp_path, monkeypatch):
+    ran = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("INPUT_WORKER_SOCKET", str(tmp_path / "missing.sock"))
+    worker.run_action(lambda: ran.append(True), "trigger-pipeline")
+    assert ran == [True]
+
+
+def test_clients_of_expired_tokens_are_evicted(fake_server):
+    server = fake_server(pipelines=0, experiments=0, runs=0)
+    expired_token, token = fake_id_token("tests", lifetime=-60), fake_id_token("tests")
+
+    kfp_utils.create_client(server.url, existing_token="not-a-jwt")
+    kfp_utils.create_client(server.url, existing_token=expired_token)
+    assert any(key[2] == expired_token for key in client._clients)
+    kfp_utils.create_client(server.url, existing_token=token)
+    tokens = {key[2] for key in client._clients}
+    assert expired_token not in tokens
+    assert {"not-a-jwt", token} <= tokens